@@ -1,10 +1,160 @@
 #!/bin/env python3
 
 import os
+import re
 import json
+from datetime import datetime
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
 
 html_dir = 'html'
-files = sorted([os.path.splitext(f)[0] for f in os.listdir(html_dir) if f.endswith('.html')])
+manifest_dir = 'manifest'
+cache_file = '.mklist-cache.json'
+page_size = 200         # entries per manifest page
+snippet_len = 200       # characters of body text kept per entry
+read_limit = 256 * 1024 # metadata is taken from the head of each file
 
-with open('files.js', 'w') as f:
-    f.write('const files = ' + json.dumps(files) + ';')
+date_pattern = re.compile(r'\b(\d{4}-\d{2}-\d{2})(?:[T ](\d{2}:\d{2}(?::\d{2})?))?')
+
+
+class MetaParser(HTMLParser):
+    """Collects <title>, a date hint and the leading body text of a page."""
+
+    def __init__(self):
+        super().__init__()
+        self.title = ''
+        self.date = ''
+        self.text = []
+        self.text_len = 0
+        self.in_title = False
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'title':
+            self.in_title = True
+        elif tag in ('script', 'style'):
+            self.skip += 1
+        elif tag == 'time' and not self.date:
+            self.date = attrs.get('datetime') or ''
+        elif tag == 'meta' and not self.date:
+            name = (attrs.get('name') or attrs.get('property') or '').lower()
+            if name in ('date', 'article:published_time', 'dcterms.created'):
+                self.date = attrs.get('content') or ''
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self.in_title = False
+        elif tag in ('script', 'style') and self.skip:
+            self.skip -= 1
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+        elif not self.skip and self.text_len < snippet_len:
+            data = ' '.join(data.split())
+            if data:
+                self.text.append(data)
+                self.text_len += len(data) + 1
+
+
+def extract_meta(name):
+    """Return the manifest entry for html/<name>.html."""
+    path = os.path.join(html_dir, name + '.html')
+    st = os.stat(path)
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        head = f.read(read_limit)
+
+    parser = MetaParser()
+    try:
+        parser.feed(head)
+    except Exception:
+        pass
+
+    snippet = ' '.join(parser.text)[:snippet_len]
+    date = parser.date
+    if not date:
+        match = date_pattern.search(parser.title) or date_pattern.search(snippet)
+        date = ' '.join(filter(None, match.groups())) if match else ''
+    if not date:
+        date = datetime.fromtimestamp(st.st_mtime).strftime('%Y-%m-%d %H:%M')
+
+    return {
+        'name': name,
+        'title': ' '.join(parser.title.split()) or name,
+        'date': date,
+        'size': st.st_size,
+        'snippet': snippet,
+    }
+
+
+def load_cache():
+    try:
+        with open(cache_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_json(path, data, **kwargs):
+    # Written beside the target and renamed over it, so readers never see a partial file
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **kwargs)
+    os.replace(tmp, path)
+
+
+def main():
+    names = sorted([os.path.splitext(f)[0] for f in os.listdir(html_dir) if f.endswith('.html')])
+
+    # Reuse cached entries of files whose (mtime, size) did not change
+    cache = load_cache()
+    keys = {}
+    entries = {}
+    stale = []
+    for name in names:
+        st = os.stat(os.path.join(html_dir, name + '.html'))
+        key = keys[name] = [st.st_mtime_ns, st.st_size]
+        cached = cache.get(name)
+        if cached and cached['key'] == key:
+            entries[name] = cached['meta']
+        else:
+            stale.append(name)
+
+    if stale:
+        with ProcessPoolExecutor() as pool:
+            for name, meta in zip(stale, pool.map(extract_meta, stale, chunksize=32)):
+                entries[name] = meta
+
+    new_cache = {name: {'key': keys[name], 'meta': entries[name]} for name in names}
+    write_json(cache_file, new_cache, separators=(',', ':'))
+
+    # Sharded manifest: index.json lists the pages, loaded one after another by the viewer.
+    # New pages first, then index.json, then the pages it no longer lists.
+    os.makedirs(manifest_dir, exist_ok=True)
+    pages = []
+    page_names = set()
+    for start in range(0, len(names), page_size):
+        page_name = f'page-{start // page_size:04d}.json'
+        page = [entries[name] for name in names[start:start + page_size]]
+        write_json(os.path.join(manifest_dir, page_name), page, ensure_ascii=False, separators=(',', ':'))
+        pages.append(f'{manifest_dir}/{page_name}')
+        page_names.add(page_name)
+
+    write_json(os.path.join(manifest_dir, 'index.json'),
+               {'total': len(names), 'page_size': page_size, 'pages': pages})
+
+    for old in os.listdir(manifest_dir):
+        if old.startswith('page-') and old.endswith('.json') and old not in page_names:
+            os.remove(os.path.join(manifest_dir, old))
+
+    # Plain name list, kept for older viewers
+    with open('files.js', 'w', encoding='utf-8') as f:
+        f.write('const files = ' + json.dumps(names) + ';')
+
+    print(f'{len(names)} files ({len(stale)} scanned, {len(names) - len(stale)} cached), '
+          f'{len(pages)} manifest pages')
+
+
+if __name__ == '__main__':
+    main()
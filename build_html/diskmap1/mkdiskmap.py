@@ -3,52 +3,177 @@
 # Version 1
 
 import os
-import re
+import sys
+import queue
+import html
+import heapq
 import shutil
-import subprocess
+import fnmatch
+import argparse
 import http.server
 import socketserver
 import threading
 import logging
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+
+# Helpers shared with the other builders: ../kbuild in a checkout, else where the Makefile installs it
+sys.path[:0] = [os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "kbuild"),
+                os.path.expanduser("~/.local/share/kbuild")]
+from kbuild import PROFILE
 
 # Configuration
 SERVER_PORT = 1111
 KTRACE_HOME = os.path.expanduser("~/.ktree")
 RESOURCES_PATH = os.path.join(KTRACE_HOME, "res")
 VIEWER_HTML = os.path.join(KTRACE_HOME, "viewer.html")
+TOP_FILES = 20
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
 
 
-def generate_index_html(title: str, ignore_patterns: list):
-    """Generates `index.html` with a file tree and custom styling."""
-    ignore_arg = f"-I '{'|'.join(ignore_patterns)}'" if ignore_patterns else ""
+class Node:
+    """A scanned file or directory. `children` is None for non-directories."""
+    __slots__ = ("name", "path", "blocks", "inode", "children")
+
+    def __init__(self, name, path, is_dir):
+        self.name = name
+        self.path = path
+        self.blocks = 0
+        self.inode = None
+        self.children = [] if is_dir else None
+
+
+def human_readable_size(size):
+    for unit in ['B', 'KiB', 'MiB', 'GiB', 'TiB']:
+        if size < 1024.0:
+            return f"{size:.1f}{unit}"
+        size /= 1024.0
+    return f"{size:.1f}PiB"
+
+
+def is_ignored(name, ignore_patterns):
+    return any(fnmatch.fnmatch(name, patt) for patt in ignore_patterns)
 
+
+def scan_dir(path, node, ignore_patterns):
+    """
+    Fill directory `node` from one scandir pass over `path`. Subdirectories
+    are added empty and returned as [(node, path)] for the caller to scan.
+    """
     try:
-        # Run `tree` command to generate the HTML file
-        subprocess.run(
-            f'tree -H . -T "Diskmap-srv1: {title}" {ignore_arg} --noreport -o index.html',
-            shell=True, check=True
-        )
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Failed to run `tree` command: {e}")
-        return
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError as e:
+        logging.warning(f"Cannot read {path}: {e}")
+        return []
+
+    subdirs = []
+    for entry in entries:
+        if is_ignored(entry.name, ignore_patterns):
+            continue
+        child_rel = f"{node.path}/{entry.name}" if node.path != "." else entry.name
+        try:
+            st = entry.stat(follow_symlinks=False)
+            PROFILE.count("entries")
+            if entry.is_dir(follow_symlinks=False):
+                child = Node(entry.name, child_rel, True)
+                subdirs.append((child, entry.path))
+            else:
+                child = Node(entry.name, child_rel, False)
+                if st.st_nlink > 1:
+                    child.inode = (st.st_dev, st.st_ino)
+        except OSError as e:
+            logging.warning(f"Cannot stat {entry.path}: {e}")
+            continue
+        child.blocks = st.st_blocks * 512
+        node.children.append(child)
+    return subdirs
+
+
+def scan_all(root, ignore_patterns, pool):
+    """
+    Scan the whole tree below `root` as a work queue: every directory is one
+    pool task, submitted as soon as its parent has been listed, so deep or
+    lopsided trees keep all workers busy. Workers never wait on each other.
+    """
+    tree = Node(".", ".", True)
+    done = queue.SimpleQueue()
+
+    def submit(path, node):
+        pool.submit(scan_dir, path, node, ignore_patterns).add_done_callback(done.put)
+
+    submit(root, tree)
+    outstanding = 1
+    while outstanding:
+        future = done.get()
+        outstanding -= 1
+        for child, child_path in future.result():
+            submit(child_path, child)
+            outstanding += 1
+    return tree
+
 
-    if not os.path.exists("index.html"):
-        logging.error("index.html was not created. Check if `tree` command is installed.")
+def total_sizes(node, seen, files, stats):
+    """
+    Fold sizes bottom-up, charging each hardlinked inode to the first path
+    (in name order) that reaches it. Children end up sorted by size.
+    """
+    if node.children is None:
+        if node.inode is not None:
+            if node.inode in seen:
+                stats["hardlinks"] += 1
+                node.blocks = 0
+            seen.add(node.inode)
+        stats["files"] += 1
+        files.append(node)
+        return node.blocks
+
+    stats["dirs"] += 1
+    node.children.sort(key=lambda c: c.name)
+    node.blocks += sum(total_sizes(child, seen, files, stats) for child in node.children)
+    node.children.sort(key=lambda c: c.blocks, reverse=True)
+    return node.blocks
+
+
+def scan_tree(root, ignore_patterns, jobs):
+    """Single parallel pass over `root`; returns (tree, all files, stats)."""
+    with PROFILE.phase("scan"), ThreadPoolExecutor(max_workers=jobs) as pool:
+        tree = scan_all(root, ignore_patterns, pool)
+    tree.blocks = os.lstat(root).st_blocks * 512
+
+    files = []
+    stats = {"files": 0, "dirs": 0, "hardlinks": 0}
+    with PROFILE.phase("totals"):
+        total_sizes(tree, set(), files, stats)
+    for key, value in stats.items():
+        PROFILE.count(key, value)
+    return tree, files, stats
+
+
+def viewer_link(path):
+    """Files open in `viewer.html`, directories link to themselves."""
+    return f"__ktree/viewer.html?file={quote(path)}"
+
+
+def render_node(node, out, depth):
+    size = f"<span class='size'>{human_readable_size(node.blocks)}</span>"
+    name = html.escape(node.name)
+    if node.children is None:
+        out.append(f"{'  ' * depth}<li>{size}<a target='_blank' href='{viewer_link(node.path)}'>{name}</a></li>")
         return
 
-    with open("index.html", "r", encoding="utf-8") as file:
-        html_content = file.read()
+    out.append(f"{'  ' * depth}<li><details><summary>{size}"
+               f"<a target='_blank' href='{viewer_link(node.path + '/')}'>{name}/</a></summary><ul>")
+    for child in node.children:
+        render_node(child, out, depth + 1)
+    out.append(f"{'  ' * depth}</ul></details></li>")
+
 
-    # Update footer text
-    html_content = re.sub(
-        r'<p class="VERSION">.*?</p>',
-        '<p class="VERSION">Built with Klab HTML Tree View Generator</p>',
-        html_content,
-        flags=re.DOTALL
-    )
+def generate_index_html(title: str, ignore_patterns: list, top: int = TOP_FILES, jobs: int = 0):
+    """Generates `index.html` with a size-sorted file tree and custom styling."""
+    tree, files, stats = scan_tree(".", ignore_patterns, jobs or (os.cpu_count() or 1) * 4)
 
     # Inject custom styles for better UI
     custom_style = """
@@ -68,19 +193,37 @@ body {
 a { text-decoration: none; }
 a[href$="/"] { color: blue; font-weight: bold; }
 a:not([href$="/"]) { color: black; }
+ul { list-style: none; padding-left: 20px; }
+summary { cursor: pointer; }
+.size { display: inline-block; min-width: 80px; text-align: right; margin-right: 8px; font-family: monospace; }
+table { border-collapse: collapse; margin-bottom: 20px; }
+td, th { border-bottom: 1px solid var(--border-color); padding: 2px 10px; text-align: left; }
 </style>
     """
-    html_content = html_content.replace("<head>", f"<head>\n{custom_style}", 1)
 
-    # Update links to open in `viewer.html`
-    html_content = re.sub(
-        r'<a href="([^"]+)"',
-        r'<a target="_blank" href="__ktree/viewer.html?file=\1"',
-        html_content
-    )
-
-    with open("index.html", "w", encoding="utf-8") as file:
-        file.write(html_content)
+    out = ["<!DOCTYPE html>", "<html>", "<head>", "<meta charset='utf-8'>",
+           f"<title>Diskmap-srv1: {html.escape(title)}</title>", custom_style, "</head>", "<body>",
+           f"<h1>Diskmap-srv1: {html.escape(title)}</h1>",
+           f"<p>Total: {human_readable_size(tree.blocks)} in {stats['files']} files, "
+           f"{stats['dirs']} directories ({stats['hardlinks']} hardlinks counted once)</p>"]
+
+    out.append(f"<h2>Top {top} largest files</h2>")
+    out.append("<table><tr><th>Size</th><th>File</th></tr>")
+    for node in heapq.nlargest(top, files, key=lambda n: n.blocks):
+        out.append(f"<tr><td class='size'>{human_readable_size(node.blocks)}</td>"
+                   f"<td><a target='_blank' href='{viewer_link(node.path)}'>{html.escape(node.path)}</a></td></tr>")
+    out.append("</table>")
+
+    out.append("<ul>")
+    for child in tree.children:
+        render_node(child, out, 1)
+    out.append("</ul>")
+    out.append('<p class="VERSION">Built with Klab HTML Tree View Generator</p>')
+    out.append("</body>")
+    out.append("</html>")
+
+    with PROFILE.phase("write"), open("index.html", "w", encoding="utf-8") as file:
+        file.write("\n".join(out))
 
     logging.info("Generated index.html with custom styles and viewer links.")
 
@@ -117,17 +260,26 @@ def start_server(port: int):
 
 def main():
     """Main function to generate the website and start the server."""
-    import sys
-    args = sys.argv[1:]
-
+    parser = argparse.ArgumentParser(description="Generate and serve an HTML diskmap of the current directory")
     # Use current directory name as title if no arguments are given
-    title = os.path.basename(os.getcwd()) if not args else args[0]
-    ignore_patterns = args[1:]
+    parser.add_argument("title", nargs="?", default=os.path.basename(os.getcwd()))
+    parser.add_argument("ignore_patterns", nargs="*", help="file name patterns to skip")
+    parser.add_argument("--top", type=int, default=TOP_FILES, help="number of largest files to list")
+    parser.add_argument("--profile", metavar="JSON",
+                        help="write per-phase timings, call counts and peak RSS to JSON")
+    parser.add_argument("--cprofile", metavar="PSTATS",
+                        help="write a cProfile dump of the whole build")
+    parser.add_argument("--jobs", type=int, default=0, help="scanner threads (default: 4 per CPU)")
+    args = parser.parse_args()
+
+    PROFILE.enable(args.profile, args.cprofile)
 
     logging.info("Generating website...")
-    generate_index_html(title, ignore_patterns)
+    generate_index_html(args.title, args.ignore_patterns, args.top, args.jobs)
 
-    setup_ktree_resources()
+    with PROFILE.phase("copy_resources"):
+        setup_ktree_resources()
+    PROFILE.finish()
     logging.info("Diskmap: Generated HTML treeview. Open 'index.html' to explore.")
 
     # Start HTTP server in a separate thread (non-blocking execution)
@@ -2,11 +2,20 @@
 
 """
 Diskmap:
-Generate HTML diskmap using tree command.
+Generate HTML diskmap with cumulative directory sizes.
 Improved file explorer with enhanced navigation..
 
+Sizes are allocated blocks (like `du`), each hardlinked inode is counted
+once, and the tree is sorted by size with a summary of the largest files.
+
+With --duplicates, identical files are also reported in duplicates.html and
+duplicates.json. Files are grouped by size, then by a hash of their first
+and last block, and only the remaining candidates are hashed in full.
+Hashes are cached in .diskmap-hashes.json by (inode, size, mtime).
+
 Usage:
-mkdiskmap "Title" [ignored_files...]
+mkdiskmap "Title" [ignored_files...] [--top N] [--jobs N] [--duplicates] [--min-size BYTES]
+          [--profile JSON] [--cprofile PSTATS]
 
 Example:
 mkdiskmap "My Disk Map" node_modules .git
@@ -14,8 +23,26 @@ mkdiskmap "My Disk Map" node_modules .git
 
 import os
 import sys
-import subprocess
-import re
+import queue
+import json
+import html
+import mmap
+import stat
+import heapq
+import hashlib
+import argparse
+import fnmatch
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Helpers shared with the other builders: ../kbuild in a checkout, else where the Makefile installs it
+sys.path[:0] = [os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "kbuild"),
+                os.path.expanduser("~/.local/share/kbuild")]
+from kbuild import PROFILE
+
+TOP_FILES = 20
+HASH_CACHE = ".diskmap-hashes.json"
+EDGE_BLOCK = 64 * 1024   # bytes read from each end of a file for the partial hash
 
 custom_style = """
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
@@ -34,52 +61,379 @@ custom_style = """
         a { text-decoration: none; }
         a[href$="/"] { color: blue; font-weight: bold; }
         a:not([href$="/"]) { color: black; }
+        ul { list-style: none; padding-left: 20px; }
+        summary { cursor: pointer; }
+        .size { display: inline-block; min-width: 80px; text-align: right; margin-right: 8px; font-family: monospace; }
+        table { border-collapse: collapse; margin-bottom: 20px; }
+        td, th { border-bottom: 1px solid var(--border-color); padding: 2px 10px; text-align: left; }
     </style>
 """
 
-def modify_html(title, ignore_patterns):
-    """Runs the `tree` command and modifies `index.html`."""
-    ignore_arg = f"-I '{'|'.join(ignore_patterns)}'" if ignore_patterns else ""
-    subprocess.run(f'tree -H . -T "Diskmap-v1: {title}" {ignore_arg} --noreport -o index.html', shell=True)
 
-    """Modifies index.html to apply styles and ensure all files open in a new tab."""
-    if not os.path.exists("index.html"):
-        print("Error: index.html not found. Tree command might have failed.")
+class Node:
+    """A scanned file or directory. `children` is None for non-directories."""
+    __slots__ = ("name", "path", "blocks", "size", "inode", "children")
+
+    def __init__(self, name, path, is_dir):
+        self.name = name
+        self.path = path
+        self.blocks = 0
+        self.size = 0
+        self.inode = None
+        self.children = [] if is_dir else None
+
+
+def human_readable_size(size):
+    for unit in ['B', 'KiB', 'MiB', 'GiB', 'TiB']:
+        if size < 1024.0:
+            return f"{size:.1f}{unit}"
+        size /= 1024.0
+    return f"{size:.1f}PiB"
+
+
+def is_ignored(name, ignore_patterns):
+    return any(fnmatch.fnmatch(name, patt) for patt in ignore_patterns)
+
+
+def scan_dir(path, node, ignore_patterns):
+    """
+    Fill directory `node` from one scandir pass over `path`. Subdirectories
+    are added empty and returned as [(node, path)] for the caller to scan.
+    """
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError as e:
+        print(f"Warning: cannot read {path}: {e}")
+        return []
+
+    subdirs = []
+    for entry in entries:
+        if is_ignored(entry.name, ignore_patterns):
+            continue
+        child_rel = f"{node.path}/{entry.name}" if node.path != "." else entry.name
+        try:
+            st = entry.stat(follow_symlinks=False)
+            PROFILE.count("entries")
+            if entry.is_dir(follow_symlinks=False):
+                child = Node(entry.name, child_rel, True)
+                subdirs.append((child, entry.path))
+            else:
+                child = Node(entry.name, child_rel, False)
+                child.size = st.st_size
+                if st.st_nlink > 1:
+                    child.inode = (st.st_dev, st.st_ino)
+        except OSError as e:
+            print(f"Warning: cannot stat {entry.path}: {e}")
+            continue
+        child.blocks = st.st_blocks * 512
+        node.children.append(child)
+    return subdirs
+
+
+def scan_all(root, ignore_patterns, pool):
+    """
+    Scan the whole tree below `root` as a work queue: every directory is one
+    pool task, submitted as soon as its parent has been listed, so deep or
+    lopsided trees keep all workers busy. Workers never wait on each other.
+    """
+    tree = Node(".", ".", True)
+    done = queue.SimpleQueue()
+
+    def submit(path, node):
+        pool.submit(scan_dir, path, node, ignore_patterns).add_done_callback(done.put)
+
+    submit(root, tree)
+    outstanding = 1
+    while outstanding:
+        future = done.get()
+        outstanding -= 1
+        for child, child_path in future.result():
+            submit(child_path, child)
+            outstanding += 1
+    return tree
+
+
+def total_sizes(node, seen, files, stats):
+    """
+    Fold sizes bottom-up, charging each hardlinked inode to the first path
+    (in name order) that reaches it. Children end up sorted by size.
+    """
+    if node.children is None:
+        if node.inode is not None:
+            if node.inode in seen:
+                stats["hardlinks"] += 1
+                node.blocks = 0
+            seen.add(node.inode)
+        stats["files"] += 1
+        files.append(node)
+        return node.blocks
+
+    stats["dirs"] += 1
+    node.children.sort(key=lambda c: c.name)
+    node.blocks += sum(total_sizes(child, seen, files, stats) for child in node.children)
+    node.children.sort(key=lambda c: c.blocks, reverse=True)
+    return node.blocks
+
+
+def scan_tree(root, ignore_patterns, jobs):
+    """Single parallel pass over `root`; returns (tree, all files, stats)."""
+    with PROFILE.phase("scan"), ThreadPoolExecutor(max_workers=jobs) as pool:
+        tree = scan_all(root, ignore_patterns, pool)
+    tree.blocks = os.lstat(root).st_blocks * 512
+
+    files = []
+    stats = {"files": 0, "dirs": 0, "hardlinks": 0}
+    with PROFILE.phase("totals"):
+        total_sizes(tree, set(), files, stats)
+    for key, value in stats.items():
+        PROFILE.count(key, value)
+    return tree, files, stats
+
+
+def edge_hash(path, size):
+    """Hash of the first and last EDGE_BLOCK bytes; covers the whole file when it is small."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(EDGE_BLOCK))
+        if size > EDGE_BLOCK:
+            f.seek(max(EDGE_BLOCK, size - EDGE_BLOCK))
+            digest.update(f.read(EDGE_BLOCK))
+    return digest.hexdigest()
+
+
+def full_hash(path):
+    """Hash of the whole file through mmap (runs in a worker process)."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            digest.update(mm)
+    return digest.hexdigest()
+
+
+def load_hash_cache():
+    try:
+        with open(HASH_CACHE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_hash_cache(cache):
+    with open(HASH_CACHE, "w", encoding="utf-8") as f:
+        json.dump(cache, f, separators=(",", ":"))
+
+
+def refine(groups, hash_of, stats_key, stats):
+    """
+    Split each group of candidates by hash, keeping subgroups with two or more
+    files. The candidates of all groups go to `hash_of` in one batch, so the
+    pool always has the whole backlog in flight.
+    """
+    flat = [(gi, cand) for gi, group in enumerate(groups) for cand in group]
+    by_hash = {}
+    for (gi, cand), digest in zip(flat, hash_of([cand for _, cand in flat])):
+        if digest is not None:
+            by_hash.setdefault((gi, digest), []).append(cand)
+    stats[stats_key] += len(flat)
+    return [g for g in by_hash.values() if len(g) > 1]
+
+
+def find_duplicates(files, min_size, jobs):
+    """
+    Group identical regular files: by size, then by edge hash, then by full
+    hash. Hardlinks of one inode count as a single file. Returns (groups, stats),
+    where each group is {"size", "hash", "paths"}.
+    """
+    stats = {"candidates": 0, "edge_hashed": 0, "full_hashed": 0, "cached": 0, "errors": 0}
+
+    by_size = {}
+    for node in files:
+        if node.size >= min_size:
+            by_size.setdefault(node.size, []).append(node)
+
+    # Candidate: [path, size, cache key]; one per inode
+    groups = []
+    with PROFILE.phase("duplicates:stat"):
+        for size, nodes in by_size.items():
+            if len(nodes) < 2:
+                continue
+            inodes = {}
+            for node in nodes:
+                try:
+                    st = os.lstat(node.path)
+                except OSError:
+                    stats["errors"] += 1
+                    continue
+                if not stat.S_ISREG(st.st_mode):
+                    continue  # symlinks would hash their target, FIFOs and devices would block
+                key = f"{st.st_dev}:{st.st_ino}"
+                if key not in inodes:
+                    inodes[key] = [node.path, size, key, st.st_mtime_ns]
+            if len(inodes) > 1:
+                groups.append(list(inodes.values()))
+    stats["candidates"] = sum(len(g) for g in groups)
+
+    cache = load_hash_cache()
+    new_cache = {}
+
+    def cached(cand, field):
+        """Cached hash (0 = edge, 1 = full) when the inode's size and mtime still match."""
+        path, size, key, mtime = cand
+        entry = new_cache.get(key) or cache.get(key)
+        if not entry or entry[0] != size or entry[1] != mtime:
+            entry = [size, mtime, None, None]
+        new_cache[key] = entry
+        return entry[2 + field]
+
+    def store(cand, field, digest):
+        new_cache[cand[2]][2 + field] = digest
+
+    def hash_all(cands, field, func, pool):
+        """Hashes of `cands`: cached ones directly, the rest submitted to `pool` all at once."""
+        digests = [cached(cand, field) for cand in cands]
+        todo = [i for i, d in enumerate(digests) if d is None]
+        stats["cached"] += len(cands) - len(todo)
+        args = [(cands[i][0],) if field else (cands[i][0], cands[i][1]) for i in todo]
+        futures = [pool.submit(func, *a) for a in args]
+        for i, future in zip(todo, futures):
+            try:
+                digests[i] = future.result()
+                store(cands[i], field, digests[i])
+            except (OSError, ValueError) as e:
+                print(f"Warning: cannot hash {cands[i][0]}: {e}")
+                stats["errors"] += 1
+        return digests
+
+    # Edge hashes: two small reads per file, I/O bound, so threads are enough
+    with PROFILE.phase("duplicates:edge"), ThreadPoolExecutor(max_workers=jobs) as pool:
+        groups = refine(groups, lambda g: hash_all(g, 0, edge_hash, pool), "edge_hashed", stats)
+
+    # Files no larger than both edges were read completely already
+    small = [g for g in groups if g[0][1] <= 2 * EDGE_BLOCK]
+    large = [g for g in groups if g[0][1] > 2 * EDGE_BLOCK]
+    if large:
+        with PROFILE.phase("duplicates:full"), ProcessPoolExecutor() as pool:
+            large = refine(large, lambda g: hash_all(g, 1, full_hash, pool), "full_hashed", stats)
+
+    save_hash_cache(new_cache)
+    for key, value in stats.items():
+        PROFILE.count(f"duplicates:{key}", value)
+
+    result = []
+    for group in small + large:
+        key = group[0][2]
+        result.append({
+            "size": group[0][1],
+            "hash": new_cache[key][3] or new_cache[key][2],
+            "paths": sorted(cand[0] for cand in group),
+        })
+    result.sort(key=lambda g: g["size"] * (len(g["paths"]) - 1), reverse=True)
+    return result, stats
+
+
+def write_duplicates_report(title, groups, stats):
+    reclaimable = sum(g["size"] * (len(g["paths"]) - 1) for g in groups)
+    report = {"title": title, "reclaimable": reclaimable, "stats": stats,
+              "groups": [dict(g, reclaimable=g["size"] * (len(g["paths"]) - 1)) for g in groups]}
+    with open("duplicates.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+
+    out = ["<!DOCTYPE html>", "<html>", "<head>", "<meta charset='utf-8'>",
+           f"<title>Duplicates: {html.escape(title)}</title>", custom_style, "</head>", "<body>",
+           f"<h1>Duplicates: {html.escape(title)}</h1>",
+           f"<p>{human_readable_size(reclaimable)} reclaimable in {len(groups)} groups "
+           f"({stats['candidates']} candidates, {stats['edge_hashed']} edge-hashed, "
+           f"{stats['full_hashed']} fully hashed, {stats['cached']} from cache)</p>",
+           "<table><tr><th>Reclaimable</th><th>Size</th><th>Copies</th><th>Files</th></tr>"]
+    for g in groups:
+        links = "<br>".join(f"<a target='_blank' href='{quote(p)}'>{html.escape(p)}</a>" for p in g["paths"])
+        out.append(f"<tr><td class='size'>{human_readable_size(g['size'] * (len(g['paths']) - 1))}</td>"
+                   f"<td class='size'>{human_readable_size(g['size'])}</td>"
+                   f"<td>{len(g['paths'])}</td><td>{links}</td></tr>")
+    out.append("</table>")
+    out.append("<p><a href='index.html'>Back to diskmap</a></p>")
+    out.append("</body>")
+    out.append("</html>")
+
+    with open("duplicates.html", "w", encoding="utf-8") as file:
+        file.write("\n".join(out))
+    return reclaimable
+
+
+def render_node(node, out, depth):
+    size = f"<span class='size'>{human_readable_size(node.blocks)}</span>"
+    name = html.escape(node.name)
+    href = quote(node.path)
+    if node.children is None:
+        out.append(f"{'  ' * depth}<li>{size}<a target='_blank' href='{href}'>{name}</a></li>")
         return
 
-    with open("index.html", "r", encoding="utf-8") as file:
-        content = file.read()
+    out.append(f"{'  ' * depth}<li><details><summary>{size}<a href='{href}/'>{name}/</a></summary><ul>")
+    for child in node.children:
+        render_node(child, out, depth + 1)
+    out.append(f"{'  ' * depth}</ul></details></li>")
+
+
+def generate_html(title, tree, files, stats, top, reclaimable=None):
+    out = ["<!DOCTYPE html>", "<html>", "<head>", "<meta charset='utf-8'>",
+           f"<title>Diskmap-v1: {html.escape(title)}</title>", custom_style, "</head>", "<body>",
+           f"<h1>Diskmap-v1: {html.escape(title)}</h1>",
+           f"<p>Total: {human_readable_size(tree.blocks)} in {stats['files']} files, "
+           f"{stats['dirs']} directories ({stats['hardlinks']} hardlinks counted once)</p>"]
+    if reclaimable is not None:
+        out.append(f"<p>Duplicates: <a href='duplicates.html'>{human_readable_size(reclaimable)} reclaimable</a></p>")
 
-    # Inject custom style
-    content = re.sub(r"(<head>)", r"\1\n" + custom_style, content, flags=re.DOTALL)
+    out.append(f"<h2>Top {top} largest files</h2>")
+    out.append("<table><tr><th>Size</th><th>File</th></tr>")
+    for node in heapq.nlargest(top, files, key=lambda n: n.blocks):
+        out.append(f"<tr><td class='size'>{human_readable_size(node.blocks)}</td>"
+                   f"<td><a target='_blank' href='{quote(node.path)}'>{html.escape(node.path)}</a></td></tr>")
+    out.append("</table>")
 
-    # Add JavaScript to open all files in a new tab
-    content = re.sub(r"(</head>)", r"""
-    <script>
-    document.addEventListener("DOMContentLoaded", function() {
-        document.querySelectorAll("a:not([href$='/'])").forEach(link => {
-            link.setAttribute("target", "_blank"); // Open all files in a new tab
-        });
-    });
-    </script>
-    \1""", content, flags=re.DOTALL)
+    out.append("<ul>")
+    for child in tree.children:
+        render_node(child, out, 1)
+    out.append("</ul>")
+    out.append("<p class='VERSION'>Built with Klab HTML Tree View Generator</p>")
+    out.append("</body>")
+    out.append("</html>")
 
-    # Write the modified content back to index.html
     with open("index.html", "w", encoding="utf-8") as file:
-        file.write(content)
+        file.write("\n".join(out))
+
 
 def main():
-    if len(sys.argv) < 2:
-        title = os.path.basename(os.getcwd())  # Use current directory name as title
-        ignore_patterns = []
-    else:
-        title = sys.argv[1]
-        ignore_patterns = sys.argv[2:]  # Remaining arguments are ignored files
+    parser = argparse.ArgumentParser(description="Generate an HTML diskmap of the current directory")
+    parser.add_argument("title", nargs="?", default=os.path.basename(os.getcwd()))
+    parser.add_argument("ignore_patterns", nargs="*", help="file name patterns to skip")
+    parser.add_argument("--top", type=int, default=TOP_FILES, help="number of largest files to list")
+    parser.add_argument("--profile", metavar="JSON",
+                        help="write per-phase timings, call counts and peak RSS to JSON")
+    parser.add_argument("--cprofile", metavar="PSTATS",
+                        help="write a cProfile dump of the whole build")
+    parser.add_argument("--jobs", type=int, default=(os.cpu_count() or 1) * 4, help="scanner threads")
+    parser.add_argument("--duplicates", action="store_true",
+                        help="also write duplicates.html/json with identical files")
+    parser.add_argument("--min-size", type=int, default=1, metavar="BYTES",
+                        help="smallest file considered by --duplicates")
+    args = parser.parse_args()
+
+    PROFILE.enable(args.profile, args.cprofile)
 
-    modify_html(title, ignore_patterns)
+    tree, files, stats = scan_tree(".", args.ignore_patterns, args.jobs)
+    reclaimable = None
+    if args.duplicates:
+        groups, dup_stats = find_duplicates(files, max(args.min_size, 1), args.jobs)
+        reclaimable = write_duplicates_report(args.title, groups, dup_stats)
+    with PROFILE.phase("render"):
+        generate_html(args.title, tree, files, stats, args.top, reclaimable)
+    PROFILE.finish()
 
     print(f"Generated Diskmap. Open './index.html' to explore the files.")
+    if args.duplicates:
+        print(f"{human_readable_size(reclaimable)} reclaimable in {len(groups)} duplicate groups, "
+              f"see './duplicates.html'.")
 
 if __name__ == "__main__":
     main()
-
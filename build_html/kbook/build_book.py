@@ -11,18 +11,181 @@ It:
        {{TOC_HTML}}, {{TITLE_NAME}}, {{REPO_URL}}, {{DEFAULT_INDEX}}
   5. Writes the final index.html into the chapters directory.
   6. Copies `html/kbook.html` from the script’s location into <chapters_dir>/kbook.html
+  7. Writes a prefix-searchable full-text index (search-index.json) next to index.html.
+  8. Fingerprints kbook.html and search-index.json by content hash, points index.html
+     at the hashed copies and writes a service worker (sw.js) precaching the book.
+  9. Writes resized WebP variants of the images the chapters reference (needs Pillow)
+     and hands their srcset to kbook.html.
 """
 
+import os
 import sys
 import re
+import html
+import json
+import time
+import hashlib
 import shutil
+import argparse
+from contextlib import contextmanager
 from pathlib import Path
+from urllib.parse import unquote
 
 # Paths and constants
 TEMPLATE_FILE = Path(__file__).parent / "html/index.html.in"   # HTML template
 OUTPUT_NAME = "index.html"                                      # Output file name
 VIEWPORT_SOURCE = Path(__file__).parent / "html" / "kbook.html" # Source file to copy
 LINK_PATTERN = re.compile(r"\[\s*(.*?)\s*\]\(\s*(.*?)\s*\)")    # Matches [Title](path) in SUMMARY.md
+SEARCH_INDEX_NAME = "search-index.json"                         # Search index file name
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")     # Matches Markdown ATX headings
+TOKEN_PATTERN = re.compile(r"\w{2,32}", re.UNICODE)              # Indexed search terms (letters, digits, _)
+INLINE_LITERAL = re.compile(r"(`+)(.+?)(?<!`)\1(?!`)|\\([!-/:-@\[-`{-~])")   # Code spans, backslash escapes
+INLINE_LINK = re.compile(r"!?\[([^\]]*)\](?:\([^)]*\)|\[[^\]]*\])")          # [text](url), [text][ref], images
+INLINE_TAG = re.compile(r"<((?:https?|ftp|mailto):[^>\s]*)>|<[^>]+>")      # Autolinks, inline HTML tags
+INLINE_EMPHASIS = re.compile(r"(?<!\w)([*_]{1,3}|~~)(?=\S)(.+?)(?<=\S)\1(?!\w)")
+LINK_DEFINITION = re.compile(r"^ {0,3}\[[^\]]+\]:.*$", re.MULTILINE)        # [ref]: url "title"
+BARE_URL = re.compile(r"\b(?:https?|ftp)://\S+|\bmailto:\S+|\bwww\.\S+")      # Not search terms
+SERVICE_WORKER_NAME = "sw.js"                                   # Precaching service worker
+FINGERPRINT_LEN = 12                                            # Hex digits of content hash in names
+FINGERPRINTED = ("kbook.html", SEARCH_INDEX_NAME)               # Assets served under hashed names
+IMAGE_DIR = "_kbook/img"                                        # Resized image variants
+IMAGE_STATE = "_kbook/img/.state.json"                          # (size, mtime, key) per source image
+IMAGE_PATTERN = re.compile(r"!\[[^\]]*\]\(\s*<?([^)\s>]+)>?[^)]*\)|<img\b[^>]*?\bsrc\s*=\s*[\"']([^\"']+)[\"']", re.I)
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff")
+IMAGE_MIN_BYTES = 32 * 1024                                     # Smaller images are served as authored
+IMAGE_WIDTHS = (480, 960, 1600)                                 # srcset widths (capped at the source width)
+IMAGE_QUALITY = 80                                              # WebP quality of the variants
+IMAGE_MARKER = "/*IMAGE_VARIANTS*/{}"                           # Replaced in kbook.html with the variant map
+
+
+class BuildProfile:
+    """Per-phase wall/CPU time, counters and peak RSS for --profile (no-op when disabled)."""
+
+    # Filesystem and mimetype calls counted while profiling
+    WRAPPED_CALLS = (
+        ("os", "stat"), ("os", "lstat"), ("os", "listdir"), ("os", "scandir"),
+        ("mimetypes", "guess_type"),
+    )
+
+    def __init__(self):
+        self.enabled = False
+        self.report_path = None
+        self.cprofile = None
+        self.cprofile_path = None
+        self.phases = {}
+        self.counts = {}
+        self.calls = {}
+
+    def enable(self, report_path=None, cprofile_path=None):
+        if not (report_path or cprofile_path):
+            return
+        self.enabled = True
+        self.report_path = report_path
+        self.cprofile_path = cprofile_path
+        for module, name in self.WRAPPED_CALLS:
+            self._wrap(module, name)
+        if cprofile_path:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def _wrap(self, module_name, name):
+        module = __import__(module_name)
+        func = getattr(module, name)
+        key = f"{module_name}.{name}"
+        self.calls[key] = 0
+
+        def counted(*args, **kwargs):
+            self.calls[key] += 1
+            return func(*args, **kwargs)
+
+        setattr(module, name, counted)
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.phases.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "runs": 0})
+            stats["wall_s"] += time.perf_counter() - wall
+            stats["cpu_s"] += time.process_time() - cpu
+            stats["runs"] += 1
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def finish(self):
+        if not self.enabled:
+            return
+        if self.cprofile:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_path)
+        if not self.report_path:
+            return
+
+        import resource
+        report = {
+            "script": os.path.basename(sys.argv[0]),
+            "phases": {k: {m: round(v, 6) for m, v in s.items()} for k, s in self.phases.items()},
+            "counts": self.counts,
+            "calls": self.calls,
+            # ru_maxrss is in KiB on Linux
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "children_peak_rss_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+        }
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+PROFILE = BuildProfile()
+
+SERVICE_WORKER_JS = """// Generated by build_book.py: precaches the site, keyed by content revision
+const CACHE = "kbook-precache:" + self.registration.scope;
+const PRECACHE = %(manifest)s;  // [url, revision]; fingerprinted urls have no revision
+
+const resolve = (url) => new URL(url, self.registration.scope).href;
+const cacheKey = ([url, revision]) => revision ? `${resolve(url)}?__rev=${revision}` : resolve(url);
+const byPath = new Map(PRECACHE.map(entry => [new URL(resolve(entry[0])).pathname, cacheKey(entry)]));
+byPath.set(new URL(self.registration.scope).pathname, byPath.get(new URL(resolve("index.html")).pathname));
+
+self.addEventListener("install", (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE);
+    const cached = new Set((await cache.keys()).map(request => request.url));
+    // Entries whose url and revision are already cached are not downloaded again
+    await Promise.all(PRECACHE.filter(entry => !cached.has(cacheKey(entry))).map(async (entry) => {
+      const response = await fetch(resolve(entry[0]), { cache: "no-cache" });
+      if (response.ok) await cache.put(cacheKey(entry), response);
+    }));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE);
+    const current = new Set(PRECACHE.map(cacheKey));
+    for (const request of await cache.keys()) {
+      if (!current.has(request.url)) await cache.delete(request);
+    }
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener("fetch", (event) => {
+  const url = new URL(event.request.url);
+  const key = event.request.method === "GET" && url.origin === self.location.origin && byPath.get(url.pathname);
+  if (!key) return;
+  event.respondWith(caches.open(CACHE)
+    .then(cache => cache.match(key))
+    .then(response => response || fetch(event.request)));
+});
+"""
 
 
 def parse_summary(summary_path: Path):
@@ -34,6 +197,7 @@ def parse_summary(summary_path: Path):
     Returns:
       toc_html (str): HTML for sidebar chapters and subchapters.
       chapter_map_js (str): <script> block defining window.chapterMap.
+      chapter_map (dict): chapter_id → list of {index, title, path}.
     """
     lines = summary_path.read_text(encoding="utf-8").splitlines()
     toc_blocks = []
@@ -111,7 +275,149 @@ def parse_summary(summary_path: Path):
         js_map += "  ],\n"
     js_map += "};\n"
 
-    return "\n\n".join(toc_blocks), f"<script>\n{js_map}</script>"
+    return "\n\n".join(toc_blocks), f"<script>\n{js_map}</script>", chapter_map
+
+
+def strip_inline_markdown(text: str) -> str:
+    """
+    Reduce a Markdown heading to the text the browser renders for it
+    (textContent): link targets, code span backticks, emphasis markers,
+    inline tags and escapes are dropped, entities decoded.
+    """
+    literals = []
+
+    def keep(match):
+        literals.append(match.group(2).strip() if match.group(1) else match.group(3))
+        return f"\0{len(literals) - 1}\0"
+
+    text = INLINE_LITERAL.sub(keep, text)
+    text = INLINE_LINK.sub(r"\1", text)
+    text = INLINE_TAG.sub(lambda m: m.group(1) or "", text)
+    while True:
+        text, n = INLINE_EMPHASIS.subn(r"\2", text)
+        if not n:
+            break
+    text = html.unescape(text)
+    return re.sub(r"\0(\d+)\0", lambda m: literals[int(m.group(1))], text)
+
+
+def searchable_text(markdown: str) -> str:
+    """
+    Text of a section as indexed for search: the rendered text
+    (see strip_inline_markdown) without link definitions and URLs.
+    """
+    text = strip_inline_markdown(LINK_DEFINITION.sub("", markdown))
+    return BARE_URL.sub(" ", text)
+
+
+def slugify(text: str, seen: dict) -> str:
+    """
+    Build a GitHub-style heading anchor (kbook.html assigns the same ids).
+
+    Args:
+      text (str): Heading text as rendered (see strip_inline_markdown).
+      seen (dict): Slug → count of previous uses within the same page.
+
+    Returns:
+      str: Unique anchor for this page.
+    """
+    slug = re.sub(r"[^\w\- ]", "", text.strip().lower()).replace(" ", "-")
+    count = seen.get(slug, 0)
+    seen[slug] = count + 1
+    return f"{slug}-{count}" if count else slug
+
+
+def split_sections(markdown: str):
+    """
+    Split a Markdown page into (anchor, heading, text) sections.
+
+    Headings inside fenced code blocks are ignored. Text before the first
+    heading belongs to a section with an empty anchor.
+    """
+    seen = {}
+    anchor, heading, body = "", "", []
+    in_fence = False
+
+    for line in markdown.splitlines():
+        if line.lstrip().startswith(("```", "~~~")):
+            in_fence = not in_fence
+        match = None if in_fence else HEADING_PATTERN.match(line)
+        if match:
+            if body or heading:
+                yield anchor, heading, "\n".join(body)
+            heading = strip_inline_markdown(match.group(2))
+            anchor = slugify(heading, seen)
+            body = [heading]
+        else:
+            body.append(line)
+
+    if body or heading:
+        yield anchor, heading, "\n".join(body)
+
+
+def build_search_index(chapters_path: Path, chapter_map: dict) -> dict:
+    """
+    Tokenize every chapter listed in SUMMARY.md in a single pass and build an
+    inverted index of term → sections. Terms come from the rendered text
+    (searchable_text), so link targets and URLs are not indexed.
+
+    Sections are numbered in reading order, so each posting list is already
+    sorted and is stored delta-encoded. Terms are stored sorted so the browser
+    can answer prefix queries with a binary search.
+
+    Returns:
+      dict: {"docs": [[path, anchor, title], ...], "terms": [...], "postings": [[...], ...]}
+    """
+    docs = []
+    postings = {}  # { term: [section_id, ...] }
+    corpus_size = 0
+
+    for items in chapter_map.values():
+        for item in items:
+            page = chapters_path / item["path"]
+            if page.suffix.lower() != ".md" or not page.is_file():
+                continue
+            markdown = page.read_text(encoding="utf-8", errors="replace")
+            corpus_size += len(markdown.encode("utf-8"))
+            PROFILE.count("chapters")
+
+            for anchor, heading, text in split_sections(markdown):
+                doc_id = len(docs)
+                docs.append([item["path"], anchor, heading or item["title"]])
+                for term in TOKEN_PATTERN.findall(searchable_text(text).lower()):
+                    ids = postings.setdefault(term, [])
+                    if not ids or ids[-1] != doc_id:
+                        ids.append(doc_id)
+
+    terms = sorted(postings)
+    deltas = []
+    for term in terms:
+        ids = postings[term]
+        deltas.append([ids[0]] + [b - a for a, b in zip(ids, ids[1:])])
+
+    return {"docs": docs, "terms": terms, "postings": deltas, "corpus_size": corpus_size}
+
+
+def write_search_index(chapters_path: Path, chapter_map: dict):
+    """
+    Write <chapters_dir>/search-index.json for the sidebar full-text search.
+
+    Args:
+      chapters_path (Path): Target chapters directory.
+      chapter_map (dict): Chapters parsed from SUMMARY.md.
+    """
+    index = build_search_index(chapters_path, chapter_map)
+    corpus_size = index.pop("corpus_size")
+    PROFILE.count("sections", len(index["docs"]))
+    PROFILE.count("terms", len(index["terms"]))
+
+    output_file = chapters_path / SEARCH_INDEX_NAME
+    payload = json.dumps(index, ensure_ascii=False, separators=(",", ":"))
+    output_file.write_text(payload, encoding="utf-8")
+
+    ratio = (len(payload.encode("utf-8")) / corpus_size * 100) if corpus_size else 0
+    print(f"[✓] Built {output_file} ({len(index['terms'])} terms, "
+          f"{len(index['docs'])} sections, {ratio:.1f}% of corpus)")
 
 
 def render_template(template_path: Path, context: dict) -> str:
@@ -131,27 +437,238 @@ def render_template(template_path: Path, context: dict) -> str:
     return html
 
 
-def copy_viewport_html(dest_dir: Path):
+def copy_viewport_html(dest_dir: Path, image_variants: dict = None):
     """
     Copy `html/kbook.html` → <chapters_dir>/kbook.html.
 
     Args:
       dest_dir (Path): Target chapters directory.
+      image_variants (dict): Image src → variants, written in place of IMAGE_MARKER.
     """
     if not VIEWPORT_SOURCE.exists():
         print(f"[!] Warning: kbook.html not found at {VIEWPORT_SOURCE}")
         return
     dest_dir.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(VIEWPORT_SOURCE, dest_dir / "kbook.html")
+    html = VIEWPORT_SOURCE.read_text(encoding="utf-8")
+    if image_variants:
+        html = html.replace(IMAGE_MARKER, json.dumps(image_variants, ensure_ascii=False, separators=(",", ":")))
+    (dest_dir / "kbook.html").write_text(html, encoding="utf-8")
 
 
-def main(chapters_dir: str, title: str = "KBook", repo_url: str = "#"):
+def find_chapter_images(chapters_path: Path, chapter_map: dict) -> dict:
+    """
+    Collect local raster images referenced from the chapters in SUMMARY.md.
+    kbook.html renders every chapter from the book root, so `src` resolves
+    against chapters_path.
+
+    Returns:
+      dict: src as written in the Markdown → image path relative to chapters_path.
+    """
+    root = chapters_path.resolve()
+    images = {}
+    pages = dict.fromkeys(item["path"] for items in chapter_map.values() for item in items)
+    for page in pages:
+        try:
+            text = (chapters_path / page).read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            continue
+        for match in IMAGE_PATTERN.finditer(text):
+            src = match.group(1) or match.group(2)
+            if src in images or re.match(r"^([a-z][a-z0-9+.-]*:|//|/)", src, re.I):
+                continue
+            path = unquote(src.split("#")[0].split("?")[0])
+            if not path.lower().endswith(IMAGE_SUFFIXES):
+                continue
+            full = (chapters_path / path).resolve()
+            if full.is_file() and full.is_relative_to(root) and full.stat().st_size >= IMAGE_MIN_BYTES:
+                images[src] = full.relative_to(root).as_posix()
+    return images
+
+
+def resize_image(job):
+    """
+    Write the WebP variants of one image; runs in a worker process.
+
+    Returns:
+      (source, [width, height], [[name, width], ...]), or variants None when
+      the image cannot be read or recompressing does not make it smaller.
+    """
+    source, key, chapters_dir = job
+    from PIL import Image, ImageOps
+    try:
+        with Image.open(Path(chapters_dir) / source) as im:
+            im = ImageOps.exif_transpose(im)
+            if im.mode not in ("RGB", "RGBA"):
+                im = im.convert("RGBA" if "transparency" in im.info or im.mode in ("LA", "PA") else "RGB")
+            dims = list(im.size)
+            full = min(im.width, IMAGE_WIDTHS[-1])
+            widths = [w for w in IMAGE_WIDTHS if w < full] + [full]
+            variants = []
+            for width in widths:
+                name = f"{key}-{width}.webp"
+                height = max(1, round(im.height * width / im.width))
+                resized = im if width == im.width else im.resize((width, height), Image.LANCZOS)
+                resized.save(Path(chapters_dir) / IMAGE_DIR / name, "WEBP", quality=IMAGE_QUALITY, method=4)
+                variants.append([name, width])
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return source, None, None
+    largest = (Path(chapters_dir) / IMAGE_DIR / variants[-1][0]).stat().st_size
+    if largest >= (Path(chapters_dir) / source).stat().st_size:
+        return source, dims, None
+    return source, dims, variants
+
+
+def optimize_images(chapters_path: Path, chapter_map: dict) -> dict:
+    """
+    Resize and recompress the chapters' images into IMAGE_DIR on a process
+    pool. Variants are named by a hash of the source bytes and the settings,
+    so unchanged images are never converted twice; sources whose size and
+    mtime match the previous build are not even read.
+
+    Returns:
+      dict: src → [fallback url, srcset, width, height] for kbook.html.
+    """
+    try:
+        import PIL
+    except ImportError:
+        print("[!] Warning: Pillow is not installed, images are served as authored")
+        return {}
+    from concurrent.futures import ProcessPoolExecutor
+
+    images = find_chapter_images(chapters_path, chapter_map)
+    image_dir = chapters_path / IMAGE_DIR
+    state_path = chapters_path / IMAGE_STATE
+    settings = f"pillow {PIL.__version__} {IMAGE_WIDTHS} q{IMAGE_QUALITY}"
+    try:
+        previous = json.loads(state_path.read_text(encoding="utf-8"))
+        if previous.get("settings") != settings:
+            previous = {}
+    except (OSError, ValueError):
+        previous = {}
+    known = previous.get("images", {})
+
+    image_dir.mkdir(parents=True, exist_ok=True)
+    existing = {p.name for p in image_dir.iterdir()}
+    state, jobs = {}, []
+    for source in dict.fromkeys(images.values()):
+        st = (chapters_path / source).stat()
+        old = known.get(source)
+        current = old and all(v[0] in existing for v in old[4] or [])
+        if current and old[:2] == [st.st_size, st.st_mtime_ns]:
+            state[source] = old
+            continue
+        key = content_hash(settings.encode() + (chapters_path / source).read_bytes())[:20]
+        if current and old[2] == key:
+            state[source] = [st.st_size, st.st_mtime_ns, *old[2:]]  # touched, not changed
+            continue
+        jobs.append((source, key, str(chapters_path)))
+        state[source] = [st.st_size, st.st_mtime_ns, key, None, None]
+
+    if jobs:
+        with ProcessPoolExecutor() as pool:
+            for source, dims, variants in pool.map(resize_image, jobs):
+                state[source][3:] = [dims, variants]
+
+    variants_by_src = {}
+    saved = 0
+    for src, source in images.items():
+        *_, dims, variants = state[source]
+        if not variants:
+            continue
+        variants_by_src[src] = [f"{IMAGE_DIR}/{variants[-1][0]}",
+                                ", ".join(f"{IMAGE_DIR}/{name} {width}w" for name, width in variants),
+                                *dims]
+    for source, (original, _, _, _, variants) in state.items():
+        if variants:
+            saved += original - (image_dir / variants[-1][0]).stat().st_size
+
+    live = {name for entry in state.values() for name, _ in (entry[4] or [])}
+    for old in existing - live:
+        if old.endswith(".webp"):
+            (image_dir / old).unlink()
+    state_json = json.dumps({"settings": settings, "images": state}, separators=(",", ":"))
+    if state_json != (json.dumps(previous, separators=(",", ":")) if previous else None):
+        state_path.write_text(state_json, encoding="utf-8")
+
+    PROFILE.count("images_converted", len(jobs))
+    print(f"[✓] Optimized {len(variants_by_src)} of {len(images)} chapter images "
+          f"({len(jobs)} converted, {saved // 1024} KiB saved at full width)")
+    return variants_by_src
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def fingerprint_assets(chapters_path: Path) -> dict:
+    """
+    Copy each FINGERPRINTED file to <stem>.<hash><suffix> in the chapters
+    directory and remove copies left by earlier builds.
+
+    Returns:
+      dict: Original name → fingerprinted name, for files that exist.
+    """
+    mapping = {}
+    for name in FINGERPRINTED:
+        src = chapters_path / name
+        if not src.is_file():
+            continue
+        stem, suffix = os.path.splitext(name)
+        digest = content_hash(src.read_bytes())[:FINGERPRINT_LEN]
+        hashed = f"{stem}.{digest}{suffix}"
+        if not (chapters_path / hashed).exists():
+            shutil.copyfile(src, chapters_path / hashed)
+        mapping[name] = hashed
+
+        stale = re.compile(re.escape(stem) + r"\.[0-9a-f]{%d}" % FINGERPRINT_LEN + re.escape(suffix))
+        for old in chapters_path.iterdir():
+            if old.name != hashed and stale.fullmatch(old.name):
+                old.unlink()
+    return mapping
+
+
+def rewrite_asset_refs(html: str, mapping: dict) -> str:
+    """
+    Point quoted references ("kbook.html?file=", fetch("search-index.json"))
+    at the fingerprinted names.
+    """
+    if not mapping:
+        return html
+    pattern = re.compile(r"(?<=[\"'])(" + "|".join(map(re.escape, mapping)) + r")(?=[\"'?#])")
+    return pattern.sub(lambda m: mapping[m.group(1)], html)
+
+
+def write_service_worker(chapters_path: Path, index_html: str, mapping: dict, chapter_map: dict):
+    """
+    Write <chapters_dir>/sw.js. Fingerprinted files are precached by name;
+    index.html, kbook.html and the chapters carry a content revision, so a
+    rebuild only makes browsers refetch what changed.
+    """
+    entries = [[name, None] for name in mapping.values()]
+    entries.append([OUTPUT_NAME, content_hash(index_html.encode("utf-8"))[:16]])
+
+    pages = ["kbook.html"] + [item["path"] for items in chapter_map.values() for item in items]
+    for page in dict.fromkeys(pages):
+        path = chapters_path / page
+        if path.is_file():
+            entries.append([page, content_hash(path.read_bytes())[:16]])
+
+    manifest = json.dumps(entries, ensure_ascii=False, separators=(",", ":"))
+    (chapters_path / SERVICE_WORKER_NAME).write_text(SERVICE_WORKER_JS % {"manifest": manifest},
+                                                     encoding="utf-8")
+    PROFILE.count("precached", len(entries))
+    print(f"[✓] Built {chapters_path / SERVICE_WORKER_NAME} ({len(entries)} files precached)")
+
+
+def main(chapters_dir: str, title: str = "KBook", repo_url: str = "#", images: bool = True):
     """
     Main build process:
       - Read SUMMARY.md
       - Generate TOC HTML and JS chapterMap
-      - Render final index.html
-      - Copy kbook.html
+      - Resize the chapters' images and copy kbook.html with their variants
+      - Write search-index.json
+      - Fingerprint both and render final index.html against the hashed names
+      - Write the service worker
     """
     chapters_path = Path(chapters_dir)
     summary_file = chapters_path / "SUMMARY.md"
@@ -159,7 +676,8 @@ def main(chapters_dir: str, title: str = "KBook", repo_url: str = "#"):
         print(f"[✗] SUMMARY.md not found in {chapters_path}")
         sys.exit(1)
 
-    toc_html, chapter_map_js = parse_summary(summary_file)
+    with PROFILE.phase("parse_summary"):
+        toc_html, chapter_map_js, chapter_map = parse_summary(summary_file)
 
     # Detect default index file
     default_index = ""
@@ -173,29 +691,55 @@ def main(chapters_dir: str, title: str = "KBook", repo_url: str = "#"):
         print(f"[✗] Template not found: {TEMPLATE_FILE}")
         sys.exit(1)
 
-    final_html = render_template(TEMPLATE_FILE, {
-        "TOC_HTML": toc_html + "\n" + chapter_map_js,
-        "TITLE_NAME": title,
-        "REPO_URL": repo_url,
-        "DEFAULT_INDEX": default_index
-    })
+    with PROFILE.phase("render_template"):
+        final_html = render_template(TEMPLATE_FILE, {
+            "TOC_HTML": toc_html + "\n" + chapter_map_js,
+            "TITLE_NAME": title,
+            "REPO_URL": repo_url,
+            "DEFAULT_INDEX": default_index
+        })
+
+    # Copy kbook.html
+    with PROFILE.phase("images"):
+        image_variants = optimize_images(chapters_path, chapter_map) if images else {}
+        if not images and (chapters_path / IMAGE_DIR).exists():
+            shutil.rmtree(chapters_path / IMAGE_DIR)
+
+    with PROFILE.phase("copy_viewport"):
+        copy_viewport_html(chapters_path, image_variants)
+
+    # Write full-text search index
+    with PROFILE.phase("search_index"):
+        write_search_index(chapters_path, chapter_map)
+
+    # Reference the content-hashed copies so they can be cached forever
+    with PROFILE.phase("fingerprint"):
+        assets = fingerprint_assets(chapters_path)
+        final_html = rewrite_asset_refs(final_html, assets)
 
     # Write index.html
     output_file = chapters_path / OUTPUT_NAME
-    output_file.write_text(final_html, encoding="utf-8")
+    with PROFILE.phase("write"):
+        output_file.write_text(final_html, encoding="utf-8")
     print(f"[✓] Built {output_file}")
 
-    # Copy kbook.html
-    copy_viewport_html(chapters_path)
+    with PROFILE.phase("service_worker"):
+        write_service_worker(chapters_path, final_html, assets, chapter_map)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python kbook_build_html_iframe.py <chapters_dir> [title] [repo_url]")
-        sys.exit(1)
-
-    dir_arg = sys.argv[1]
-    title_arg = sys.argv[2] if len(sys.argv) > 2 else "KBook"
-    repo_arg = sys.argv[3] if len(sys.argv) > 3 else "#"
-
-    main(dir_arg, title_arg, repo_arg)
+    parser = argparse.ArgumentParser(description="Build the kBook HTML UI for a chapters directory")
+    parser.add_argument("chapters_dir")
+    parser.add_argument("title", nargs="?", default="KBook")
+    parser.add_argument("repo_url", nargs="?", default="#")
+    parser.add_argument("--no-images", dest="images", action="store_false",
+                        help="serve chapter images as authored instead of resized WebP variants")
+    parser.add_argument("--profile", metavar="JSON",
+                        help="write per-phase timings, call counts and peak RSS to JSON")
+    parser.add_argument("--cprofile", metavar="PSTATS",
+                        help="write a cProfile dump of the whole build")
+    args = parser.parse_args()
+
+    PROFILE.enable(args.profile, args.cprofile)
+    main(args.chapters_dir, args.title, args.repo_url, args.images)
+    PROFILE.finish()
@@ -0,0 +1,476 @@
+"""
+kbuild - helpers shared by the static site builders
+
+Imported by xplore-monaco-static/build.py, ktree-main/mktree.py and
+diskmap1/2 mkdiskmap.py. The builders look for it in ../kbuild next to
+themselves (a checkout) and in ~/.local/share/kbuild, where each of their
+Makefiles installs it. kbook and khelp are deployed on their own and keep
+their profiler inline.
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import hashlib
+import threading
+import subprocess
+from array import array
+from collections import namedtuple
+from contextlib import contextmanager
+# pygments is imported only when highlighted pages are actually rendered
+
+
+# ---- Profiling ----
+class BuildProfile:
+    """Per-phase wall/CPU time, counters and peak RSS for --profile (no-op when disabled)."""
+
+    # Filesystem and mimetype calls counted while profiling
+    WRAPPED_CALLS = (
+        ("os", "stat"), ("os", "lstat"), ("os", "listdir"), ("os", "scandir"),
+        ("mimetypes", "guess_type"),
+    )
+
+    def __init__(self):
+        self.enabled = False
+        self.report_path = None
+        self.cprofile = None
+        self.cprofile_path = None
+        self.phases = {}
+        self.counts = {}
+        self.calls = {}
+        self.lock = threading.Lock()  # builders count from thread pools
+
+    def enable(self, report_path=None, cprofile_path=None):
+        if not (report_path or cprofile_path):
+            return
+        self.enabled = True
+        self.report_path = report_path
+        self.cprofile_path = cprofile_path
+        for module, name in self.WRAPPED_CALLS:
+            self._wrap(module, name)
+        if cprofile_path:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def _wrap(self, module_name, name):
+        module = __import__(module_name)
+        func = getattr(module, name)
+        key = f"{module_name}.{name}"
+        self.calls[key] = 0
+
+        def counted(*args, **kwargs):
+            with self.lock:
+                self.calls[key] += 1
+            return func(*args, **kwargs)
+
+        setattr(module, name, counted)
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.phases.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "runs": 0})
+            stats["wall_s"] += time.perf_counter() - wall
+            stats["cpu_s"] += time.process_time() - cpu
+            stats["runs"] += 1
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counts[name] = self.counts.get(name, 0) + n
+
+    def finish(self):
+        if not self.enabled:
+            return
+        if self.cprofile:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_path)
+        if not self.report_path:
+            return
+
+        import resource
+        report = {
+            "script": os.path.basename(sys.argv[0]),
+            "phases": {k: {m: round(v, 6) for m, v in s.items()} for k, s in self.phases.items()},
+            "counts": self.counts,
+            "calls": self.calls,
+            # ru_maxrss is in KiB on Linux
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "children_peak_rss_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+        }
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+PROFILE = BuildProfile()
+
+
+# ---- Quick-open path index (format read by quickopen.js) ----
+def char_mask(text):
+    """32-bit set of character classes in `text` (a-z, digit, . _ - and other)"""
+    mask = 0
+    for ch in text:
+        if "a" <= ch <= "z":
+            mask |= 1 << (ord(ch) - 97)
+        elif "0" <= ch <= "9":
+            mask |= 1 << 26
+        elif ch == ".":
+            mask |= 1 << 27
+        elif ch == "_":
+            mask |= 1 << 28
+        elif ch == "-":
+            mask |= 1 << 29
+        elif ch != "/" and ch != " ":
+            mask |= 1 << 30
+    return mask
+
+
+def write_path_index(paths, out_path):
+    """
+    Write the quick-open filename index (little-endian):
+
+      header     magic "PIDX", version, n_paths, n_grams, postings_len, paths_len (u32 each)
+      masks      u32[n_paths]      char_mask() of each lowercased path
+      gram_keys  u32[n_grams]      sorted trigrams of lowercased UTF-8 file names
+      gram_offs  u32[n_grams + 1]  start of each posting list
+      postings   varint path-id deltas per trigram
+      paths      sorted, deduplicated paths joined by "\\n"
+
+    Returns the number of indexed paths.
+    """
+    paths = sorted({p for p in paths if "\n" not in p})
+    masks = array("I")
+    grams = {}
+    for pid, path in enumerate(paths):
+        low = path.lower()
+        masks.append(char_mask(low))
+        name = low.rpartition("/")[2].encode("utf-8")
+        for key in {name[j:j + 3] for j in range(len(name) - 2)}:
+            postings = grams.get(key)
+            if postings is None:
+                postings = grams[key] = array("I")
+            postings.append(pid)
+
+    keys = sorted(grams)
+    gram_keys = array("I", (int.from_bytes(k, "big") for k in keys))
+    gram_offs = array("I", [0])
+    postings = bytearray()
+    for key in keys:
+        prev = -1
+        for pid in grams[key]:
+            delta = pid - prev
+            while delta >= 0x80:
+                postings.append((delta & 0x7F) | 0x80)
+                delta >>= 7
+            postings.append(delta)
+            prev = pid
+        gram_offs.append(len(postings))
+
+    blob = "\n".join(paths).encode("utf-8")
+    header = array("I", [len(paths), len(keys), len(postings), len(blob)])
+    with open(out_path, "wb") as f:
+        f.write(b"PIDX")
+        for part in (array("I", [1]), header, masks, gram_keys, gram_offs):
+            if sys.byteorder != "little":
+                part.byteswap()
+            f.write(part.tobytes())
+        f.write(postings)
+        f.write(blob)
+    return len(paths)
+
+
+# ---- Git index ----
+IndexStat = namedtuple("IndexStat", "st_mode st_size st_mtime st_ctime")
+
+# The index keeps sizes modulo 2^32, so a 4 GiB + n file reads as n bytes. Index
+# sizes from here up (and 0) are stat'ed again: large files are few, which keeps
+# the extra calls cheap, and a size near the 2^32 wrap is never trusted. Only a
+# file less than this past a multiple of 4 GiB can still show its wrapped size.
+INDEX_SIZE_RESTAT = 64 * 1024 * 1024
+
+
+def read_git_index(index_path):
+    """
+    Yield (path, mode, size, mtime, ctime) for the stage-0 entries of a git
+    index (versions 2-4). Raises ValueError for formats that do not list every
+    entry themselves (split index). Sizes are stored modulo 2^32.
+    """
+    with open(index_path, "rb") as f:
+        data = f.read()
+    signature, version, count = struct.unpack_from(">4sII", data, 0)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise ValueError(f"unsupported index version {version}")
+
+    pos, prev = 12, b""
+    entries = []
+    for _ in range(count):
+        ctime_s, ctime_ns, mtime_s, mtime_ns, _dev, _ino, mode, _uid, _gid, size = \
+            struct.unpack_from(">10I", data, pos)
+        flags, = struct.unpack_from(">H", data, pos + 60)
+        name_pos = pos + 62
+        skip_worktree = False
+        if version >= 3 and flags & 0x4000:
+            ext_flags, = struct.unpack_from(">H", data, name_pos)
+            skip_worktree = bool(ext_flags & 0x4000)
+            name_pos += 2
+        if version == 4:
+            # path = previous path minus N trailing bytes + suffix
+            byte = data[name_pos]
+            strip = byte & 0x7F
+            while byte & 0x80:
+                name_pos += 1
+                byte = data[name_pos]
+                strip = ((strip + 1) << 7) | (byte & 0x7F)
+            name_pos += 1
+            end = data.index(b"\0", name_pos)
+            name = prev[:len(prev) - strip] + data[name_pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b"\0", name_pos)
+            name = data[name_pos:end]
+            pos += (end - pos + 8) & ~7  # NUL padded to a multiple of 8
+        prev = name
+        if (flags >> 12) & 3 == 0 and not skip_worktree:
+            entries.append((name.decode("utf-8", "surrogateescape"), mode, size,
+                            mtime_s + mtime_ns / 1e9, ctime_s + ctime_ns / 1e9))
+
+    # Extensions: a split index keeps most entries in a shared file
+    while pos + 8 <= len(data) - 20:
+        ext, ext_size = struct.unpack_from(">4sI", data, pos)
+        if ext == b"link":
+            raise ValueError("split index")
+        pos += 8 + ext_size
+    return entries
+
+
+def git_file_list(root, untracked=False, log=print):
+    """
+    Files under `root` as known to git: {relative path: stat} or None outside a
+    work tree. `git status` refreshes the index stat data in one call; entries
+    it reports as changed, racily clean (smudged size 0, or mtime not older
+    than the index), large enough that the 32-bit index size may have wrapped
+    (INDEX_SIZE_RESTAT) or untracked are stat'ed here, the rest come from the index.
+    """
+    try:
+        info = subprocess.run(["git", "-C", root, "rev-parse", "--absolute-git-dir", "--show-prefix"],
+                              capture_output=True, text=True)
+    except OSError:
+        return None
+    if info.returncode != 0:
+        return None
+    git_dir, prefix = (info.stdout.split("\n") + ["", ""])[:2]
+
+    status = subprocess.run(["git", "-C", root, "status", "--porcelain=v1", "-z", "--no-renames",
+                             "--untracked-files=" + ("all" if untracked else "no"), "--", "."],
+                            capture_output=True)
+    if status.returncode != 0:
+        return None
+
+    files = {}
+    index_path = os.environ.get("GIT_INDEX_FILE") or os.path.join(git_dir, "index")
+    try:
+        index_mtime = os.stat(index_path).st_mtime
+        for name, mode, size, mtime, ctime in read_git_index(index_path):
+            if not name.startswith(prefix):
+                continue
+            rel = name[len(prefix):]
+            if mode >> 12 == 0o16:  # gitlink: submodule contents are not in this index
+                continue
+            stale = size == 0 or size >= INDEX_SIZE_RESTAT or mtime >= index_mtime
+            files[rel] = None if stale else IndexStat(mode, size, mtime, ctime)
+    except (OSError, ValueError, struct.error) as e:
+        log(f"Cannot read git index ({e}), falling back to git ls-files")
+        listing = subprocess.run(["git", "-C", root, "ls-files", "-z"], capture_output=True)
+        files = {os.fsdecode(p): None for p in listing.stdout.split(b"\0") if p}
+        prefix = ""
+
+    for record in status.stdout.split(b"\0"):
+        if len(record) < 4:
+            continue
+        code, name = record[:2].decode(), os.fsdecode(record[3:])
+        if not name.startswith(prefix):
+            continue
+        rel = name[len(prefix):]
+        if code == "??":
+            files[rel] = None
+        elif "D" in code:
+            files.pop(rel, None)
+        elif rel in files:
+            files[rel] = None  # modified, type change or unmerged: stat again
+
+    for rel, st in files.items():
+        if st is None:
+            path = os.path.join(root, rel)
+            try:
+                files[rel] = os.stat(path)
+            except OSError:
+                try:
+                    files[rel] = os.lstat(path)  # dangling symlink
+                except OSError:
+                    files[rel] = False
+    PROFILE.count("git_stat_reused", sum(1 for st in files.values() if isinstance(st, IndexStat)))
+    return {rel: st for rel, st in files.items() if st is not False}
+
+
+# ---- Syntax highlighted pages ----
+HIGHLIGHT_MAX_FILE = 2 * 1024 * 1024
+HIGHLIGHT_INDEX = "index.json"
+HIGHLIGHT_STATE = ".state.json"
+
+class LexerTable:
+    """Pygments lexer alias for a file name; one lookup per extension, exact names first"""
+
+    def __init__(self):
+        from pygments.lexers import LEXERS
+        self.exact = {}
+        for _, _, aliases, patterns, _ in LEXERS.values():
+            for pattern in patterns:
+                if aliases and not any(c in pattern for c in "*?["):
+                    self.exact.setdefault(pattern, aliases[0])
+        self.by_ext = {}
+
+    def alias(self, name):
+        if name in self.exact:
+            return self.exact[name]
+        ext = os.path.splitext(name)[1].lower()
+        if not ext:
+            return None
+        if ext not in self.by_ext:
+            from pygments.lexers import find_lexer_class_for_filename
+            cls = find_lexer_class_for_filename("x" + ext)
+            # Plain text gains nothing over the viewers' own display
+            self.by_ext[ext] = cls.aliases[0] if cls and cls.aliases and cls.name != "Text only" else None
+        return self.by_ext[ext]
+
+
+def highlight_page(job):
+    """Render root/path into out_dir/<name>; runs in a worker process"""
+    root, path, alias, name, out_dir, style = job
+    from pygments import highlight
+    from pygments.lexers import get_lexer_by_name
+    from pygments.formatters import HtmlFormatter
+    try:
+        with open(os.path.join(root, path), encoding="utf-8") as f:
+            text = f.read()
+        body = highlight(text, get_lexer_by_name(alias, stripnl=False, ensurenl=False),
+                         HtmlFormatter(style=style))
+    except (OSError, UnicodeDecodeError, ValueError):
+        return path, None
+    title = os.path.basename(path).replace("&", "&amp;").replace("<", "&lt;")
+    page = (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+            f'<link rel="stylesheet" href="style.css"></head><body>{body}</body></html>')
+    out = os.path.join(out_dir, name)
+    with open(out + ".tmp", "w", encoding="utf-8") as f:
+        f.write(page)
+    os.replace(out + ".tmp", out)
+    return path, name
+
+
+def stat_key(path):
+    """[size, mtime_ns] of a file, or None if it cannot be stat'ed"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def update_highlights(paths, out_dir, style, root=".", stat_of=None, extra_css=""):
+    """
+    Pre-render syntax highlighted pages for text files up to HIGHLIGHT_MAX_FILE
+    into `out_dir`, with index.json mapping each path (relative to `root`) to
+    its page. Pages are named by a hash of the content, lexer and pygments
+    version/style, so an existing page is never rendered twice; files whose
+    stat_of(path) -> [size, mtime] matches the previous build are not even read.
+    Returns counts, or None when pygments is not installed.
+    """
+    try:
+        import pygments
+        from pygments.formatters import HtmlFormatter
+    except ImportError:
+        return None
+    from concurrent.futures import ProcessPoolExecutor
+
+    version = f"pygments {pygments.__version__} {style}"
+    state_path = os.path.join(out_dir, HIGHLIGHT_STATE)
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous.get("version") != version:
+            previous = {}
+    except (OSError, ValueError):
+        previous = {}
+    known = previous.get("files", {})
+
+    os.makedirs(out_dir, exist_ok=True)
+    existing = set(os.listdir(out_dir))
+    lexers = LexerTable()
+    pages, state, jobs = {}, {}, []
+    reused = 0
+    stat_of = stat_of or (lambda path: stat_key(os.path.join(root, path)))
+    for path in paths:
+        alias = lexers.alias(os.path.basename(path))
+        if alias is None:
+            continue
+        key = stat_of(path)
+        if key is None or key[0] > HIGHLIGHT_MAX_FILE:
+            continue
+        old = known.get(path)
+        if old and old[:2] == key and old[2] in existing:
+            pages[path], state[path] = old[2], old
+            reused += 1
+            continue
+        try:
+            with open(os.path.join(root, path), "rb") as f:
+                data = f.read(HIGHLIGHT_MAX_FILE + 1)
+        except OSError:
+            continue
+        if b"\0" in data[:8192]:
+            continue
+        name = hashlib.sha1(f"{version}\0{alias}\0".encode() + data).hexdigest()[:20] + ".html"
+        state[path] = key + [name]
+        if name in existing:
+            pages[path] = name
+            reused += 1
+        else:
+            jobs.append((root, path, alias, name, out_dir, style))
+
+    rendered = 0
+    if jobs:
+        with ProcessPoolExecutor() as pool:
+            for path, name in pool.map(highlight_page, jobs, chunksize=16):
+                if name:
+                    pages[path] = name
+                    rendered += 1
+                else:
+                    del state[path]
+
+    with open(os.path.join(out_dir, "style.css"), "w", encoding="utf-8") as f:
+        formatter = HtmlFormatter(style=style)
+        f.write(f"body {{ margin: 0; background: {formatter.style.background_color}; }}\n"
+                ".highlight pre { margin: 0; padding: 8px 12px; font: 13px/1.4 Consolas, 'Courier New', monospace; }\n")
+        f.write(extra_css)
+        f.write(formatter.get_style_defs(".highlight"))
+    for out_path, data in (
+        (os.path.join(out_dir, HIGHLIGHT_INDEX), {"version": 1, "files": pages}),
+        (state_path, {"version": version, "files": state}),
+    ):
+        with open(out_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(out_path + ".tmp", out_path)
+
+    live = set(pages.values())
+    stale = [old for old in existing if old.endswith(".html") and old not in live]
+    for old in stale:
+        os.remove(os.path.join(out_dir, old))
+
+    PROFILE.count("highlighted", rendered)
+    return {"pages": len(pages), "rendered": rendered, "reused": reused, "stale": len(stale)}
@@ -1,15 +1,233 @@
 #!/usr/bin/env python3
 
 import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from contextlib import contextmanager
 from pathlib import Path
 
 BASE_DIR = Path(__file__).parent.parent.resolve()
 TAGS_DIR = BASE_DIR / "tags"
+OBJECTS_DIR = BASE_DIR / "objects"
+ASSETS_DIR = BASE_DIR / "assets"
+SERVICE_WORKER_FILE = BASE_DIR / "sw.js"
 TEMPLATE_FILE = BASE_DIR / "html" / "index.html.in"
 OUTPUT_FILE = BASE_DIR / "index.html"
 PLACEHOLDER = "{{KHELP_FILE_TREE}}"
+HASH_CHUNK = 1024 * 1024
+FINGERPRINT_LEN = 12
 
-def build_folder_html(tag: str, files: list[str]) -> str:
+# Static files referenced by the page, copied to assets/<name>.<hash><ext>
+FINGERPRINTED_ASSETS = ("html/favicon.ico", "html/book.png", "html/page.png")
+# Fixed-name pages also precached by the service worker (revision = content hash)
+PRECACHED_PAGES = ("html/tagview.html",)
+# What the browser loads; tags/ is only the build input and is left out by --publish
+PUBLISHED = (OUTPUT_FILE, SERVICE_WORKER_FILE, ASSETS_DIR, OBJECTS_DIR, BASE_DIR / "html")
+
+# Objects are named by content hash, so they never change and can be cached forever
+OBJECTS_HTACCESS = """<IfModule mod_headers.c>
+    Header set Cache-Control "public, max-age=31536000, immutable"
+</IfModule>
+"""
+
+class BuildProfile:
+    """Per-phase wall/CPU time, counters and peak RSS for --profile (no-op when disabled)."""
+
+    # Filesystem and mimetype calls counted while profiling
+    WRAPPED_CALLS = (
+        ("os", "stat"), ("os", "lstat"), ("os", "listdir"), ("os", "scandir"),
+        ("mimetypes", "guess_type"),
+    )
+
+    def __init__(self):
+        self.enabled = False
+        self.report_path = None
+        self.cprofile = None
+        self.cprofile_path = None
+        self.phases = {}
+        self.counts = {}
+        self.calls = {}
+
+    def enable(self, report_path=None, cprofile_path=None):
+        if not (report_path or cprofile_path):
+            return
+        self.enabled = True
+        self.report_path = report_path
+        self.cprofile_path = cprofile_path
+        for module, name in self.WRAPPED_CALLS:
+            self._wrap(module, name)
+        if cprofile_path:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def _wrap(self, module_name, name):
+        module = __import__(module_name)
+        func = getattr(module, name)
+        key = f"{module_name}.{name}"
+        self.calls[key] = 0
+
+        def counted(*args, **kwargs):
+            self.calls[key] += 1
+            return func(*args, **kwargs)
+
+        setattr(module, name, counted)
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.phases.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "runs": 0})
+            stats["wall_s"] += time.perf_counter() - wall
+            stats["cpu_s"] += time.process_time() - cpu
+            stats["runs"] += 1
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def finish(self):
+        if not self.enabled:
+            return
+        if self.cprofile:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_path)
+        if not self.report_path:
+            return
+
+        import resource
+        report = {
+            "script": os.path.basename(sys.argv[0]),
+            "phases": {k: {m: round(v, 6) for m, v in s.items()} for k, s in self.phases.items()},
+            "counts": self.counts,
+            "calls": self.calls,
+            # ru_maxrss is in KiB on Linux
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "children_peak_rss_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+        }
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+PROFILE = BuildProfile()
+
+SERVICE_WORKER_JS = """// Generated by build_html.py: precaches the site, keyed by content revision
+const CACHE = "khelp-precache:" + self.registration.scope;
+const PRECACHE = %(manifest)s;  // [url, revision]; fingerprinted urls have no revision
+
+const resolve = (url) => new URL(url, self.registration.scope).href;
+const cacheKey = ([url, revision]) => revision ? `${resolve(url)}?__rev=${revision}` : resolve(url);
+const byPath = new Map(PRECACHE.map(entry => [new URL(resolve(entry[0])).pathname, cacheKey(entry)]));
+byPath.set(new URL(self.registration.scope).pathname, byPath.get(new URL(resolve("index.html")).pathname));
+
+self.addEventListener("install", (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE);
+    const cached = new Set((await cache.keys()).map(request => request.url));
+    // Entries whose url and revision are already cached are not downloaded again
+    await Promise.all(PRECACHE.filter(entry => !cached.has(cacheKey(entry))).map(async (entry) => {
+      const response = await fetch(resolve(entry[0]), { cache: "no-cache" });
+      if (response.ok) await cache.put(cacheKey(entry), response);
+    }));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE);
+    const current = new Set(PRECACHE.map(cacheKey));
+    for (const request of await cache.keys()) {
+      if (!current.has(request.url)) await cache.delete(request);
+    }
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener("fetch", (event) => {
+  const url = new URL(event.request.url);
+  const key = event.request.method === "GET" && url.origin === self.location.origin && byPath.get(url.pathname);
+  if (!key) return;
+  event.respondWith(caches.open(CACHE)
+    .then(cache => cache.match(key))
+    .then(response => response || fetch(event.request)));
+});
+"""
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def store_object(path: Path, stats: dict) -> str:
+    """Store a page once in the content-addressed store, return its site-relative path."""
+    with PROFILE.phase("hash"):
+        digest = hash_file(path)
+    obj = OBJECTS_DIR / digest[:2] / f"{digest}{path.suffix.lower()}"
+    size = path.stat().st_size
+
+    stats["pages"] += 1
+    stats["total_bytes"] += size
+    stats["objects"].add(obj.relative_to(BASE_DIR).as_posix())
+    if obj.name not in stats["seen"]:
+        stats["seen"].add(obj.name)
+        stats["stored_bytes"] += size
+        if not obj.exists():
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            with PROFILE.phase("store"):
+                shutil.copyfile(path, obj)
+
+    return obj.relative_to(BASE_DIR).as_posix()
+
+def fingerprint_assets() -> dict:
+    """Copy FINGERPRINTED_ASSETS under content-hashed names; returns {path: fingerprinted path}."""
+    ASSETS_DIR.mkdir(exist_ok=True)
+    mapping = {}
+    for rel in FINGERPRINTED_ASSETS:
+        src = BASE_DIR / rel
+        if not src.is_file():
+            print(f"  Warning: {rel} not found, left unversioned")
+            continue
+        digest = hash_file(src)[:FINGERPRINT_LEN]
+        dest = ASSETS_DIR / f"{src.stem}.{digest}{src.suffix}"
+        if not dest.exists():
+            shutil.copyfile(src, dest)
+        mapping[rel] = dest.relative_to(BASE_DIR).as_posix()
+
+    # Previous builds' copies: every live reference is in `mapping`
+    current = {Path(p).name for p in mapping.values()}
+    for old in ASSETS_DIR.iterdir():
+        if old.is_file() and old.name != ".htaccess" and old.name not in current:
+            old.unlink()
+    (ASSETS_DIR / ".htaccess").write_text(OBJECTS_HTACCESS, encoding="utf-8")
+    return mapping
+
+def rewrite_asset_refs(html: str, mapping: dict) -> str:
+    """Point quoted references (src='html/book.png', href="...") at the fingerprinted copies."""
+    if not mapping:
+        return html
+    pattern = re.compile(r"(?<=[\"'])(" + "|".join(map(re.escape, mapping)) + r")(?=[\"'?#])")
+    return pattern.sub(lambda m: mapping[m.group(1)], html)
+
+def write_service_worker(entries: list):
+    """sw.js with the precache manifest inline, so any content change installs a new worker."""
+    manifest = json.dumps(entries, separators=(",", ":"))
+    SERVICE_WORKER_FILE.write_text(SERVICE_WORKER_JS % {"manifest": manifest}, encoding="utf-8")
+    print(f"  Service worker precaches {len(entries)} files")
+
+def build_folder_html(tag: str, files: list[tuple[str, str]]) -> str:
     html = []
     html.append("                <ul class='folder-container'>")
     html.append("                    <div class='file-item folder' onclick='toggleFolder(this)'>")
@@ -20,9 +238,9 @@ def build_folder_html(tag: str, files: list[str]) -> str:
     html.append("                    </div>")
     html.append("                    <div class='file-list collapsed'>")
 
-    for fname in files:
+    for fname, obj in files:
         #print(f"  Added {tag}/{fname} ...")
-        html.append(f"                        <div class='file-item file' onclick='openFile(\"tags/{tag}/{fname}\")'>")
+        html.append(f"                        <div class='file-item file' onclick='openFile(\"{obj}\", \"tags/{tag}/{fname}\")'>")
         html.append("                            <img src='html/page.png' class='file-icon'>")
         html.append("                            <div class='file-details'>")
         html.append(f"                                <div class='file-name'>{fname}</div>")
@@ -34,18 +252,45 @@ def build_folder_html(tag: str, files: list[str]) -> str:
 
     return "\n".join(html)
 
-def generate_folder_html() -> str:
+def generate_folder_html(stats: dict) -> str:
     print("Building Khelp HTML site...\n")
     blocks = []
 
+    if not TAGS_DIR.is_dir():
+        print(f"  Warning: {TAGS_DIR.relative_to(BASE_DIR)}/ not found, the site is empty")
+        return ""
+
     for tag_path in sorted(TAGS_DIR.iterdir()):
         if tag_path.is_dir():
             print(f"  Adding ... {tag_path.name}")
             files = sorted(f.name for f in tag_path.iterdir() if f.is_file())
-            blocks.append(build_folder_html(tag_path.name, files))
+            entries = [(fname, store_object(tag_path / fname, stats)) for fname in files]
+            blocks.append(build_folder_html(tag_path.name, entries))
 
     return "\n\n".join(blocks)
 
+def prune_objects(live: set):
+    """Remove objects no longer listed by this build, and the shard directories they leave empty."""
+    removed = 0
+    for shard in OBJECTS_DIR.iterdir():
+        if not shard.is_dir():
+            continue
+        for obj in shard.iterdir():
+            if obj.relative_to(BASE_DIR).as_posix() not in live:
+                obj.unlink()
+                removed += 1
+        if not any(shard.iterdir()):
+            shard.rmdir()
+    PROFILE.count("objects_pruned", removed)
+    print(f"  Pruned {removed} unreferenced objects from {OBJECTS_DIR.relative_to(BASE_DIR)}/")
+
+def report_dedup(stats: dict):
+    saved = stats["total_bytes"] - stats["stored_bytes"]
+    factor = stats["total_bytes"] / stats["stored_bytes"] if stats["stored_bytes"] else 1.0
+    print(f"\n  Pages: {stats['pages']} listed, {len(stats['seen'])} unique")
+    print(f"  Bytes: {stats['total_bytes']} listed, {stats['stored_bytes']} stored, "
+          f"{saved} saved (x{factor:.2f} duplication)")
+
 def render_template():
     if not TEMPLATE_FILE.exists():
         raise FileNotFoundError(f"Template not found: {TEMPLATE_FILE}")
@@ -54,13 +299,75 @@ def render_template():
     if PLACEHOLDER not in template:
         raise ValueError(f"Placeholder '{PLACEHOLDER}' not found in template.")
 
-    folder_html = generate_folder_html()
-    output = template.replace(PLACEHOLDER, folder_html)
-    OUTPUT_FILE.write_text(output, encoding="utf-8")
+    stats = {"pages": 0, "total_bytes": 0, "stored_bytes": 0, "seen": set(), "objects": set()}
+    with PROFILE.phase("scan"):
+        folder_html = generate_folder_html(stats)
+    OBJECTS_DIR.mkdir(parents=True, exist_ok=True)
+    (OBJECTS_DIR / ".htaccess").write_text(OBJECTS_HTACCESS, encoding="utf-8")
+    report_dedup(stats)
+    PROFILE.count("pages", stats["pages"])
+    PROFILE.count("unique_pages", len(stats["seen"]))
+
+    with PROFILE.phase("fingerprint"):
+        assets = fingerprint_assets()
+    with PROFILE.phase("render_template"):
+        output = rewrite_asset_refs(template.replace(PLACEHOLDER, folder_html), assets)
+    with PROFILE.phase("write"):
+        OUTPUT_FILE.write_text(output, encoding="utf-8")
+
+    # Objects and fingerprinted assets are immutable; fixed names carry a revision
+    entries = [[rel, None] for rel in sorted(stats["objects"]) + sorted(assets.values())]
+    entries.append([OUTPUT_FILE.name, hashlib.blake2b(output.encode("utf-8"), digest_size=8).hexdigest()])
+    for rel in PRECACHED_PAGES:
+        if (BASE_DIR / rel).is_file():
+            entries.append([rel, hash_file(BASE_DIR / rel)[:16]])
+    write_service_worker(entries)
+
+    with PROFILE.phase("prune"):
+        prune_objects(stats["objects"])
 
     print(f"\n✅ Generated {OUTPUT_FILE.relative_to(BASE_DIR)}")
 
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def publish_site(dest: Path):
+    """Hardlink (or copy) the PUBLISHED files into `dest`, replacing what a previous publish left there."""
+    dest.mkdir(parents=True, exist_ok=True)
+    for src in PUBLISHED:
+        target = dest / src.name
+        if target.is_dir():
+            shutil.rmtree(target)
+        elif target.exists():
+            target.unlink()
+        if src.is_dir():
+            shutil.copytree(src, target, copy_function=link_or_copy, ignore=shutil.ignore_patterns("*.in"))
+        elif src.is_file():
+            link_or_copy(src, target)
+    print(f"  Published site to {dest} (without {TAGS_DIR.name}/)")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Khelp HTML site")
+    parser.add_argument("--profile", metavar="JSON",
+                        help="write per-phase timings, call counts and peak RSS to JSON")
+    parser.add_argument("--cprofile", metavar="PSTATS",
+                        help="write a cProfile dump of the whole build")
+    parser.add_argument("--publish", metavar="DIR", type=Path,
+                        help="after the build, put only the files the site serves (no tags/) into DIR")
+    args = parser.parse_args()
+    publish_dir = args.publish.resolve() if args.publish else None
+    if publish_dir and (publish_dir == BASE_DIR or
+                        any(p == publish_dir or p in publish_dir.parents for p in PUBLISHED)):
+        parser.error(f"--publish {publish_dir} would overwrite the site it is built from")
+
+    PROFILE.enable(args.profile, args.cprofile)
     render_template()
+    if publish_dir:
+        with PROFILE.phase("publish"):
+            publish_site(publish_dir)
+    PROFILE.finish()
 
 # EOF
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+
+"""
+Build every configured static site in parallel, skipping unchanged ones
+
+Each site names a builder (xplore, ktree, diskmap, kbook, khelp, mklist), the
+root directory it covers and optional extra arguments:
+
+  {
+    "jobs": 0,
+    "sites": [
+      {"name": "src",      "builder": "xplore",  "root": "~/src", "args": ["Sources", "--git"]},
+      {"name": "src-tree", "builder": "ktree",   "root": "~/src"},
+      {"name": "home-map", "builder": "diskmap", "root": "~"},
+      {"name": "book",     "builder": "kbook",   "root": "~/book", "args": ["My Book"]},
+      {"name": "help",     "builder": "khelp",   "root": "~/khelp",
+       "command": ["python3", "~/khelp/src/build_html.py"]}
+    ]
+  }
+
+Every root is scanned once, by a single walk of its outermost configured
+ancestor, and the (path, size, mtime) digest of each root decides whether
+its sites must be rebuilt. Builder outputs are left out of the digests, so a
+build does not invalidate itself or the sites of an enclosing root. Sites
+then run as separate processes, longest (by the previous run) first, up to
+--jobs at a time; sites writing the same output in the same root run one
+after another.
+
+Usage:
+  mksites.py sites.json [--jobs N] [--site NAME ...] [--force] [--dry-run]
+"""
+
+import os
+import sys
+import json
+import time
+import fnmatch
+import hashlib
+import argparse
+import shutil
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Installed command and files written into the site root, per builder
+# (names from the makefile/ install targets; "outputs" are fnmatch patterns)
+BUILDERS = {
+    "xplore":  {"command": ["xplore-build"],
+                "outputs": ["__xplore", "index.html"]},
+    "ktree":   {"command": ["ktree-html.py"],
+                "outputs": ["__ktree", "index.html"]},
+    "diskmap": {"command": ["mkdiskmap.py"],
+                "outputs": ["__ktree", "index.html", ".diskmap-hashes.json",
+                            "duplicates.json", "duplicates.html"]},
+    "kbook":   {"command": ["build_book.py", "."],
+                "outputs": ["index.html", "kbook.html", "kbook.*.html",
+                            "search-index.json", "search-index.*.json", "sw.js", "_kbook"]},
+    "khelp":   {"command": None,  # build_html.py locates its site from its own path
+                "outputs": ["index.html", "assets", "sw.js", "objects"]},
+    "mklist":  {"command": ["mklist.py"],
+                "outputs": ["manifest", "files.js", ".mklist-cache.json"]},
+}
+STATE_SUFFIX = ".state.json"
+OUTPUT_TAIL = 20  # lines of builder output shown when it fails
+
+
+def log(msg, level="INFO"):
+    """Improved logging with timestamp"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] [{level}] {msg}", flush=True)
+
+
+# ---- Configuration ----
+class Site:
+    def __init__(self, spec, config_dir):
+        self.name = spec["name"]
+        self.builder = spec["builder"]
+        if self.builder not in BUILDERS:
+            raise ValueError(f"site '{self.name}': unknown builder '{self.builder}'")
+        base = os.path.expanduser(spec["root"])
+        self.root = os.path.realpath(os.path.join(config_dir, base))
+        command = spec.get("command") or BUILDERS[self.builder]["command"]
+        if not command:
+            raise ValueError(f"site '{self.name}': builder '{self.builder}' needs a \"command\"")
+        self.command = [os.path.expanduser(part) for part in command] + list(spec.get("args", []))
+        self.outputs = BUILDERS[self.builder]["outputs"] + list(spec.get("outputs", []))
+
+    def executable(self):
+        """Resolved path of the program, whose (size, mtime) is part of the site key"""
+        program = self.command[0]
+        if program in ("python", "python3") and len(self.command) > 1:
+            program = self.command[1]
+        return shutil.which(program) or program
+
+    def key(self, digest):
+        h = hashlib.sha1()
+        h.update(json.dumps([self.builder, self.command, digest]).encode("utf-8"))
+        try:
+            st = os.stat(self.executable())
+            h.update(f"{st.st_size}\0{st.st_mtime_ns}".encode())
+        except OSError:
+            pass
+        return h.hexdigest()
+
+
+def load_config(path):
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    config_dir = os.path.dirname(os.path.abspath(path))
+    sites = [Site(spec, config_dir) for spec in config.get("sites", [])]
+    names = [site.name for site in sites]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"duplicate site names: {', '.join(sorted(duplicates))}")
+    return config, sites
+
+
+def load_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# ---- Shared scan ----
+def output_patterns(sites, state_path):
+    """Directory → name patterns excluded from every digest (outputs of all sites, our state)"""
+    head, name = os.path.split(os.path.realpath(state_path))
+    patterns = {head: {name, name + ".tmp"}}
+    for site in sites:
+        for output in site.outputs:
+            head, name = os.path.split(output)
+            patterns.setdefault(os.path.join(site.root, head) if head else site.root, set()).add(name)
+    return patterns
+
+
+def outermost_roots(roots):
+    """Roots not inside another configured root: the only ones actually walked"""
+    tops = []
+    for root in sorted(roots):
+        if not any(root == top or root.startswith(top.rstrip(os.sep) + os.sep) for top in tops):
+            tops.append(root)
+    return tops
+
+
+def scan_root(top, roots, excluded):
+    """
+    Walk `top` once and return {root: digest} for every configured root at or
+    below it. Each entry updates the hashers of all roots enclosing it.
+    """
+    hashers = {}
+    counts = {"files": 0, "dirs": 0}
+
+    def walk(path, active):
+        if path in roots:
+            hashers[path] = hashlib.sha1()
+            active = active + [(path, hashers[path])]
+        skip = excluded.get(path, ())
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            return
+        for entry in entries:
+            if any(fnmatch.fnmatchcase(entry.name, pattern) for pattern in skip):
+                continue
+            try:
+                st = entry.stat(follow_symlinks=False)
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            line = f"{entry.path}\0{st.st_mode}\0{0 if is_dir else st.st_size}\0{0 if is_dir else st.st_mtime_ns}\n"
+            data = line.encode("utf-8", "surrogateescape")
+            for _, h in active:
+                h.update(data)
+            if is_dir:
+                counts["dirs"] += 1
+                walk(entry.path, active)
+            else:
+                counts["files"] += 1
+
+    start = time.perf_counter()
+    walk(top, [])
+    log(f"Scanned {top}: {counts['files']} files, {counts['dirs']} dirs in {time.perf_counter() - start:.2f}s")
+    return {root: h.hexdigest() for root, h in hashers.items()}
+
+
+def scan_all(sites, jobs, state_path):
+    roots = {site.root for site in sites}
+    excluded = output_patterns(sites, state_path)
+    digests = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for result in pool.map(lambda top: scan_root(top, roots, excluded), outermost_roots(roots)):
+            digests.update(result)
+    return digests
+
+
+# ---- Building ----
+def output_locks(sites):
+    """One lock per (root, output) written by more than one site"""
+    owners = {}
+    for site in sites:
+        for output in site.outputs:
+            owners.setdefault((site.root, output), []).append(site.name)
+    locks, shared = {}, {}
+    for (root, output), names in owners.items():
+        if len(names) > 1:
+            locks[(root, output)] = threading.Lock()
+            shared.setdefault(tuple(names), []).append(output)
+    for names, outputs in shared.items():
+        log(f"{', '.join(names)} all write {', '.join(outputs)}: they will run one at a time", "WARN")
+    return locks
+
+
+def run_site(site, locks):
+    """Run one builder in its root; returns (ok, seconds, output)"""
+    held = [locks[key] for key in sorted((site.root, o) for o in site.outputs) if key in locks]
+    for lock in held:
+        lock.acquire()
+    try:
+        log(f"Building {site.name} ({site.builder}) in {site.root}")
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(site.command, cwd=site.root, stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+            ok, output = result.returncode == 0, result.stdout.decode("utf-8", errors="replace")
+            if not ok:
+                output += f"\nexit status {result.returncode}"
+        except OSError as e:
+            ok, output = False, str(e)
+        return ok, time.perf_counter() - start, output
+    finally:
+        for lock in reversed(held):
+            lock.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the configured static sites in parallel")
+    parser.add_argument("config", help="JSON file listing the sites")
+    parser.add_argument("--jobs", "-j", type=int, default=0,
+                        help="builders run at once (default: config \"jobs\", else one per CPU)")
+    parser.add_argument("--site", action="append", metavar="NAME",
+                        help="only consider this site (repeatable)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the inputs did not change")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be built and exit")
+    parser.add_argument("--state", metavar="JSON",
+                        help=f"digests and timings of the last run (default: CONFIG{STATE_SUFFIX})")
+    parser.add_argument("--verbose", "-v", action="store_true", help="print the output of every builder")
+    args = parser.parse_args()
+
+    try:
+        config, sites = load_config(args.config)
+    except (OSError, ValueError, KeyError) as e:
+        log(f"Invalid config {args.config}: {e}", "ERROR")
+        sys.exit(2)
+    if args.site:
+        unknown = set(args.site) - {site.name for site in sites}
+        if unknown:
+            log(f"Unknown sites: {', '.join(sorted(unknown))}", "ERROR")
+            sys.exit(2)
+        sites = [site for site in sites if site.name in args.site]
+    jobs = args.jobs or config.get("jobs") or os.cpu_count() or 1
+    state_path = args.state or args.config + STATE_SUFFIX
+    state = load_state(state_path)
+
+    wall = time.perf_counter()
+    missing = [site for site in sites if not os.path.isdir(site.root)]
+    for site in missing:
+        log(f"{site.name}: root {site.root} does not exist", "ERROR")
+    sites = [site for site in sites if site not in missing]
+
+    digests = scan_all(sites, jobs, state_path)
+    keys = {site.name: site.key(digests.get(site.root)) for site in sites}
+    todo = [site for site in sites if args.force or state.get(site.name, {}).get("key") != keys[site.name]]
+    for site in sites:
+        if site not in todo:
+            log(f"{site.name}: unchanged, skipped")
+
+    # Longest first, so the slowest site starts at once and the rest fill the other workers
+    todo.sort(key=lambda site: -state.get(site.name, {}).get("seconds", float("inf")))
+    if args.dry_run:
+        for site in todo:
+            log(f"{site.name}: would run {' '.join(site.command)} in {site.root}")
+        return
+
+    locks = output_locks(todo)
+    built, failed = 0, []
+    busy = 0.0
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(run_site, site, locks): site for site in todo}
+        for future in as_completed(futures):
+            site = futures[future]
+            ok, seconds, output = future.result()
+            busy += seconds
+            if args.verbose or not ok:
+                lines = output.rstrip("\n").split("\n")
+                shown = lines if args.verbose else lines[-OUTPUT_TAIL:]
+                print("\n".join(f"  [{site.name}] {line}" for line in shown), flush=True)
+            if ok:
+                built += 1
+                log(f"{site.name}: built in {seconds:.2f}s")
+                state[site.name] = {"key": keys[site.name], "seconds": round(seconds, 3),
+                                    "built": datetime.now().isoformat(timespec="seconds")}
+            else:
+                log(f"{site.name}: failed after {seconds:.2f}s", "ERROR")
+                failed.append(site)
+                state.pop(site.name, None)
+
+    save_state(state_path, state)
+    wall = time.perf_counter() - wall
+    log(f"{built} built, {len(sites) - len(todo)} unchanged, {len(failed) + len(missing)} failed "
+        f"in {wall:.2f}s ({busy:.2f}s of builder time on {jobs} workers)")
+    if failed or missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,27 @@
 #!/usr/bin/env python3
 
 import os
+import sys
 import shutil
 import stat
+import argparse
 import mimetypes
 from datetime import datetime
 from pathlib import Path
 
+# Helpers shared with the other builders: ../kbuild in a checkout, else where the Makefile installs it
+sys.path[:0] = [os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "kbuild"),
+                os.path.expanduser("~/.local/share/kbuild")]
+from kbuild import PROFILE, HIGHLIGHT_MAX_FILE, IndexStat, git_file_list, write_path_index, update_highlights
+
 KTREE_DIR = "__ktree"
 TEMPLATE_FILE = f"{KTREE_DIR}/treeview_template.html"
 OUTPUT_FILE = f"{KTREE_DIR}/treeview.html"
+PATH_INDEX = f"{KTREE_DIR}/paths.idx"
 INDEX_LINK = "index.html"
 SHARE_SRC = os.path.expanduser("~/.local/share/ktree")
+HIGHLIGHT_DIR = f"{KTREE_DIR}/hl"
+HIGHLIGHT_STYLE = "default"
 EXCLUDED_DIRS = {".git", "node_modules"}
 EXCLUDED_FILE_PATTERNS = (".out", ".so", ".so.1", ".swa", ".swp", ".rej", ".orig")
 
@@ -46,12 +56,12 @@ def copy_template_files():
     shutil.copytree(SHARE_SRC, KTREE_DIR, dirs_exist_ok=True)
     log(f"Copied template files to {KTREE_DIR}")
 
-def generate_file_entry(filepath, base_dir):
+def generate_file_entry(filepath, base_dir, stat_info=None):
     relpath = os.path.relpath(filepath, base_dir)
     filename = os.path.basename(filepath)
 
     try:
-        stat_info = os.stat(filepath)
+        stat_info = stat_info or os.stat(filepath)
         size = human_readable_size(stat_info.st_size)
         mtime = datetime.fromtimestamp(stat_info.st_mtime).strftime('%Y-%m-%d %H:%M')
         mimetype, _ = mimetypes.guess_type(filepath)
@@ -65,12 +75,13 @@ def generate_file_entry(filepath, base_dir):
     html = f"    <li><span class='file'><a href='#' onclick='openFile(event, \"{relpath}\")' target='main' title='{tooltip}'>{filename}</a></span></li>"
     return html
 
-def traverse_directory(dirpath, base_dir):
+def traverse_directory(dirpath, base_dir, paths):
     dirname = os.path.basename(dirpath)
     if is_excluded_dir(dirname):
         log(f"Skipping dir: {dirname}")
         return ""
 
+    PROFILE.count("dirs")
     html = [f"    <li><span class='folder'><a target='main'>{dirname}</a></span>\n    <ul>"]
 
     try:
@@ -80,10 +91,13 @@ def traverse_directory(dirpath, base_dir):
             if entry.is_symlink():
                 html.append(f"    <li><span class='file'><a target='main'>{name} (link)</a></span></li>")
             elif entry.is_dir():
-                html.append(traverse_directory(entry, base_dir))
+                html.append(traverse_directory(entry, base_dir, paths))
             elif entry.is_file() and not is_excluded_file(name):
+                PROFILE.count("files")
+                paths.append(os.path.relpath(entry, base_dir))
                 html.append(generate_file_entry(entry, base_dir))
             else:
+                PROFILE.count("skipped")
                 log(f"Skipped file: {entry}")
     except Exception as e:
         log(f"Error accessing {dirpath}: {e}")
@@ -91,23 +105,105 @@ def traverse_directory(dirpath, base_dir):
     html.append("    </ul></li>")
     return "\n".join(html)
 
-def generate_html(base_dir):
+def is_git_symlink(path, st):
+    # Index entries carry the link mode; re-stat'ed entries followed the link
+    if isinstance(st, IndexStat):
+        return stat.S_ISLNK(st.st_mode)
+    return os.path.islink(path)
+
+def traverse_git_dir(dirpath, rel_dir, children, files, base_dir, paths):
+    """Same markup as traverse_directory(), for the entries git lists below rel_dir"""
+    dirname = os.path.basename(dirpath)
+    if is_excluded_dir(dirname):
+        log(f"Skipping dir: {dirname}")
+        return ""
+
+    PROFILE.count("dirs")
+    html = [f"    <li><span class='folder'><a target='main'>{dirname}</a></span>\n    <ul>"]
+
+    entries = children.get(rel_dir, {})
+    for name in sorted(entries, key=lambda n: (not entries[n], n.lower())):
+        rel = f"{rel_dir}/{name}" if rel_dir else name
+        path = os.path.join(base_dir, rel)
+        if entries[name]:
+            html.append(traverse_git_dir(path, rel, children, files, base_dir, paths))
+        elif is_git_symlink(path, files[rel]):
+            html.append(f"    <li><span class='file'><a target='main'>{name} (link)</a></span></li>")
+        elif not is_excluded_file(name):
+            PROFILE.count("files")
+            paths.append(rel)
+            html.append(generate_file_entry(path, base_dir, files[rel]))
+        else:
+            PROFILE.count("skipped")
+            log(f"Skipped file: {path}")
+
+    html.append("    </ul></li>")
+    return "\n".join(html)
+
+def git_tree_html(base_dir, untracked, paths):
+    """File tree markup from the git index; None outside a repository"""
+    files = git_file_list(base_dir, untracked, log=log)
+    if files is None:
+        return None
+
+    children = {}  # directory -> {name: is_dir}
+    for rel in files:
+        parent, _, name = rel.rpartition("/")
+        children.setdefault(parent, {})[name] = False
+        while parent:
+            parent, _, name = parent.rpartition("/")
+            siblings = children.setdefault(parent, {})
+            if name in siblings:
+                break
+            siblings[name] = True
+
+    return traverse_git_dir(base_dir, "", children, files, base_dir, paths)
+
+def generate_html(base_dir, use_git=False, untracked=False, highlight=False):
     if not os.path.isfile(TEMPLATE_FILE):
         print(f"[ERROR] Missing template file: {TEMPLATE_FILE}")
         exit(1)
 
     log("Building HTML file tree...")
-    file_tree_html = traverse_directory(base_dir, base_dir)
-
-    with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
-        template = f.read()
-
-    content = template.replace("{file_tree}", file_tree_html)
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        f.write(content)
+    paths = []
+    with PROFILE.phase("scan"):
+        file_tree_html = git_tree_html(base_dir, untracked, paths) if use_git else None
+        if use_git and file_tree_html is None:
+            log(f"{base_dir} is not inside a git work tree, walking it instead")
+        if file_tree_html is None:
+            file_tree_html = traverse_directory(base_dir, base_dir, paths)
+
+    with PROFILE.phase("path_index"):
+        count = write_path_index(paths, PATH_INDEX)
+    log(f"Wrote path index: {PATH_INDEX} ({count} files)")
+
+    with PROFILE.phase("highlight"):
+        if highlight:
+            write_highlights(paths)
+        elif os.path.exists(HIGHLIGHT_DIR):
+            shutil.rmtree(HIGHLIGHT_DIR)
+            log(f"Removed {HIGHLIGHT_DIR}")
+
+    with PROFILE.phase("render_template"):
+        with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
+            template = f.read()
+        content = template.replace("{file_tree}", file_tree_html)
+
+    with PROFILE.phase("write"):
+        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+            f.write(content)
 
     log(f"Generated HTML: {OUTPUT_FILE}")
 
+def write_highlights(paths):
+    """Pre-render syntax highlighted pages for the listed text files (see kbuild.update_highlights)"""
+    stats = update_highlights(paths, HIGHLIGHT_DIR, HIGHLIGHT_STYLE)
+    if stats is None:
+        log("pygments is not installed, skipping --highlight")
+        return
+    log(f"Highlighted {stats['pages']} files: {HIGHLIGHT_DIR} ({stats['rendered']} rendered, "
+        f"{stats['reused']} unchanged, {stats['stale']} stale pages removed)")
+
 def create_symlink():
     target = os.path.join(KTREE_DIR, "home.html")
     if not os.path.exists(target):
@@ -119,10 +215,26 @@ def create_symlink():
     log(f"Created symlink: {INDEX_LINK} → {target}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate a Ktree HTML file tree for the current directory")
+    parser.add_argument("--git", action="store_true",
+                        help="list files from the git index instead of walking the tree")
+    parser.add_argument("--untracked", action="store_true",
+                        help="with --git, also include untracked files that are not ignored")
+    parser.add_argument("--highlight", action="store_true",
+                        help=f"pre-render highlighted pages for text files up to {HIGHLIGHT_MAX_FILE // 1024 // 1024} MiB")
+    parser.add_argument("--profile", metavar="JSON",
+                        help="write per-phase timings, call counts and peak RSS to JSON")
+    parser.add_argument("--cprofile", metavar="PSTATS",
+                        help="write a cProfile dump of the whole build")
+    args = parser.parse_args()
+    PROFILE.enable(args.profile, args.cprofile)
+
     os.makedirs(KTREE_DIR, exist_ok=True)
-    copy_template_files()
-    generate_html(os.getcwd())
+    with PROFILE.phase("copy_templates"):
+        copy_template_files()
+    generate_html(os.getcwd(), args.git, args.untracked, args.highlight)
     create_symlink()
+    PROFILE.finish()
     log("Done.")
 
 if __name__ == "__main__":
@@ -1,19 +1,42 @@
 #!/usr/bin/env python3
 import os
 import json
+import gzip
 import sys
-import shutil
+import zlib
+import hashlib
+import argparse
 import mimetypes
+from array import array
 from datetime import datetime
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader
+# jinja2, pygments and shutil are imported only when a render, highlight or copy is actually needed
+
+# Helpers shared with the other builders: ../kbuild in a checkout, else where the Makefile installs it
+sys.path[:0] = [os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "kbuild"),
+                os.path.expanduser("~/.local/share/kbuild")]
+from kbuild import PROFILE, HIGHLIGHT_MAX_FILE, git_file_list, write_path_index, update_highlights
 
 ROOT_DIR = "."
 HTML_DIR = "__xplore"
 INDEX_FILE = "index.html"
 TREE_DATA = os.path.join(HTML_DIR, "tree.json")
+TREE_DELTA = os.path.join(HTML_DIR, "tree.delta.json")
+PATH_INDEX = os.path.join(HTML_DIR, "paths.idx")
+SNAPSHOT_DIR = os.path.join(HTML_DIR, "snapshots")
+SNAPSHOT_INDEX = os.path.join(SNAPSHOT_DIR, "index.json")
+MAX_SNAPSHOTS = 50
 TEMPLATE_FILE = os.path.join(HTML_DIR, "index.html.in")
 SHARE_SRC = os.path.expanduser("~/.local/share/xplore-monaco")
+RENDER_STAMP = os.path.join(HTML_DIR, ".render-stamp")
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "xplore-monaco")
+JINJA_CACHE_DIR = os.path.join(CACHE_DIR, "jinja")
+PACK_DIR = os.path.join(HTML_DIR, "packs")
+PACK_INDEX = os.path.join(PACK_DIR, "index.json")
+PACK_MAX_FILE = 64 * 1024   # larger files stay standalone
+PACK_TARGET = 512 * 1024    # uncompressed bytes per pack; a directory is never split
+HIGHLIGHT_DIR = os.path.join(HTML_DIR, "hl")
+HIGHLIGHT_STYLE = "monokai"  # matches the vs-dark editor theme
 
 # Exclusion patterns
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
@@ -29,11 +52,9 @@ def log(msg, level="INFO"):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] [{level}] {msg}")
 
-def should_exclude(path):
-    """Determine if a path should be excluded"""
-    name = os.path.basename(path)
-
-    if os.path.isdir(path):
+def should_exclude(name, is_dir):
+    """Determine if an entry should be excluded"""
+    if is_dir:
         return name in EXCLUDED_DIRS or name.startswith('__')
 
     if (name in EXCLUDED_FILE_NAMES or
@@ -42,19 +63,8 @@ def should_exclude(path):
 
     return False
 
-def get_file_metadata(path):
-    """Get basic metadata for a file"""
-    stat_info = os.stat(path)
-    return {
-        "size": stat_info.st_size,
-        "mtime": stat_info.st_mtime,
-        "ctime": stat_info.st_ctime,
-        "mimetype": mimetypes.guess_type(path)[0] or "application/octet-stream"
-    }
-
-def sort_key(name, path):
+def sort_key(name, is_dir):
     """Return tuple for sorting: (category, lowercase name)"""
-    is_dir = os.path.isdir(path)
     is_hidden = name.startswith(".")
 
     # order: hidden folder → folder → hidden file → file
@@ -69,53 +79,521 @@ def sort_key(name, path):
 
     return (category, name.lower())
 
-def build_tree(root):
-    """Build the directory tree structure"""
-    tree = []
+class FileTree:
+    """
+    Compact scan result: parallel arrays indexed by node id, in scan pre-order.
+
+    Names and mimetypes are interned and paths are rebuilt from parent ids on
+    demand, so a node costs a few dozen bytes instead of a seven-key dict.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.parents = array("i")   # -1 for top-level entries
+        self.dirs = bytearray()
+        self.sizes = array("q")
+        self.mtimes = array("d")
+        self.ctimes = array("d")
+        self.mimes = array("H")      # index into mime_table
+        self.mime_table = []
+        self.mime_ids = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, parent, name, is_dir, stat_info, mimetype):
+        mime_id = self.mime_ids.get(mimetype)
+        if mime_id is None:
+            mime_id = self.mime_ids[mimetype] = len(self.mime_table)
+            self.mime_table.append(mimetype)
+
+        self.names.append(sys.intern(name))
+        self.parents.append(parent)
+        self.dirs.append(1 if is_dir else 0)
+        self.sizes.append(stat_info.st_size)
+        self.mtimes.append(stat_info.st_mtime)
+        self.ctimes.append(stat_info.st_ctime)
+        self.mimes.append(mime_id)
+        return len(self.names) - 1
+
+    def path(self, i):
+        parts = []
+        while i >= 0:
+            parts.append(self.names[i])
+            i = self.parents[i]
+        return "/".join(reversed(parts))
+
+    def node(self, i, path=None):
+        """Metadata of node i as written to tree.json (without children)"""
+        return {
+            "type": "dir" if self.dirs[i] else "file",
+            "name": self.names[i],
+            "path": path if path is not None else self.path(i),
+            "size": self.sizes[i],
+            "mtime": self.mtimes[i],
+            "ctime": self.ctimes[i],
+            "mimetype": self.mime_table[self.mimes[i]],
+        }
+
+    def total_size(self):
+        return sum(size for size, is_dir in zip(self.sizes, self.dirs) if not is_dir)
+
+    def iter_preorder(self):
+        """Yield (id, path) in scan order"""
+        dir_paths = {}
+        for i, (name, parent) in enumerate(zip(self.names, self.parents)):
+            path = name if parent < 0 else f"{dir_paths[parent]}/{name}"
+            if self.dirs[i]:
+                dir_paths[i] = path
+            yield i, path
+
+    def iter_sorted(self):
+        """Yield (id, path) ordered component by component (the snapshot order)"""
+        count = len(self)
+        first_child = array("i", [-1]) * (count + 1)  # slot `count` is the root
+        next_sibling = array("i", [-1]) * count
+        for i in range(count - 1, -1, -1):
+            parent = self.parents[i] if self.parents[i] >= 0 else count
+            next_sibling[i] = first_child[parent]
+            first_child[parent] = i
+
+        def children(d):
+            kids = []
+            c = first_child[d]
+            while c >= 0:
+                kids.append(c)
+                c = next_sibling[c]
+            kids.sort(key=self.names.__getitem__)
+            return iter(kids)
+
+        stack = [(children(count), "")]
+        while stack:
+            kids, prefix = stack[-1]
+            i = next(kids, None)
+            if i is None:
+                stack.pop()
+                continue
+            path = prefix + self.names[i]
+            yield i, path
+            if self.dirs[i]:
+                stack.append((children(i), path + "/"))
+
+def entry_is_dir(entry):
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
 
+def scan_dir(tree, root, parent):
+    """Append the entries of `root` (recursively) to the tree"""
     try:
-        entries = os.listdir(root)
+        with os.scandir(root) as it:
+            entries = [(entry, entry_is_dir(entry)) for entry in it]
     except PermissionError as e:
         log(f"Permission denied: {root} - {str(e)}", "WARN")
-        return tree
+        return
     except Exception as e:
         log(f"Error reading {root}: {str(e)}", "ERROR")
-        return tree
-
-    for entry in sorted(entries, key=lambda e: sort_key(e, os.path.join(root, e))):
-        path = os.path.join(root, entry)
-        rel_path = os.path.relpath(path, ROOT_DIR).replace("\\", "/")
+        return
 
-        if should_exclude(path):
+    for entry, is_dir in sorted(entries, key=lambda e: sort_key(e[0].name, e[1])):
+        if should_exclude(entry.name, is_dir):
+            rel_path = os.path.relpath(entry.path, ROOT_DIR).replace("\\", "/")
             log(f"Excluding: {rel_path}", "DEBUG")
+            PROFILE.count("excluded")
             continue
 
         try:
-            if os.path.isdir(path):
-                tree.append({
-                    "type": "dir",
-                    "name": entry,
-                    "path": rel_path,
-                    "children": build_tree(path),
-                    **get_file_metadata(path)
-                })
-            else:
-                tree.append({
-                    "type": "file",
-                    "name": entry,
-                    "path": rel_path,
-                    **get_file_metadata(path)
-                })
+            mimetype = mimetypes.guess_type(entry.path)[0] or "application/octet-stream"
+            node = tree.add(parent, entry.name, is_dir, entry.stat(), mimetype)
         except Exception as e:
-            log(f"Error processing {path}: {str(e)}", "ERROR")
+            log(f"Error processing {entry.path}: {str(e)}", "ERROR")
             continue
 
+        if is_dir:
+            PROFILE.count("dirs")
+            scan_dir(tree, entry.path, node)
+        else:
+            PROFILE.count("files")
+
+def build_tree(root):
+    """Build the directory tree structure"""
+    tree = FileTree()
+    scan_dir(tree, root, -1)
     return tree
 
+def add_git_dir(tree, root, rel_dir, children, files, parent):
+    """Append the git-listed entries below rel_dir (recursively) to the tree"""
+    entries = children.get(rel_dir, {})
+    for name in sorted(entries, key=lambda n: sort_key(n, entries[n])):
+        is_dir = entries[name]
+        rel = f"{rel_dir}/{name}" if rel_dir else name
+        if should_exclude(name, is_dir):
+            log(f"Excluding: {rel}", "DEBUG")
+            PROFILE.count("excluded")
+            continue
+
+        try:
+            path = os.path.join(root, rel)
+            stat_info = os.stat(path) if is_dir else files[rel]
+            mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            node = tree.add(parent, name, is_dir, stat_info, mimetype)
+        except Exception as e:
+            log(f"Error processing {rel}: {str(e)}", "ERROR")
+            continue
+
+        if is_dir:
+            PROFILE.count("dirs")
+            add_git_dir(tree, root, rel, children, files, node)
+        else:
+            PROFILE.count("files")
+
+def build_tree_from_git(root, untracked=False):
+    """Build the tree from the git index (ignored files never appear); None outside a repository"""
+    files = git_file_list(root, untracked, log=log)
+    if files is None:
+        return None
+
+    children = {}  # directory -> {name: is_dir}
+    for rel in files:
+        parent, _, name = rel.rpartition("/")
+        children.setdefault(parent, {})[name] = False
+        while parent:
+            parent, _, name = parent.rpartition("/")
+            siblings = children.setdefault(parent, {})
+            if name in siblings:
+                break
+            siblings[name] = True
+
+    tree = FileTree()
+    add_git_dir(tree, root, "", children, files, -1)
+    return tree
+
+def write_tree_json(tree, f):
+    """Stream the nested tree.json from the flat arrays"""
+    open_dirs = []
+    first = True
+    f.write("[")
+    for i, path in tree.iter_preorder():
+        parent = tree.parents[i]
+        while open_dirs and open_dirs[-1] != parent:
+            open_dirs.pop()
+            f.write("]}")
+            first = False
+        if not first:
+            f.write(",")
+
+        node = json.dumps(tree.node(i, path), ensure_ascii=False)
+        if tree.dirs[i]:
+            f.write(node[:-1] + ',"children":[')
+            open_dirs.append(i)
+            first = True
+        else:
+            f.write(node)
+            first = False
+    f.write("]}" * len(open_dirs) + "]")
+
+def path_key(path):
+    """Sort key matching FileTree.iter_sorted(): compare path component by component"""
+    return path.replace("/", "\0")
+
+def write_snapshot(path, snap_id, tree):
+    """
+    Write a snapshot as gzipped lines: a JSON header, then one
+    `common<TAB>type<TAB>size<TAB>mtime_delta<TAB>suffix` line per entry,
+    with front-coded paths and delta-coded mtimes (µs)
+    """
+    header = {"version": 2, "id": snap_id, "entries": len(tree), "total_size": tree.total_size()}
+    prev_path, prev_mtime = "", 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="\n") as f:
+        f.write(json.dumps(header) + "\n")
+        for i, node_path in tree.iter_sorted():
+            common = len(os.path.commonprefix((prev_path, node_path)))
+            suffix = node_path[common:]
+            if "\n" in suffix or "\r" in suffix or suffix.startswith('"'):
+                suffix = json.dumps(suffix)
+            mtime = round(tree.mtimes[i] * 1_000_000)
+            kind = "d" if tree.dirs[i] else "f"
+            f.write(f"{common}\t{kind}\t{tree.sizes[i]}\t{mtime - prev_mtime}\t{suffix}\n")
+            prev_path, prev_mtime = node_path, mtime
+    return header
+
+def iter_snapshot(info):
+    """Yield (path, type, size, mtime_us) of a stored snapshot in path_key() order"""
+    snap_path = os.path.join(SNAPSHOT_DIR, info["file"])
+    if info["file"].endswith(".json.gz"):
+        # version 1: one JSON document, sorted by plain path
+        with gzip.open(snap_path, "rt", encoding="utf-8") as f:
+            snap = json.load(f)
+        entries = []
+        prev_path, mtime = "", 0
+        for path, kind, size, delta in zip(snap["paths"], snap["types"], snap["sizes"], snap["mtimes"]):
+            if isinstance(path, list):
+                path = prev_path[:path[0]] + path[1]
+            mtime += delta
+            entries.append((path, "dir" if kind == "d" else "file", size, mtime))
+            prev_path = path
+        entries.sort(key=lambda e: path_key(e[0]))
+        yield from entries
+        return
+
+    with gzip.open(snap_path, "rt", encoding="utf-8", newline="\n") as f:
+        f.readline()  # header
+        prev_path, mtime = "", 0
+        for line in f:
+            common, kind, size, delta, suffix = line[:-1].split("\t", 4)
+            if suffix.startswith('"'):
+                suffix = json.loads(suffix)
+            path = prev_path[:int(common)] + suffix
+            mtime += int(delta)
+            yield path, "dir" if kind == "d" else "file", int(size), mtime
+            prev_path = path
+
+def load_snapshot_index():
+    try:
+        with open(SNAPSHOT_INDEX, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def save_snapshot(snap_id, tree, index):
+    """Store a snapshot and prune the oldest ones beyond MAX_SNAPSHOTS"""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    filename = f"{snap_id}.tsv.gz"
+    header = write_snapshot(os.path.join(SNAPSHOT_DIR, filename), snap_id, tree)
+
+    index.append({
+        "id": snap_id,
+        "file": filename,
+        "entries": header["entries"],
+        "total_size": header["total_size"],
+    })
+    for old in index[:-MAX_SNAPSHOTS]:
+        try:
+            os.remove(os.path.join(SNAPSHOT_DIR, old["file"]))
+        except OSError:
+            pass
+    index[:] = index[-MAX_SNAPSHOTS:]
+
+    with open(SNAPSHOT_INDEX, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1)
+
+def diff_snapshots(old_entries, tree):
+    """Sorted merge of the previous snapshot against the current scan"""
+    delta = {"added": [], "removed": [], "modified": [], "resized": []}
+    changed = lambda i, path: {"path": path, "size": tree.sizes[i],
+                               "mtime": tree.mtimes[i], "ctime": tree.ctimes[i]}
+
+    old_iter, new_iter = iter(old_entries), tree.iter_sorted()
+    old, new = next(old_iter, None), next(new_iter, None)
+    old_key = path_key(old[0]) if old else None
+    new_key = path_key(new[1]) if new else None
+
+    while old is not None or new is not None:
+        advance_old = advance_new = False
+        if new is None or (old is not None and old_key < new_key):
+            delta["removed"].append(old[0])
+            advance_old = True
+        elif old is None or new_key < old_key:
+            delta["added"].append(tree.node(*new))
+            advance_new = True
+        else:
+            i, path = new
+            if old[1] != ("dir" if tree.dirs[i] else "file"):
+                delta["removed"].append(old[0])
+                delta["added"].append(tree.node(i, path))
+            elif old[2] != tree.sizes[i]:
+                delta["resized"].append(changed(i, path))
+            elif old[3] != round(tree.mtimes[i] * 1_000_000):
+                delta["modified"].append(changed(i, path))
+            advance_old = advance_new = True
+
+        if advance_old:
+            old = next(old_iter, None)
+            old_key = path_key(old[0]) if old else None
+        if advance_new:
+            new = next(new_iter, None)
+            new_key = path_key(new[1]) if new else None
+
+    return delta
+
+def write_snapshot_and_delta(tree):
+    """Snapshot the scan and write tree.delta.json against the previous snapshot"""
+    snap_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    index = load_snapshot_index()
+    previous = index[-1] if index else None
+
+    delta = {"from": None, "to": snap_id, "added": [], "removed": [], "modified": [], "resized": []}
+    if previous:
+        try:
+            delta.update(diff_snapshots(iter_snapshot(previous), tree))
+            delta["from"] = previous["id"]
+        except Exception as e:
+            log(f"Failed to load snapshot {previous['file']}: {str(e)}", "WARN")
+
+    save_snapshot(snap_id, tree, index)
+
+    with open(TREE_DELTA, 'w', encoding='utf-8') as f:
+        json.dump(delta, f, ensure_ascii=False, separators=(",", ":"))
+
+    changes = sum(len(delta[k]) for k in ("added", "removed", "modified", "resized"))
+    log(f"Wrote tree delta → {TREE_DELTA} ({changes} changes since {delta['from'] or 'first scan'})")
+
+def report_history():
+    """Print disk growth across stored snapshots without re-scanning"""
+    index = load_snapshot_index()
+    if not index:
+        log("No snapshots found", "WARN")
+        return
+
+    prev = None
+    for info in index:
+        growth = "" if prev is None else f" ({info['total_size'] - prev['total_size']:+d} bytes, " \
+                                         f"{info['entries'] - prev['entries']:+d} entries)"
+        print(f"{info['id']}  {info['entries']:>10} entries  {info['total_size']:>16} bytes{growth}")
+        prev = info
+
+def pack_groups(tree):
+    """Small files grouped by directory; consecutive directories share a pack up to PACK_TARGET"""
+    by_dir = {}
+    for i, path in tree.iter_preorder():
+        # INDEX_FILE is rendered after the packs: always fetched on its own
+        if not tree.dirs[i] and tree.sizes[i] <= PACK_MAX_FILE and path != INDEX_FILE:
+            by_dir.setdefault(tree.parents[i], []).append((path, i))
+
+    group, size = [], 0
+    for members in by_dir.values():
+        group.extend(members)
+        size += sum(tree.sizes[i] for _, i in members)
+        if size >= PACK_TARGET:
+            yield group
+            group, size = [], 0
+    if group:
+        yield group
+
+def build_pack(members):
+    """Gzipped concatenation of the members' bytes and its [path, offset, length] index"""
+    blob, entries, offset = [], [], 0
+    for path, _ in members:
+        try:
+            with open(os.path.join(ROOT_DIR, path), "rb") as f:
+                data = f.read(PACK_MAX_FILE + 1)
+        except OSError as e:
+            log(f"Cannot pack {path}: {str(e)}", "WARN")
+            continue
+        if len(data) > PACK_MAX_FILE or b"\0" in data:
+            continue  # grew since the scan, or binary: fetched on its own
+        blob.append(data)
+        entries.append([path, offset, len(data)])
+        offset += len(data)
+    return gzip.compress(b"".join(blob), compresslevel=6, mtime=0), entries
+
+def write_packs(tree):
+    """
+    Bundle small text files into __xplore/packs/*.gz so the client loads a
+    whole directory with one request. Pack names are derived from the
+    members' paths, sizes and mtimes: unchanged packs are kept as they are.
+    """
+    try:
+        with open(PACK_INDEX, encoding="utf-8") as f:
+            previous = json.load(f).get("packs", {})
+    except (OSError, ValueError):
+        previous = {}
+
+    os.makedirs(PACK_DIR, exist_ok=True)
+    packs = {}
+    stats = {"files": 0, "bytes": 0, "written": 0, "reused": 0}
+    for members in pack_groups(tree):
+        key = hashlib.sha1()
+        for path, i in members:
+            key.update(f"{path}\0{tree.sizes[i]}\0{tree.mtimes[i]!r}\n".encode("utf-8", "surrogateescape"))
+        name = key.hexdigest()[:16] + ".gz"
+
+        if name in previous and os.path.exists(os.path.join(PACK_DIR, name)):
+            entries = previous[name]
+            stats["reused"] += 1
+        else:
+            data, entries = build_pack(members)
+            with open(os.path.join(PACK_DIR, name), "wb") as f:
+                f.write(data)
+            stats["written"] += 1
+        if entries:
+            packs[name] = entries
+            stats["files"] += len(entries)
+            stats["bytes"] += sum(length for _, _, length in entries)
+
+    tmp = PACK_INDEX + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "packs": packs}, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, PACK_INDEX)
+
+    for old in os.listdir(PACK_DIR):
+        if old.endswith(".gz") and old not in packs:
+            os.remove(os.path.join(PACK_DIR, old))
+
+    PROFILE.count("packed_files", stats["files"])
+    log(f"Wrote {len(packs)} packs → {PACK_DIR} ({stats['files']} files, {stats['bytes']} bytes, "
+        f"{stats['written']} written, {stats['reused']} unchanged)")
+
+def remove_packs():
+    """Without --packs the client must not find an index describing an older tree"""
+    if os.path.exists(PACK_DIR):
+        import shutil
+        shutil.rmtree(PACK_DIR)
+        log(f"Removed {PACK_DIR}")
+
+def write_highlights(tree):
+    """Pre-render syntax highlighted pages for the text files in the tree (see kbuild.update_highlights)"""
+    files = {path: [tree.sizes[i], tree.mtimes[i]] for i, path in tree.iter_preorder()
+             if not tree.dirs[i] and path != INDEX_FILE}
+    stats = update_highlights(files, HIGHLIGHT_DIR, HIGHLIGHT_STYLE, ROOT_DIR, stat_of=files.get,
+                              extra_css=".wrap .highlight pre { white-space: pre-wrap; word-break: break-all; }\n")
+    if stats is None:
+        log("pygments is not installed, skipping --highlight", "WARN")
+        return
+    log(f"Highlighted {stats['pages']} files → {HIGHLIGHT_DIR} ({stats['rendered']} rendered, "
+        f"{stats['reused']} unchanged, {stats['stale']} stale pages removed)")
+
+def remove_highlights():
+    """Without --highlight the client must fall back to the editor for every file"""
+    if os.path.exists(HIGHLIGHT_DIR):
+        import shutil
+        shutil.rmtree(HIGHLIGHT_DIR)
+        log(f"Removed {HIGHLIGHT_DIR}")
+
+def read_render_stamp():
+    try:
+        with open(RENDER_STAMP, encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def render_stamp(source, app_name, repo_url):
+    """Identify a render by template source, values and the resulting index.html"""
+    try:
+        st = os.stat(INDEX_FILE)
+    except OSError:
+        return None
+    values = json.dumps([app_name, repo_url]).encode()
+    return f"{zlib.crc32(source):08x}-{zlib.crc32(values):08x}-{st.st_size}-{st.st_mtime_ns}"
+
 def render_template(app_name="Xplore", repo_url="#"):
-    """Render HTML template with provided values"""
+    """Render HTML template with provided values (skipped when nothing changed)"""
     try:
-        env = Environment(loader=FileSystemLoader('.'))
+        with open(TEMPLATE_FILE, 'rb') as f:
+            source = f.read()
+
+        # BUILD_TIME differs on every run, so a template using it is always rendered
+        if b"BUILD_TIME" not in source:
+            stamp = render_stamp(source, app_name, repo_url)
+            if stamp and stamp == read_render_stamp():
+                log(f"{INDEX_FILE} is up to date")
+                return
+
+        from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+        os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+        env = Environment(loader=FileSystemLoader('.'),
+                          bytecode_cache=FileSystemBytecodeCache(JINJA_CACHE_DIR))
         template = env.get_template(TEMPLATE_FILE)
 
         rendered = template.render(
@@ -127,6 +605,8 @@ def render_template(app_name="Xplore", repo_url="#"):
 
         with open(INDEX_FILE, 'w', encoding='utf-8') as f:
             f.write(rendered)
+        with open(RENDER_STAMP, 'w', encoding='utf-8') as f:
+            f.write(render_stamp(source, app_name, repo_url))
 
         log(f"Updated {INDEX_FILE} with app name: '{app_name}'")
         if repo_url != "#":
@@ -136,54 +616,134 @@ def render_template(app_name="Xplore", repo_url="#"):
         log(f"Failed to render template: {str(e)}", "ERROR")
         sys.exit(1)
 
+def sync_dir(src_dir, dst_dir, stats):
+    """Copy files whose size or mtime differ from the destination (copy2 keeps mtime)"""
+    os.makedirs(dst_dir, exist_ok=True)
+    with os.scandir(src_dir) as it:
+        for entry in it:
+            dst = os.path.join(dst_dir, entry.name)
+            if entry.is_dir():
+                sync_dir(entry.path, dst, stats)
+                continue
+            st = entry.stat()
+            try:
+                dst_st = os.stat(dst)
+                if dst_st.st_size == st.st_size and dst_st.st_mtime_ns == st.st_mtime_ns:
+                    stats["unchanged"] += 1
+                    continue
+            except OSError:
+                pass
+            import shutil
+            shutil.copy2(entry.path, dst)
+            stats["copied"] += 1
+
 def copy_template_files():
-    """Copy template files with error handling"""
+    """Sync template files into HTML_DIR, skipping unchanged ones"""
     try:
         if not os.path.exists(SHARE_SRC):
             raise FileNotFoundError(f"Template directory not found: {SHARE_SRC}")
 
-        os.makedirs(HTML_DIR, exist_ok=True)
-
-        for item in os.listdir(SHARE_SRC):
-            src = os.path.join(SHARE_SRC, item)
-            dst = os.path.join(HTML_DIR, item)
+        stats = {"copied": 0, "unchanged": 0}
+        sync_dir(SHARE_SRC, HTML_DIR, stats)
+        PROFILE.count("templates_copied", stats["copied"])
 
-            if os.path.isdir(src):
-                shutil.copytree(src, dst, dirs_exist_ok=True)
-            else:
-                shutil.copy2(src, dst)
-
-        log(f"Copied template files to {HTML_DIR}")
+        log(f"Synced template files to {HTML_DIR} ({stats['copied']} copied, {stats['unchanged']} unchanged)")
     except Exception as e:
         log(f"Failed to copy templates: {str(e)}", "ERROR")
         sys.exit(1)
 
 def main():
     # Parse command line arguments
-    app_name = "Xplore"  # default value
-    repo_url = "#"       # default value
-
-    if len(sys.argv) > 1:
-        app_name = sys.argv[1]
-    if len(sys.argv) > 2:
-        repo_url = sys.argv[2]
-
-    copy_template_files()
+    parser = argparse.ArgumentParser(description="Build a static Xplore site for the current directory")
+    parser.add_argument("app_name", nargs="?", default="Xplore")
+    parser.add_argument("repo_url", nargs="?", default="#")
+    parser.add_argument("--history", action="store_true",
+                        help="print disk growth across stored snapshots and exit")
+    parser.add_argument("--git", action="store_true",
+                        help="list files from the git index instead of walking the tree")
+    parser.add_argument("--untracked", action="store_true",
+                        help="with --git, also include untracked files that are not ignored")
+    parser.add_argument("--packs", action="store_true",
+                        help=f"bundle text files up to {PACK_MAX_FILE // 1024} KiB into per-directory packs")
+    parser.add_argument("--highlight", action="store_true",
+                        help=f"pre-render highlighted pages for text files up to {HIGHLIGHT_MAX_FILE // 1024 // 1024} MiB")
+    parser.add_argument("--profile", metavar="JSON",
+                        help="write per-phase timings, call counts and peak RSS to JSON")
+    parser.add_argument("--cprofile", metavar="PSTATS",
+                        help="write a cProfile dump of the whole build")
+    args = parser.parse_args()
+
+    if args.history:
+        report_history()
+        return
+
+    PROFILE.enable(args.profile, args.cprofile)
+
+    with PROFILE.phase("copy_templates"):
+        copy_template_files()
 
     # Build file tree structure
     log(f"Scanning '{ROOT_DIR}'...")
-    tree = build_tree(ROOT_DIR)
+    with PROFILE.phase("scan"):
+        tree = build_tree_from_git(ROOT_DIR, args.untracked) if args.git else None
+        if args.git and tree is None:
+            log(f"'{ROOT_DIR}' is not inside a git work tree, walking it instead", "WARN")
+        if tree is None:
+            tree = build_tree(ROOT_DIR)
 
     try:
-        with open(TREE_DATA, 'w', encoding='utf-8') as f:
-            json.dump(tree, f, indent=2, ensure_ascii=False)
+        with PROFILE.phase("write_tree"), open(TREE_DATA, 'w', encoding='utf-8') as f:
+            write_tree_json(tree, f)
         log(f"Wrote file tree → {TREE_DATA} ({len(tree)} entries)")
     except Exception as e:
         log(f"Failed to save tree.json: {str(e)}", "ERROR")
         sys.exit(1)
 
+    # Quick-open index of file paths
+    try:
+        with PROFILE.phase("path_index"):
+            files = (path for i, path in tree.iter_preorder() if not tree.dirs[i])
+            count = write_path_index(files, PATH_INDEX)
+        log(f"Wrote path index → {PATH_INDEX} ({count} files)")
+    except Exception as e:
+        log(f"Failed to write path index: {str(e)}", "WARN")
+
+    # Snapshot this scan and diff it against the previous one
+    try:
+        with PROFILE.phase("snapshot_delta"):
+            write_snapshot_and_delta(tree)
+    except Exception as e:
+        log(f"Failed to write tree delta: {str(e)}", "WARN")
+        if os.path.exists(TREE_DELTA):
+            os.remove(TREE_DELTA)  # never leave a delta that does not match tree.json
+
+    # Small-file packs
+    try:
+        with PROFILE.phase("packs"):
+            if args.packs:
+                write_packs(tree)
+            else:
+                remove_packs()
+    except Exception as e:
+        log(f"Failed to write packs: {str(e)}", "WARN")
+        remove_packs()
+
+    # Syntax highlighted pages
+    try:
+        with PROFILE.phase("highlight"):
+            if args.highlight:
+                write_highlights(tree)
+            else:
+                remove_highlights()
+    except Exception as e:
+        log(f"Failed to write highlighted pages: {str(e)}", "WARN")
+        remove_highlights()
+
     # Render HTML template
-    render_template(app_name, repo_url)
+    with PROFILE.phase("render_template"):
+        render_template(args.app_name, args.repo_url)
+
+    PROFILE.finish()
 
 if __name__ == "__main__":
     main()
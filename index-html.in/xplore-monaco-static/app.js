@@ -27,7 +27,7 @@ function openTab(file) {
   tabEl.addEventListener("click", () => setActiveTab(file.path));
   document.getElementById("tabs").appendChild(tabEl);
 
-  openTabs.push({ path: file.path, name: file.name, content: file.content, tabEl });
+  openTabs.push({ path: file.path, name: file.name, content: file.content, highlight: file.highlight, tabEl });
   setActiveTab(file.path);
 }
 
@@ -38,7 +38,8 @@ function setActiveTab(path) {
     tab.tabEl.classList.toggle("active", tab.path === path);
   });
   const activeFile = openTabs.find(t => t.path === path);
-  if (activeFile) {
+  showHighlightView(activeFile && activeFile.highlight);
+  if (activeFile && !activeFile.highlight) {
     const ext = activeFile.name.split(".").pop().toLowerCase();
     const lang = getLanguageFromExt(ext);
     console.log("[Editor] Setting language:", lang);
@@ -47,6 +48,22 @@ function setActiveTab(path) {
   }
 }
 
+// Pre-rendered page (build.py --highlight) in place of the editor, or the editor when url is null
+function showHighlightView(url) {
+  const view = document.getElementById("highlight-view");
+  if (url && view.getAttribute("src") !== url) view.src = url;
+  view.hidden = !url;
+  document.getElementById("editor").style.display = url ? "none" : "";
+  document.body.classList.toggle("highlight-active", !!url);
+}
+
+function applyHighlightWrap() {
+  const doc = document.getElementById("highlight-view").contentDocument;
+  if (doc && doc.body) {
+    doc.body.classList.toggle("wrap", editor.getOption(monaco.editor.EditorOption.wordWrap) === "on");
+  }
+}
+
 function closeTab(path) {
   console.log("[Tab] Closing tab:", path);
   const index = openTabs.findIndex(t => t.path === path);
@@ -56,6 +73,7 @@ function closeTab(path) {
     if (activePath === path && openTabs.length > 0) {
       setActiveTab(openTabs[openTabs.length - 1].path);
     } else if (openTabs.length === 0) {
+      showHighlightView(null);
       editor.setValue("");
       activePath = null;
     }
@@ -96,6 +114,8 @@ require(["vs/editor/editor.main"], async function () {
     readOnly: true
   });
 
+  document.getElementById("highlight-view").addEventListener("load", applyHighlightWrap);
+
   console.log("[Tree] Loading full directory tree...");
   fullTree = await loadFullTree();
   console.log("[Tree] Full structure:", fullTree);
@@ -110,6 +130,15 @@ require(["vs/editor/editor.main"], async function () {
   const searchToggle = document.getElementById("search-toggle");
   const searchInput = document.getElementById("file-search");
 
+  // Ctrl-P: fuzzy path finder over the prebuilt paths.idx
+  const quickOpen = document.getElementById("quick-open");
+  setupQuickOpen(quickOpen, document.getElementById("quick-open-results"),
+                 "__xplore/paths.idx", (path) => {
+                   quickOpen.style.display = "none";
+                   loadFile(path);
+                 });
+  quickOpen.addEventListener("blur", () => { quickOpen.style.display = "none"; });
+
   searchToggle.addEventListener("click", () => {
     console.log("[Search] Toggle clicked");
     if (searchInput.style.display === "none") {
@@ -149,6 +178,7 @@ require(["vs/editor/editor.main"], async function () {
     editor.updateOptions({
       wordWrap: current === "on" ? "off" : "on"
     });
+    applyHighlightWrap();
   });
 
   document.getElementById("editor-symbols").addEventListener("click", () => {
@@ -162,14 +192,111 @@ require(["vs/editor/editor.main"], async function () {
   });
 });
 
-// Load static tree.json
+// Load static tree.json, or patch a cached copy with tree.delta.json when possible
+const TREE_CACHE_KEY = "xplore-tree:" + location.pathname;
+
 async function loadFullTree() {
+  let delta = null;
+  try {
+    const res = await fetch("__xplore/tree.delta.json", { cache: "no-cache" });
+    if (res.ok) delta = await res.json();
+  } catch (err) {
+    console.warn("[API] No tree delta:", err);
+  }
+
+  const cached = readCachedTree();
+  if (delta && cached) {
+    if (cached.id === delta.to) {
+      console.log("[API] Tree unchanged since", delta.to);
+      return cached.tree;
+    }
+    if (delta.from && cached.id === delta.from) {
+      console.log("[API] Applying tree delta", delta.from, "→", delta.to);
+      applyTreeDelta(cached.tree, delta);
+      writeCachedTree(delta.to, cached.tree);
+      return cached.tree;
+    }
+  }
+
   console.log("[API] Loading static tree.json");
   const res = await fetch("__xplore/tree.json");
   const tree = await res.json();
+  if (delta) writeCachedTree(delta.to, tree);
   return tree;
 }
 
+function readCachedTree() {
+  try {
+    return JSON.parse(localStorage.getItem(TREE_CACHE_KEY));
+  } catch (err) {
+    return null;
+  }
+}
+
+function writeCachedTree(id, tree) {
+  try {
+    localStorage.setItem(TREE_CACHE_KEY, JSON.stringify({ id, tree }));
+  } catch (err) {
+    console.warn("[Tree] Cannot cache tree:", err);
+    localStorage.removeItem(TREE_CACHE_KEY);
+  }
+}
+
+// Same order as build.py sort_key(): hidden folder → folder → hidden file → file
+function treeSortKey(node) {
+  const hidden = node.name.startsWith(".");
+  return (node.type === "dir" ? 0 : 2) + (hidden ? 0 : 1);
+}
+
+function compareNodes(a, b) {
+  const ka = treeSortKey(a), kb = treeSortKey(b);
+  if (ka !== kb) return ka - kb;
+  const na = a.name.toLowerCase(), nb = b.name.toLowerCase();
+  return na < nb ? -1 : na > nb ? 1 : 0;
+}
+
+// Apply added/removed/modified/resized entries from tree.delta.json in place
+function applyTreeDelta(tree, delta) {
+  const nodes = new Map();
+  const index = (list, parent) => list.forEach(node => {
+    nodes.set(node.path, { node, parent });
+    if (node.children) index(node.children, node.children);
+  });
+  index(tree, tree);
+
+  const parentList = path => {
+    const cut = path.lastIndexOf("/");
+    if (cut < 0) return tree;
+    const dir = nodes.get(path.slice(0, cut));
+    return dir ? dir.node.children : null;
+  };
+
+  delta.removed.forEach(path => {
+    const entry = nodes.get(path);
+    if (!entry) return;
+    const pos = entry.parent.indexOf(entry.node);
+    if (pos >= 0) entry.parent.splice(pos, 1);
+    nodes.delete(path);
+  });
+
+  // Parents sort before their children, so directories exist before their entries are added
+  const touched = new Set();
+  delta.added.slice().sort((a, b) => a.path < b.path ? -1 : 1).forEach(item => {
+    const list = parentList(item.path);
+    if (!list) return;
+    const node = item.type === "dir" ? { ...item, children: [] } : { ...item };
+    list.push(node);
+    touched.add(list);
+    nodes.set(node.path, { node, parent: list });
+  });
+  touched.forEach(list => list.sort(compareNodes));
+
+  delta.modified.concat(delta.resized).forEach(item => {
+    const entry = nodes.get(item.path);
+    if (entry) Object.assign(entry.node, item);
+  });
+}
+
 // Render tree from data
 function renderTree(data, container, autoExpandParents = false) {
   console.log("[Tree] Rendering...", { autoExpandParents, nodes: data.length });
@@ -206,6 +333,7 @@ function renderTree(data, container, autoExpandParents = false) {
         } else {
           li.classList.add("expanded");
           subUl.style.display = "block";
+          prefetchPack(item.children);
         }
       });
 
@@ -252,15 +380,111 @@ function searchTree(query, nodes) {
 }
 
 // Load file directly from /files/
+// Syntax highlighted pages rendered by build.py --highlight
+let highlightIndex = null;     // promise of Map path -> page name
+
+function loadHighlightIndex() {
+  if (!highlightIndex) {
+    highlightIndex = fetch("__xplore/hl/index.json", { cache: "no-cache" })
+      .then(res => res.ok ? res.json() : { files: {} })
+      .then(data => {
+        const map = new Map(Object.entries(data.files));
+        console.log(`[Highlight] ${map.size} pre-rendered files`);
+        return map;
+      })
+      .catch(() => new Map());
+  }
+  return highlightIndex;
+}
+
+// Small text files bundled by build.py --packs: one gzip request covers a whole directory
+const PACK_CACHE_LIMIT = 8;
+let packIndex = null;          // promise of Map path -> [pack, offset, length]
+const packCache = new Map();   // pack name -> promise of Uint8Array, oldest first
+
+function loadPackIndex() {
+  if (!packIndex) {
+    packIndex = fetch("__xplore/packs/index.json", { cache: "no-cache" })
+      .then(res => res.ok ? res.json() : { packs: {} })
+      .then(data => {
+        const map = new Map();
+        for (const [pack, files] of Object.entries(data.packs)) {
+          for (const [path, offset, length] of files) map.set(path, [pack, offset, length]);
+        }
+        console.log(`[Packs] ${map.size} files in ${Object.keys(data.packs).length} packs`);
+        return map;
+      })
+      .catch(() => new Map());
+  }
+  return packIndex;
+}
+
+function loadPack(name) {
+  let pending = packCache.get(name);
+  if (pending) {
+    packCache.delete(name);
+  } else {
+    pending = fetch(`__xplore/packs/${name}`)
+      .then(res => {
+        if (!res.ok) throw new Error(`${name}: ${res.status}`);
+        return res.arrayBuffer();
+      })
+      .then(buf => {
+        // Some servers send .gz with Content-Encoding: the browser already inflated it
+        const bytes = new Uint8Array(buf);
+        if (bytes[0] !== 0x1f || bytes[1] !== 0x8b) return bytes;
+        const stream = new Blob([buf]).stream().pipeThrough(new DecompressionStream("gzip"));
+        return new Response(stream).arrayBuffer().then(out => new Uint8Array(out));
+      });
+    pending.catch(() => packCache.delete(name));
+  }
+  packCache.set(name, pending);
+  while (packCache.size > PACK_CACHE_LIMIT) packCache.delete(packCache.keys().next().value);
+  return pending;
+}
+
+// Text of `path` from its pack, or null when it is not packed (or packs are unusable)
+async function readPacked(path) {
+  if (typeof DecompressionStream === "undefined") return null;
+  const entry = (await loadPackIndex()).get(path);
+  if (!entry) return null;
+  try {
+    const [pack, offset, length] = entry;
+    const data = await loadPack(pack);
+    return new TextDecoder().decode(data.subarray(offset, offset + length));
+  } catch (err) {
+    console.warn("[Packs] Falling back to a direct fetch:", err);
+    return null;
+  }
+}
+
+// Fetch the pack of an expanded folder's files before one is clicked
+async function prefetchPack(children) {
+  if (typeof DecompressionStream === "undefined" || !children) return;
+  const file = children.find(c => c.type !== "dir");
+  if (!file) return;
+  const entry = (await loadPackIndex()).get(file.path);
+  if (entry) loadPack(entry[0]).catch(() => {});
+}
+
 async function loadFile(path) {
+  const page = (await loadHighlightIndex()).get(path);
+  if (page) {
+    console.log("[API] Loading highlighted page:", path);
+    openTab({ name: path.split("/").pop(), path, highlight: `__xplore/hl/${page}` });
+    return;
+  }
   console.log("[API] Loading raw file:", path);
   try {
-    const res = await fetch(`${path}`);
-    if (!res.ok) {
-      alert(`Error loading file: ${path}`);
-      return;
+    let text = await readPacked(path);
+    if (text === null) {
+      const res = await fetch(`${path}`);
+      if (!res.ok) {
+        alert(`Error loading file: ${path}`);
+        return;
+      }
+      text = await res.text();
     }
-    const text = await res.text();
     const name = path.split("/").pop();
     openTab({
       name,
@@ -0,0 +1,214 @@
+// Quick-open (Ctrl-P) path finder over the build-time paths.idx
+// (format: write_path_index() in build_html/kbuild/kbuild.py; shared by xplore and ktree)
+
+class PathIndex {
+  static async load(url) {
+    const res = await fetch(url);
+    if (!res.ok) throw new Error(`Cannot load ${url}: ${res.status}`);
+    return new PathIndex(await res.arrayBuffer());
+  }
+
+  constructor(buffer) {
+    const head = new DataView(buffer, 0, 24);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== "PIDX" || head.getUint32(4, true) !== 1) {
+      throw new Error("Unsupported path index");
+    }
+    const nPaths = head.getUint32(8, true);
+    const nGrams = head.getUint32(12, true);
+    const postingsLen = head.getUint32(16, true);
+    const pathsLen = head.getUint32(20, true);
+
+    let offset = 24;
+    this.masks = new Uint32Array(buffer, offset, nPaths);
+    offset += nPaths * 4;
+    this.gramKeys = new Uint32Array(buffer, offset, nGrams);
+    offset += nGrams * 4;
+    this.gramOffs = new Uint32Array(buffer, offset, nGrams + 1);
+    offset += (nGrams + 1) * 4;
+    this.postings = new Uint8Array(buffer, offset, postingsLen);
+    offset += postingsLen;
+    const blob = new TextDecoder().decode(new Uint8Array(buffer, offset, pathsLen));
+    this.paths = nPaths ? blob.split("\n") : [];
+    this.lowerPaths = this.paths.map(p => p.toLowerCase());
+  }
+
+  // Position of trigram `key` in gramKeys, or -1
+  findGram(key) {
+    let lo = 0, hi = this.gramKeys.length - 1;
+    while (lo <= hi) {
+      const mid = (lo + hi) >> 1;
+      const k = this.gramKeys[mid];
+      if (k === key) return mid;
+      if (k < key) lo = mid + 1; else hi = mid - 1;
+    }
+    return -1;
+  }
+
+  // Path ids listed under trigram number `g`
+  gramPostings(g) {
+    const ids = [];
+    let pid = -1, delta = 0, shift = 0;
+    for (let i = this.gramOffs[g]; i < this.gramOffs[g + 1]; i++) {
+      const b = this.postings[i];
+      delta |= (b & 0x7f) << shift;
+      if (b & 0x80) {
+        shift += 7;
+      } else {
+        pid += delta;
+        ids.push(pid);
+        delta = 0;
+        shift = 0;
+      }
+    }
+    return ids;
+  }
+
+  // Ids whose file name contains `name`, or null when `name` is too short for trigrams.
+  // Only the rarest trigram is decoded; its ids are then checked directly.
+  nameCandidates(name) {
+    const bytes = new TextEncoder().encode(name);
+    if (bytes.length < 3) return null;
+    let rarest = -1;
+    for (let i = 0; i + 3 <= bytes.length; i++) {
+      const g = this.findGram((bytes[i] << 16) | (bytes[i + 1] << 8) | bytes[i + 2]);
+      if (g < 0) return [];
+      if (rarest < 0 || this.gramOffs[g + 1] - this.gramOffs[g] < this.gramOffs[rarest + 1] - this.gramOffs[rarest]) {
+        rarest = g;
+      }
+    }
+    return this.gramPostings(rarest).filter(id => {
+      const path = this.lowerPaths[id];
+      return path.indexOf(name, path.lastIndexOf("/") + 1) >= 0;
+    });
+  }
+
+  search(query, limit = 50) {
+    const q = query.toLowerCase().replace(/\s+/g, "");
+    if (!q) return [];
+    const name = q.slice(q.lastIndexOf("/") + 1);
+    const scored = new Map();
+    const consider = (id) => {
+      if (scored.has(id)) return;
+      const score = fuzzyScore(q, this.lowerPaths[id]);
+      if (score !== null) scored.set(id, score);
+    };
+
+    // Substring matches on the file name come straight from the trigram lists
+    const candidates = this.nameCandidates(name);
+    if (candidates) candidates.forEach(consider);
+
+    // Fuzzy (subsequence) matches: reject on the character-class mask first
+    if (scored.size < limit) {
+      const qmask = charMask(q);
+      const budget = limit * 10;
+      for (let id = 0; id < this.masks.length && scored.size < budget; id++) {
+        if ((this.masks[id] & qmask) === qmask) consider(id);
+      }
+    }
+
+    return [...scored.entries()]
+      .sort((a, b) => b[1] - a[1] || this.paths[a[0]].length - this.paths[b[0]].length)
+      .slice(0, limit)
+      .map(([id]) => this.paths[id]);
+  }
+}
+
+function charMask(text) {
+  let mask = 0;
+  for (const ch of text) {
+    if (ch >= "a" && ch <= "z") mask |= 1 << (ch.charCodeAt(0) - 97);
+    else if (ch >= "0" && ch <= "9") mask |= 1 << 26;
+    else if (ch === ".") mask |= 1 << 27;
+    else if (ch === "_") mask |= 1 << 28;
+    else if (ch === "-") mask |= 1 << 29;
+    else if (ch !== "/" && ch !== " ") mask |= 1 << 30;
+  }
+  return mask >>> 0;
+}
+
+// Subsequence match of `q` in `path`, favouring runs, word starts and the file name
+function fuzzyScore(q, path) {
+  const nameStart = path.lastIndexOf("/") + 1;
+  let score = 0, run = 0, pi = path.length - 1;
+  // Match from the end so the file name gets the characters it can take
+  for (let qi = q.length - 1; qi >= 0; qi--) {
+    const ch = q[qi];
+    while (pi >= 0 && path[pi] !== ch) { pi--; run = 0; }
+    if (pi < 0) return null;
+    run++;
+    score += 1 + run * 2;
+    const prev = pi > 0 ? path[pi - 1] : "/";
+    if (prev === "/" || prev === "." || prev === "_" || prev === "-") score += 4;
+    if (pi >= nameStart) score += 3;
+    pi--;
+  }
+  return score;
+}
+
+// Wire an <input> and a result <ul> to the index at `url`; `open(path, event)` opens a hit
+function setupQuickOpen(input, list, url, open) {
+  let index = null;
+  let loading = null;
+  let selected = 0;
+  let results = [];
+
+  const ensureIndex = () => {
+    if (!loading) {
+      loading = PathIndex.load(url)
+        .then(idx => { index = idx; console.log(`[QuickOpen] ${idx.paths.length} paths`); })
+        .catch(err => console.error("[QuickOpen]", err));
+    }
+    return loading;
+  };
+
+  const render = () => {
+    list.innerHTML = "";
+    results.forEach((path, i) => {
+      const li = document.createElement("li");
+      li.textContent = path;
+      li.title = path;
+      if (i === selected) li.classList.add("selected");
+      li.addEventListener("mousedown", (e) => { e.preventDefault(); open(path, e); });
+      list.appendChild(li);
+    });
+    list.style.display = results.length ? "block" : "none";
+  };
+
+  input.addEventListener("focus", ensureIndex);
+  input.addEventListener("input", async () => {
+    await ensureIndex();
+    if (!index) return;
+    const start = performance.now();
+    results = index.search(input.value);
+    selected = 0;
+    console.log(`[QuickOpen] "${input.value}": ${results.length} hits in ${(performance.now() - start).toFixed(1)} ms`);
+    render();
+  });
+  input.addEventListener("keydown", (e) => {
+    if (e.key === "ArrowDown" || e.key === "ArrowUp") {
+      e.preventDefault();
+      if (!results.length) return;
+      selected = (selected + (e.key === "ArrowDown" ? 1 : results.length - 1)) % results.length;
+      render();
+    } else if (e.key === "Enter" && results.length) {
+      e.preventDefault();
+      open(results[selected], e);
+    } else if (e.key === "Escape") {
+      input.value = "";
+      results = [];
+      render();
+      input.blur();
+    }
+  });
+  input.addEventListener("blur", () => { list.style.display = "none"; });
+
+  document.addEventListener("keydown", (e) => {
+    if ((e.ctrlKey || e.metaKey) && e.key.toLowerCase() === "p") {
+      e.preventDefault();
+      input.style.display = "block";
+      input.focus();
+      input.select();
+    }
+  });
+}
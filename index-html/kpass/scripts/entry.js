@@ -24,6 +24,9 @@ async function kpass_add_list(entries) {
     // Get the container where cards will be added
     const container = document.getElementById('card-container');
     container.innerHTML = ''; // Clear any existing content
+    entryCache = null;        // New list: batch-fetch again on first reveal
+    batchFailed = false;
+    batchLoading = null;      // a batch still running for the old list is discarded
 
     // Loop through each entry and create a card
     entries.forEach(entry => {
@@ -110,8 +113,77 @@ async function toggle_password(id, passwordElement, button) {
     }
 }
 
+/* Entries of the current group: the first reveal is answered by /entry/<id> while
+ * POST /entries fills this cache in the background for the later ones */
+const MAX_BATCH_IDS = 256;   // server-side limit of one /entries request
+let entryCache = null;
+let batchFailed = false;     // set once /entries fails: later reveals use /entry/<id> directly
+let batchLoading = null;
+
+async function kpass_fetch_batch(ids) {
+    const response = await fetch('/entries', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ ids: ids })
+    });
+    if (!response.ok) {
+        throw new Error(`Error fetching entries: ${response.status} ${response.statusText}`);
+    }
+
+    const data = await response.json();
+    Object.entries(data.errors || {}).forEach(([id, error]) => {
+        console.log(`Entry ${id}: ${error}`);
+    });
+    return data.entries || {};
+}
+
+async function kpass_fetch_group() {
+    const ids = Array.from(document.querySelectorAll('#card-container .card'))
+        .map(card => card.id.replace(/^entry-/, ''));
+
+    // One batch at a time: the server already runs each batch in parallel
+    const cache = {};
+    for (let i = 0; i < ids.length; i += MAX_BATCH_IDS) {
+        Object.assign(cache, await kpass_fetch_batch(ids.slice(i, i + MAX_BATCH_IDS)));
+    }
+    return cache;
+}
+
+function kpass_prefetch_group() {
+    if (entryCache || batchFailed || batchLoading) {
+        return;
+    }
+    const loading = batchLoading = kpass_fetch_group()
+        .then(cache => {
+            if (batchLoading === loading) entryCache = cache;
+        })
+        .catch(error => {
+            // Servers without /entries: keep using one lookup per entry
+            console.log(`Batch lookup unavailable: ${error}`);
+            if (batchLoading === loading) batchFailed = true;
+        })
+        .finally(() => {
+            if (batchLoading === loading) batchLoading = null;
+        });
+}
+
 async function get_entry_password(id, passwordElement, button) {
-    fetch(`/entry/${id}`)
+    const data = entryCache && entryCache[id];
+    if (data && typeof data === 'object' && String(data.id) === String(id)) {
+        passwordElement.textContent = `${data.password}`;
+        passwordElement.dataset.hidden = 'false'; // Show password
+        return;
+    }
+
+    const reveal = get_single_entry_password(id, passwordElement, button);
+    kpass_prefetch_group();
+    return reveal;
+}
+
+async function get_single_entry_password(id, passwordElement, button) {
+    return fetch(`/entry/${id}`)
         .then(response => {
             console.log(`Get entry: ${id}`);
             if (!response.ok) {
@@ -122,7 +194,7 @@ async function get_entry_password(id, passwordElement, button) {
         .then(data => {
             //console.log('Server response:', data);
 
-            if (data && typeof data === 'object' && data.id === id) {
+            if (data && typeof data === 'object' && String(data.id) === String(id)) {
                 //console.log(`Matched entry ID: ${data.id}`);
                 passwordElement.textContent = `${data.password}`;
                 passwordElement.dataset.hidden = 'false'; // Show password
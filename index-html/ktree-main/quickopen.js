@@ -0,0 +1 @@
+../../index-html.in/xplore-monaco-static/quickopen.js
\ No newline at end of file
@@ -27,7 +27,7 @@ function openTab(file) {
   tabEl.addEventListener("click", () => setActiveTab(file.path));
   document.getElementById("tabs").appendChild(tabEl);
 
-  openTabs.push({ path: file.path, name: file.name, content: file.content, tabEl });
+  openTabs.push({ path: file.path, name: file.name, content: file.content, size: file.size, tabEl, follow: null });
   setActiveTab(file.path);
 }
 
@@ -45,12 +45,14 @@ function setActiveTab(path) {
     monaco.editor.setModelLanguage(editor.getModel(), lang);
     editor.setValue(activeFile.content);
   }
+  updateFollowButton();
 }
 
 function closeTab(path) {
   console.log("[Tab] Closing tab:", path);
   const index = openTabs.findIndex(t => t.path === path);
   if (index !== -1) {
+    stopFollow(openTabs[index]);
     openTabs[index].tabEl.remove();
     openTabs.splice(index, 1);
     if (activePath === path && openTabs.length > 0) {
@@ -58,10 +60,54 @@ function closeTab(path) {
     } else if (openTabs.length === 0) {
       editor.setValue("");
       activePath = null;
+      updateFollowButton();
     }
   }
 }
 
+// Live tail: /api/tail streams only the bytes appended after tab.size
+function startFollow(tab) {
+  console.log("[Follow] Start:", tab.path, "from", tab.size);
+  const source = new EventSource(`/api/tail?path=${encodeURIComponent(tab.path)}&offset=${tab.size}`);
+  source.addEventListener("append", (e) => {
+    const msg = JSON.parse(e.data);
+    tab.size = msg.offset;
+    tab.content += msg.data;
+    if (activePath === tab.path) appendToEditor(msg.data);
+  });
+  const restart = (e) => {
+    console.log("[Follow] File truncated or rotated:", tab.path, e.type);
+    tab.size = 0;
+    tab.content = "";
+    if (activePath === tab.path) editor.setValue("");
+  };
+  source.addEventListener("reset", restart);
+  source.addEventListener("rotate", restart);
+  source.onerror = () => console.warn("[Follow] Connection lost, retrying:", tab.path);
+  tab.follow = source;
+}
+
+function stopFollow(tab) {
+  if (tab.follow) {
+    console.log("[Follow] Stop:", tab.path);
+    tab.follow.close();
+    tab.follow = null;
+  }
+}
+
+function appendToEditor(text) {
+  const model = editor.getModel();
+  const lastLine = model.getLineCount();
+  const lastCol = model.getLineMaxColumn(lastLine);
+  model.applyEdits([{ range: new monaco.Range(lastLine, lastCol, lastLine, lastCol), text }]);
+  editor.revealLine(model.getLineCount());
+}
+
+function updateFollowButton() {
+  const tab = openTabs.find(t => t.path === activePath);
+  document.getElementById("editor-follow").classList.toggle("active", !!(tab && tab.follow));
+}
+
 let editor;
 let selectedItem = null;
 let fullTree = null;
@@ -80,7 +126,9 @@ require(["vs/editor/editor.main"], async function () {
   console.log("[Tree] Loading full directory tree...");
   fullTree = await loadFullTree("");
   console.log("[Tree] Full structure:", fullTree);
+  treeNodes.set("", { item: { children: fullTree }, ul: document.getElementById("file-tree") });
   renderTree(fullTree, document.getElementById("file-tree"));
+  startTreeWatch();
 
   const searchToggle = document.getElementById("search-toggle");
   const searchInput = document.getElementById("file-search");
@@ -135,20 +183,136 @@ require(["vs/editor/editor.main"], async function () {
     console.log("[Editor] Search in file");
     editor.getAction("actions.find").run();
   });
+
+  document.getElementById("editor-follow").addEventListener("click", () => {
+    const tab = openTabs.find(t => t.path === activePath);
+    if (!tab || tab.size === undefined) return;
+    if (tab.follow) {
+      stopFollow(tab);
+    } else {
+      startFollow(tab);
+      editor.revealLine(editor.getModel().getLineCount());
+    }
+    updateFollowButton();
+  });
 });
 
-// Recursively fetch the entire tree
+// Levels and entries requested per /api/tree call
+const TREE_DEPTH = 8;
+const TREE_LIMIT = 5000;
+
+// Fetch the entire tree: each call returns a multi-level subtree, and only
+// directories the server did not expand (depth/entry budget) are fetched again
 async function loadFullTree(path) {
-  console.log("[API] GET /api/tree", { path });
-  const res = await fetch(`/api/tree?path=${encodeURIComponent(path)}`);
+  console.log("[API] GET /api/tree", { path, depth: TREE_DEPTH });
+  const res = await fetch(`/api/tree?path=${encodeURIComponent(path)}&depth=${TREE_DEPTH}&limit=${TREE_LIMIT}`);
   const items = await res.json();
   console.log("[API] Tree response:", items);
+  await loadMissingChildren(items);
+  return items;
+}
+
+async function loadMissingChildren(items) {
+  const pending = [];
   for (const item of items) {
-    if (item.type === "dir") {
-      item.children = await loadFullTree(item.path);
+    if (item.type !== "dir") continue;
+    if (item.children) {
+      pending.push(loadMissingChildren(item.children));
+    } else {
+      pending.push(loadFullTree(item.path).then(children => { item.children = children; }));
     }
   }
-  return items;
+  await Promise.all(pending);
+}
+
+// Live updates: expanded directories are subscribed on /api/watch, and a
+// "change" event re-lists just that directory
+const expandedDirs = new Set([""]);
+const treeNodes = new Map();   // dir path -> { item, ul } of the rendered (unfiltered) tree
+let watchId = null;
+let watchSyncTimer = null;
+
+function startTreeWatch() {
+  const source = new EventSource(`/api/watch?path=`);
+  source.addEventListener("hello", (e) => {
+    const reconnected = watchId !== null;
+    watchId = JSON.parse(e.data).id;
+    console.log("[Watch] Subscribed:", watchId);
+    syncWatch();
+    // Events may have been missed while disconnected
+    if (reconnected) [...expandedDirs].forEach(refreshDir);
+  });
+  source.addEventListener("change", (e) => {
+    const { dirs } = JSON.parse(e.data);
+    console.log("[Watch] Changed:", dirs);
+    dirs.forEach(refreshDir);
+  });
+  source.addEventListener("resync", (e) => {
+    // Lost events, or directories that lost their watch (deleted): re-list and subscribe again
+    console.log("[Watch] Resync, re-listing expanded directories", JSON.parse(e.data));
+    syncWatch();
+    [...expandedDirs].forEach(refreshDir);
+  });
+}
+
+// Send the expanded set once clicks settle
+function syncWatch() {
+  clearTimeout(watchSyncTimer);
+  watchSyncTimer = setTimeout(() => {
+    if (!watchId) return;
+    fetch(`/api/watch/${watchId}`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ dirs: [...expandedDirs] })
+    }).catch(err => console.error("[Watch] Subscribe failed:", err));
+  }, 200);
+}
+
+// Re-list one directory, keeping the already loaded subtrees of unchanged children
+async function refreshDir(path) {
+  const node = treeNodes.get(path);
+  if (!node) return;
+  const res = await fetch(`/api/tree?path=${encodeURIComponent(path)}&depth=1`);
+  if (!res.ok) return;
+  const items = await res.json();
+  const previous = new Map((node.item.children || []).map(child => [child.name, child]));
+  const added = [];
+  for (const item of items) {
+    const old = previous.get(item.name);
+    if (item.type !== "dir") continue;
+    if (old && old.type === "dir" && old.children) {
+      item.children = old.children;
+    } else {
+      delete item.children;
+      added.push(item);
+    }
+  }
+  await loadMissingChildren(added);
+
+  // Mutate in place: fullTree (and the search) shares these arrays
+  node.item.children = node.item.children || [];
+  node.item.children.splice(0, node.item.children.length, ...items);
+  const names = new Set(items.map(item => item.name));
+  for (const [name, old] of previous) {
+    if (!names.has(name) && old.type === "dir") forgetDir(old.path);
+  }
+
+  const searchInput = document.getElementById("file-search");
+  if (searchInput.value.trim()) {
+    searchInput.dispatchEvent(new Event("input"));
+  } else {
+    renderTree(node.item.children, node.ul);
+  }
+}
+
+function forgetDir(path) {
+  for (const dir of [...expandedDirs]) {
+    if (dir === path || dir.startsWith(path + "/")) expandedDirs.delete(dir);
+  }
+  for (const dir of [...treeNodes.keys()]) {
+    if (dir === path || dir.startsWith(path + "/")) treeNodes.delete(dir);
+  }
+  syncWatch();
 }
 
 // Render tree from data
@@ -177,6 +341,13 @@ function renderTree(data, container, autoExpandParents = false) {
         li.classList.add("expanded");
         subUl.style.display = "block";
       }
+      if (!autoExpandParents) {
+        treeNodes.set(item.path, { item, ul: subUl });
+        if (expandedDirs.has(item.path)) {
+          li.classList.add("expanded");
+          subUl.style.display = "block";
+        }
+      }
 
       li.addEventListener("click", (e) => {
         e.stopPropagation();
@@ -184,10 +355,13 @@ function renderTree(data, container, autoExpandParents = false) {
         if (li.classList.contains("expanded")) {
           li.classList.remove("expanded");
           subUl.style.display = "none";
+          expandedDirs.delete(item.path);
         } else {
           li.classList.add("expanded");
           subUl.style.display = "block";
+          expandedDirs.add(item.path);
         }
+        syncWatch();
       });
 
       if (item.children && item.children.length) {
@@ -6,6 +6,43 @@ window.onload = function () {
     const breadcrumb = document.getElementById('breadcrumb');
     const breadcrumbContainer = document.querySelector('.breadcrumb-container');
 
+    // Live updates: the shown directory is subscribed on /api/watch and
+    // re-listed when the server reports a change in it
+    let shownPath = null;
+    let watchId = null;
+
+    function watchKey(path) {
+        return path.split('/').filter(Boolean).join('/');
+    }
+
+    function startWatch() {
+        const source = new EventSource('/api/watch');
+        source.addEventListener('hello', (e) => {
+            const reconnected = watchId !== null;
+            watchId = JSON.parse(e.data).id;
+            syncWatch();
+            if (reconnected && shownPath !== null) fetchFiles(shownPath);
+        });
+        source.addEventListener('change', (e) => {
+            const { dirs } = JSON.parse(e.data);
+            if (shownPath !== null && dirs.includes(watchKey(shownPath))) fetchFiles(shownPath);
+        });
+        source.addEventListener('resync', () => {
+            // Lost events, or the shown directory lost its watch: re-list and subscribe again
+            syncWatch();
+            if (shownPath !== null) fetchFiles(shownPath);
+        });
+    }
+
+    function syncWatch() {
+        if (!watchId || shownPath === null) return;
+        fetch(`/api/watch/${watchId}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ dirs: [watchKey(shownPath)] })
+        }).catch(err => console.error('Error updating watch:', err));
+    }
+
     function updateBreadcrumb(path) {
         breadcrumb.innerHTML = '';
         breadcrumbPaths = [];
@@ -51,17 +88,63 @@ window.onload = function () {
             .catch(err => console.error('Error fetching disk usage:', err));
     }
 
+    // Columnar listing (/api/files?format=binary, see encode_columns() in server.py):
+    // raw sizes and epoch mtimes arrive as typed arrays and are formatted here
+    const LIST_DIR = 1, LIST_ARCHIVE = 2, LIST_THUMB = 4;
+    const dateFormat = new Intl.DateTimeFormat(undefined, { dateStyle: 'short', timeStyle: 'medium' });
+
+    function decodeColumns(buffer, path) {
+        const view = new DataView(buffer);
+        const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+        if (magic !== 'XCOL' || view.getUint32(4, true) !== 1) {
+            throw new Error('Unsupported listing format');
+        }
+        const count = view.getUint32(8, true);
+        const namesLen = view.getUint32(12, true);
+        let offset = 16;
+        const column = (bytes) => { const start = offset; offset += count * bytes; return start; };
+        const sizeAt = column(8), mtimeAt = column(4), nitemsAt = column(4);
+        const flags = new Uint8Array(buffer, column(1), count);
+        const names = count ? new TextDecoder().decode(new Uint8Array(buffer, offset, namesLen)).split('\0') : [];
+        const base = path.split('/').filter(Boolean).join('/');
+
+        return names.map((name, i) => {
+            const isdir = (flags[i] & LIST_DIR) !== 0;
+            const size = view.getFloat64(sizeAt + i * 8, true);
+            const mtime = view.getUint32(mtimeAt + i * 4, true);
+            const rel = base ? `${base}/${name}` : name;
+            const file = {
+                name,
+                path: rel,
+                isdir,
+                nitems: view.getUint32(nitemsAt + i * 4, true),
+                size: isdir ? '0' : `${(size / (1024 * 1024)).toFixed(2)} MB`,
+                modtime: dateFormat.format(mtime * 1000),
+            };
+            if (flags[i] & LIST_THUMB) {
+                file.thumb = `/api/thumb?path=${encodeURIComponent(rel)}&size=256&v=${mtime}`;
+            }
+            if (flags[i] & LIST_ARCHIVE) file.archive = true;
+            return file;
+        });
+    }
+
     function fetchFiles(path = '/') {
-        fetch(`/api/files?path=${encodeURIComponent(path)}`)
+        fetch(`/api/files?path=${encodeURIComponent(path)}&format=binary`)
             .then(response => {
                 if (!response.ok) {
                     throw new Error('Network response was not ok');
                 }
-                return response.json();
+                return response.arrayBuffer();
             })
+            .then(buffer => decodeColumns(buffer, path))
             .then(files => {
                 renderFiles(files);
                 updateBreadcrumb(path);
+                if (path !== shownPath) {
+                    shownPath = path;
+                    syncWatch();
+                }
 
                 const dirItemsCount = files.length;
                 document.getElementById('dir-nitems').textContent = `${dirItemsCount} items`;
@@ -86,8 +169,12 @@ window.onload = function () {
             fileItem.classList.add('file-item');
 
             const fileIcon = document.createElement('img');
-            fileIcon.src = file.isdir ? FOLDER_ICON : FILE_ICON;
+            fileIcon.src = (file.isdir || file.archive) ? FOLDER_ICON : (file.thumb || FILE_ICON);
             fileIcon.classList.add('file-icon');
+            if (file.thumb) {
+                fileIcon.loading = 'lazy';
+                fileIcon.classList.add('file-thumb');
+            }
             fileItem.appendChild(fileIcon);
 
             const fileDetails = document.createElement('div');
@@ -106,7 +193,8 @@ window.onload = function () {
             fileItem.appendChild(fileDetails);
 
             fileItem.onclick = function () {
-                if (file.isdir) {
+                if (file.isdir || file.archive) {
+                    // Archives are browsed like directories, members stream from /api/file
                     fetchFiles(file.path);
                 } else {
                     viewFile(file.path);
@@ -144,4 +232,5 @@ window.onload = function () {
     const initialPath = new URLSearchParams(window.location.search).get('path') || '/';
     fetchDiskUsage();
     fetchFiles(initialPath);
+    startWatch();
 };
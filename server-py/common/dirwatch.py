@@ -0,0 +1,261 @@
+"""
+dirwatch - directory change notifications shared by the xplore servers
+
+Used by xplore-py/server.py and xplore-monaco/app.py for /api/watch; both
+put ../common on sys.path. inotify(7) is bound through ctypes, with an mtime
+polling fallback where it is unavailable.
+"""
+
+import os
+import time
+import queue
+import select
+import struct
+import ctypes
+import secrets
+import threading
+
+IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x2, 0x4, 0x8
+IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x40, 0x80, 0x100, 0x200
+IN_DELETE_SELF, IN_MOVE_SELF, IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR = 0x400, 0x800, 0x4000, 0x8000, 0x1000000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+
+class Inotify:
+    """Minimal inotify(7) binding over libc through ctypes."""
+
+    EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add(self, path, mask=WATCH_MASK):
+        """Watch descriptor of `path`; the same inode reached by another path yields the same wd."""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def remove(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def close(self):
+        os.close(self.fd)
+
+    def read(self):
+        """Pending events as (wd, mask, name)."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, pos = [], 0
+        while pos + self.EVENT.size <= len(data):
+            wd, mask, _, name_len = self.EVENT.unpack_from(data, pos)
+            pos += self.EVENT.size
+            name = data[pos:pos + name_len].rstrip(b"\0")
+            pos += name_len
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+
+class Subscription:
+    def __init__(self):
+        self.id = secrets.token_hex(8)
+        self.dirs = set()
+        self.events = queue.Queue()
+
+
+class DirWatcher:
+    """
+    One set of watches shared by every /api/watch client. Watches exist only
+    for directories some client subscribed to; events are coalesced per
+    directory and delivered once it has been quiet for `debounce` seconds
+    (or `max_delay` after its first event). Without inotify the watched
+    directories' mtimes are compared every `poll_interval` instead.
+
+    Subscribers receive ("change", {"dirs": [...]}) and ("resync", {"dirs": [...]});
+    a resync means events were lost, or (with dirs) that those directories
+    lost their watch and were dropped from the subscription, so the client
+    should re-list and subscribe again.
+    """
+
+    def __init__(self, root, debounce, max_delay, poll_interval, log=print):
+        self.root = root
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.log = log
+        self.lock = threading.Lock()
+        self.subs = {}      # subscription id -> Subscription
+        self.refs = {}      # rel dir -> number of subscriptions
+        self.wd_dirs = {}   # inotify wd -> set of rel dirs (aliases of one inode share a wd)
+        self.dir_wds = {}   # rel dir -> inotify wd, or mtime_ns when polling
+        self.pending = {}   # rel dir -> (first event, last event) monotonic times
+        self.thread = None
+        try:
+            self.inotify = Inotify()
+        except (OSError, AttributeError) as e:
+            log(f"inotify unavailable ({e}), polling directory mtimes")
+            self.inotify = None
+
+    def subscribe(self):
+        sub = Subscription()
+        with self.lock:
+            self.subs[sub.id] = sub
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+        return sub
+
+    def unsubscribe(self, sub_id):
+        with self.lock:
+            sub = self.subs.pop(sub_id, None)
+            if sub:
+                for rel in sub.dirs:
+                    self._release(rel)
+
+    def set_dirs(self, sub_id, dirs):
+        """Replace a subscription's directories; unknown subscription -> KeyError."""
+        with self.lock:
+            sub = self.subs[sub_id]
+            wanted = set(dirs)
+            for rel in sub.dirs - wanted:
+                self._release(rel)
+            for rel in wanted - sub.dirs:
+                if self._acquire(rel):
+                    sub.dirs.add(rel)
+            sub.dirs &= wanted
+            return sorted(sub.dirs)
+
+    def _watch(self, rel):
+        path = os.path.join(self.root, rel)
+        if self.inotify:
+            wd = self.inotify.add(path)
+            self.wd_dirs.setdefault(wd, set()).add(rel)
+            self.dir_wds[rel] = wd
+        else:
+            self.dir_wds[rel] = os.stat(path).st_mtime_ns
+
+    def _acquire(self, rel):
+        if rel not in self.refs:
+            try:
+                self._watch(rel)
+            except OSError as e:
+                self.log(f"Cannot watch {os.path.join(self.root, rel)}: {e}")
+                return False
+            self.refs[rel] = 0
+        self.refs[rel] += 1
+        return True
+
+    def _release(self, rel):
+        self.refs[rel] -= 1
+        if self.refs[rel] == 0:
+            del self.refs[rel]
+            wd = self.dir_wds.pop(rel, None)
+            if self.inotify and wd is not None:
+                aliases = self.wd_dirs.get(wd, set())
+                aliases.discard(rel)
+                if not aliases:
+                    self.wd_dirs.pop(wd, None)
+                    self.inotify.remove(wd)
+
+    def _mark(self, rel, now):
+        first, _ = self.pending.get(rel, (now, now))
+        self.pending[rel] = (first, now)
+
+    def _rewatch(self, rels, now):
+        """
+        The kernel dropped the watch of `rels` (deleted, or unmounted). A directory
+        already recreated under the same path is watched again and reported as
+        changed; the others are dropped from every subscription, which is told
+        to resync. Returns {sub id: dropped dirs}.
+        """
+        dropped = []
+        for rel in rels:
+            self.dir_wds.pop(rel, None)
+            try:
+                self._watch(rel)
+                self._mark(rel, now)
+            except OSError:
+                dropped.append(rel)
+        lost = {}
+        for sub in self.subs.values():
+            gone = [rel for rel in dropped if rel in sub.dirs]
+            if gone:
+                sub.dirs.difference_update(gone)
+                lost[sub.id] = gone
+        for rel in dropped:
+            self.refs.pop(rel, None)
+            self.pending.pop(rel, None)
+        return lost
+
+    def _collect(self, timeout):
+        """
+        Wait up to `timeout` for changes. Returns (overflow, lost): whether the
+        inotify queue overflowed, and {sub id: dirs} dropped after their watch went away.
+        """
+        if not self.inotify:
+            time.sleep(self.poll_interval)
+            with self.lock:
+                for rel, mtime in list(self.dir_wds.items()):
+                    try:
+                        current = os.stat(os.path.join(self.root, rel)).st_mtime_ns
+                    except OSError:
+                        current = None
+                    if current != mtime:
+                        self.dir_wds[rel] = current
+                        self._mark(rel, time.monotonic())
+            return False, {}
+
+        ready, _, _ = select.select([self.inotify.fd], [], [], timeout)
+        if not ready:
+            return False, {}
+        overflow = False
+        ignored = set()
+        now = time.monotonic()
+        with self.lock:
+            for wd, mask, _ in self.inotify.read():
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                if mask & IN_IGNORED:
+                    ignored.update(self.wd_dirs.pop(wd, ()))
+                    continue
+                for rel in self.wd_dirs.get(wd, ()):
+                    self._mark(rel, now)
+            # Still referenced, but without a watch: re-arm or tell the clients
+            lost = self._rewatch([rel for rel in ignored if rel in self.refs], now) if ignored else {}
+        return overflow, lost
+
+    def run(self):
+        while True:
+            with self.lock:
+                if self.pending:
+                    now = time.monotonic()
+                    timeout = max(0.0, min(min(last + self.debounce, first + self.max_delay) - now
+                                           for first, last in self.pending.values()))
+                else:
+                    timeout = None
+            overflow, lost = self._collect(timeout)
+
+            now = time.monotonic()
+            with self.lock:
+                due = [rel for rel, (first, last) in self.pending.items()
+                       if now - last >= self.debounce or now - first >= self.max_delay]
+                for rel in due:
+                    del self.pending[rel]
+                for sub in self.subs.values():
+                    if overflow:
+                        sub.events.put(("resync", {}))
+                        continue
+                    if sub.id in lost:
+                        sub.events.put(("resync", {"dirs": sorted(lost[sub.id])}))
+                    changed = [rel for rel in due if rel in sub.dirs]
+                    if changed:
+                        sub.events.put(("change", {"dirs": changed}))
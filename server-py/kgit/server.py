@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+"""
+KGit Server - persistent backend for the KGit CGI frontend
+
+Serves the same `cgi-bin/kgit.cgi?page=...&task=...` URLs as the bash CGI,
+but keeps one long-lived `git cat-file --batch` / `--batch-check` pair per
+repository instead of forking bash, git and highlight for every request.
+History is walked through cat-file, and highlighted renders are cached by
+commit id (or by HEAD + index state for staged changes).
+
+Usage:
+  server.py [repo_path]     # defaults to the first line of ./kgit.path
+
+`public/` holds the frontend from cgi-bin/kgit (index.html, html/menu.html).
+"""
+
+import os
+import sys
+import html
+import time
+import heapq
+import threading
+import subprocess
+from pathlib import Path
+from functools import lru_cache
+from datetime import datetime, timezone, timedelta
+from flask import Flask, request, send_from_directory
+
+# --- Config ---
+PORT = int(os.environ.get("PORT", 9003))
+STATIC_DIR = Path(__file__).parent / 'public'
+LOOKUP_FILE = "kgit.path"
+REPO_ARG = sys.argv[1] if len(sys.argv) > 1 else None
+
+app = Flask(__name__, static_folder=str(STATIC_DIR), static_url_path='')
+
+# --- Logging Helper ---
+def log(*args):
+    print(f"[{time.strftime('%H:%M:%S')}] ", *args)
+
+
+# ---- Persistent git workers ----
+class CatFile:
+    """A long-lived `git cat-file --batch[-check]` process."""
+
+    def __init__(self, repo, mode):
+        self.repo = repo
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.proc = None
+
+    def _ensure(self):
+        if self.proc is None or self.proc.poll() is not None:
+            self.proc = subprocess.Popen(
+                ["git", "-C", self.repo, "cat-file", self.mode],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0
+            )
+
+    def query(self, rev):
+        """Return (oid, type, size, body); body is None for --batch-check, oid None if missing."""
+        with self.lock:
+            self._ensure()
+            self.proc.stdin.write(rev.encode() + b"\n")
+            header = self.proc.stdout.readline().split()
+            if len(header) != 3:
+                return None, None, 0, None
+            oid, obj_type, size = header[0].decode(), header[1].decode(), int(header[2])
+            body = None
+            if self.mode == "--batch":
+                body = self._read_exact(size)
+                self._read_exact(1)  # trailing newline
+            return oid, obj_type, size, body
+
+    def _read_exact(self, size):
+        chunks = []
+        while size > 0:
+            chunk = self.proc.stdout.read(size)
+            if not chunk:
+                raise IOError("git cat-file exited unexpectedly")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.stdin.close()
+            self.proc.wait()
+
+
+class GitRepo:
+    """Per-repository workers; objects are read through cat-file, never via `git log`."""
+
+    def __init__(self, path):
+        self.path = path
+        self.batch = CatFile(path, "--batch")
+        self.check = CatFile(path, "--batch-check")
+        self.git_dir = None
+
+    def resolve(self, rev):
+        oid, obj_type, _, _ = self.check.query(rev)
+        return oid if obj_type == "commit" else None
+
+    def read_commit(self, oid):
+        _, obj_type, _, body = self.batch.query(oid)
+        if obj_type != "commit":
+            return None
+        return parse_commit(oid, body.decode("utf-8", errors="replace"))
+
+    def index_state(self):
+        """Stat of .git/index: changes whenever the staging area is written."""
+        if self.git_dir is None:
+            self.git_dir = self.git_output("rev-parse", "--absolute-git-dir").strip()
+        try:
+            st = os.stat(os.path.join(self.git_dir, "index"))
+            return (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def git_output(self, *args):
+        result = subprocess.run(["git", "-C", self.path, *args], capture_output=True)
+        if result.returncode != 0:
+            log(f"git {' '.join(args)} failed: {result.stderr.decode(errors='replace').strip()}")
+        return result.stdout.decode("utf-8", errors="replace")
+
+
+REPOS = {}
+REPOS_LOCK = threading.Lock()
+
+def get_repo(path):
+    with REPOS_LOCK:
+        repo = REPOS.get(path)
+        if repo is None:
+            repo = REPOS[path] = GitRepo(path)
+            log(f"Started git workers for {path}")
+        return repo
+
+def get_lookup_path():
+    """Same lookup as cgi_get_lookup_path(): argv, else the first line of kgit.path."""
+    if REPO_ARG:
+        return REPO_ARG
+    try:
+        with open(LOOKUP_FILE, encoding="utf-8") as f:
+            text = f.readline().strip()
+    except OSError:
+        raise ValueError(f"'{LOOKUP_FILE}' does not exist.")
+    if not text:
+        raise ValueError("GITWEB_LOOKUP_PATH is not set.")
+    return text
+
+
+# ---- Commit parsing and `git log` formatting ----
+def parse_commit(oid, text):
+    headers, _, message = text.partition("\n\n")
+    commit = {"oid": oid, "parents": [], "message": message}
+    for line in headers.split("\n"):
+        if line.startswith(" "):
+            continue  # continuation of a multi-line header (gpgsig)
+        key, _, value = line.partition(" ")
+        if key == "parent":
+            commit["parents"].append(value)
+        elif key in ("author", "committer"):
+            commit[key] = value
+    commit["time"] = int(commit.get("committer", "0 +0000").rsplit(" ", 2)[-2])
+    return commit
+
+def format_ident_date(ident):
+    """`Name <email> 1700000000 +0530` → (`Name <email>`, git's default date format)."""
+    who, ts, tz = ident.rsplit(" ", 2)
+    sign = -1 if tz[0] == "-" else 1
+    offset = timedelta(hours=int(tz[1:3]), minutes=int(tz[3:5])) * sign
+    dt = datetime.fromtimestamp(int(ts), timezone(offset))
+    return who, f"{dt:%a %b} {dt.day} {dt:%H:%M:%S %Y} {tz}"
+
+def format_log_entry(commit):
+    lines = [f"commit {commit['oid']}"]
+    if len(commit["parents"]) > 1:
+        lines.append("Merge: " + " ".join(p[:7] for p in commit["parents"]))
+    who, date = format_ident_date(commit["author"])
+    lines.append(f"Author: {who}")
+    lines.append(f"Date:   {date}")
+    lines.append("")
+    lines.extend(f"    {line}" for line in commit["message"].rstrip("\n").split("\n"))
+    lines.append("")
+    return "\n".join(lines)
+
+def walk_history(repo, head):
+    """Commits reachable from head, newest committer date first (like `git log`)."""
+    seen = {head}
+    queue = []
+    first = repo.read_commit(head)
+    if first:
+        heapq.heappush(queue, (-first["time"], 0, first))
+    counter = 1
+    while queue:
+        _, _, commit = heapq.heappop(queue)
+        yield commit
+        for parent in commit["parents"]:
+            if parent in seen:
+                continue
+            seen.add(parent)
+            parsed = repo.read_commit(parent)
+            if parsed:
+                heapq.heappush(queue, (-parsed["time"], counter, parsed))
+                counter += 1
+
+
+# ---- Rendering ----
+DIFF_STYLES = (
+    ("diff --git", "font-weight:bold"),
+    ("+++", "font-weight:bold"),
+    ("---", "font-weight:bold"),
+    ("commit ", "color:#b7950b"),
+    ("@@", "color:#8e44ad"),
+    ("+", "color:#1e8449"),
+    ("-", "color:#c0392b"),
+)
+
+def highlight_diff(text):
+    """Inline-CSS diff highlighting, replacing the `highlight -S diff` pipe."""
+    out = []
+    for line in text.splitlines():
+        escaped = html.escape(line)
+        style = next((s for prefix, s in DIFF_STYLES if line.startswith(prefix)), None)
+        out.append(f"<span style='{style}'>{escaped}</span>" if style else escaped)
+    return "<pre style='font-family:Courier New;font-size:13px'>" + "\n".join(out) + "</pre>"
+
+def section(title):
+    return f"<h3 style='font-family:Arial;background-color:#85C1E9'>{title}</h3>"
+
+@lru_cache(maxsize=256)
+def render_overview(path, head):
+    repo = get_repo(path)
+    return section("Latest Commit:") + highlight_diff(repo.git_output("show", "--stat", head))
+
+@lru_cache(maxsize=64)
+def render_staged(path, head, index_state):
+    repo = get_repo(path)
+    return (section("Stagged Files:") + highlight_diff(repo.git_output("diff", "--cached", "--name-only")) +
+            section("File Changes:") + highlight_diff(repo.git_output("diff", "--cached")))
+
+def render_unstaged(path):
+    # Work tree state has no cheap cache key, so this view is always computed
+    repo = get_repo(path)
+    return (section("Unstaged Files:") + highlight_diff(repo.git_output("diff", "--stat")) +
+            section("File Changes:") + highlight_diff(repo.git_output("diff")))
+
+@lru_cache(maxsize=32)
+def render_history(path, head):
+    repo = get_repo(path)
+    text = "\n".join(format_log_entry(c) for c in walk_history(repo, head))
+    return section("Commit History:") + highlight_diff(text)
+
+def render_viewport(path, task):
+    repo = get_repo(path)
+    head = repo.resolve("HEAD")
+    title = f"<h1 style='font-family:Arial'>{html.escape(os.path.basename(path.rstrip('/')))}:</h1>"
+
+    if task == "unstaged":
+        return title + render_unstaged(path)
+    if head is None:
+        return title + html_error("Repository has no commits")
+    if task == "staged":
+        return title + render_staged(path, head, repo.index_state())
+    if task == "history":
+        return title + render_history(path, head)
+    return title + render_overview(path, head)
+
+def html_error(message):
+    return (f"<!DOCTYPE html><html lang='en'><head><meta charset='UTF-8'><title>ERROR!</title></head>"
+            f"<body><h2 style='color:Tomato;'>Oops! {html.escape(message)} </h2></body></html>")
+
+
+# ---- Routes ----
+@app.route('/')
+def index():
+    return send_from_directory(STATIC_DIR, 'index.html')
+
+@app.route('/cgi-bin/kgit.cgi')
+def kgit_cgi():
+    mode = request.args.get("page")
+    if not mode:
+        return html_error("Invalid Mode")
+    if mode == "menu":
+        return send_from_directory(STATIC_DIR / 'html', 'menu.html')
+    if mode != "viewport":
+        return html_error("Invalid Mode")
+
+    try:
+        path = get_lookup_path()
+    except ValueError as e:
+        return html_error(str(e))
+
+    start = time.perf_counter()
+    page = render_viewport(path, request.args.get("task", "overview"))
+    log(f"viewport {request.args.get('task', 'overview')} rendered in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return page
+
+@app.route('/<path:filename>')
+def serve_static_files(filename):
+    return send_from_directory(STATIC_DIR, filename)
+
+
+# --- Launch Server ---
+if __name__ == '__main__':
+    print(f"Serving static from: {STATIC_DIR}")
+    print(f"Server running at http://localhost:{PORT}")
+    try:
+        app.run(host='0.0.0.0', port=PORT, threaded=True)
+    finally:
+        for repo in REPOS.values():
+            repo.batch.close()
+            repo.check.close()
@@ -5,14 +5,21 @@ Kpass Web Server - Flask version
 """
 
 import os
+import json
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 
 app = Flask(__name__, static_folder='public')
 CORS(app)  # Enable CORS if needed
 
-PORT = 9002
+PORT = int(os.environ.get("PORT", 9002))
+DEBUG = os.environ.get("FLASK_DEBUG", "1") != "0"
+MAX_LOOKUP_WORKERS = 8   # concurrent `kpass -j -l` lookups per batch
+MAX_BATCH_IDS = 256      # entries accepted by one /entries request
+
+lookup_pool = ThreadPoolExecutor(max_workers=MAX_LOOKUP_WORKERS)
 
 
 # ---- Utility functions ----
@@ -134,6 +141,37 @@ def get_entry(entry_id):
     return output
 
 
+@app.route("/entries", methods=["POST"])
+def get_entries():
+    """Look up several entries at once: {"ids": [...]} → {"entries": {id: entry}, "errors": {id: msg}}."""
+    data = request.get_json(silent=True) or {}
+    ids = data.get("ids")
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "A list of entry IDs is required"}), 400
+    if len(ids) > MAX_BATCH_IDS:
+        return jsonify({"error": f"At most {MAX_BATCH_IDS} entry IDs per request"}), 400
+
+    entries, errors = {}, {}
+    valid = []
+    for entry_id in dict.fromkeys(str(i) for i in ids):
+        if entry_id.isdigit():
+            valid.append(entry_id)
+        else:
+            errors[entry_id] = "Invalid entry ID"
+
+    lookups = lookup_pool.map(lambda i: kpass_exec(f"kpass -j -l {i}"), valid)
+    for entry_id, (output, error, status) in zip(valid, lookups):
+        if status != 0:
+            errors[entry_id] = error or "Lookup failed"
+            continue
+        try:
+            entries[entry_id] = json.loads(output)
+        except ValueError:
+            errors[entry_id] = "Invalid kpass output"
+
+    return jsonify({"entries": entries, "errors": errors})
+
+
 @app.route("/", defaults={"path": ""})
 @app.route("/<path:path>")
 def serve_static(path):
@@ -155,4 +193,4 @@ def server_error(e):
 # ---- Main entry ----
 if __name__ == "__main__":
     require_master_key()
-    app.run(host="0.0.0.0", port=PORT, debug=True)
+    app.run(host="0.0.0.0", port=PORT, debug=DEBUG)
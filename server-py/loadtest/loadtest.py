@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+
+"""
+Load harness for the Python servers (kpass, xplore-monaco, xplore-py)
+
+Builds a synthetic file tree and a stub `kpass` binary in a scratch
+directory, starts each server on a free 127.0.0.1 port against them, replays
+the selected scenarios at every concurrency level and writes throughput,
+p50/p95/p99 latency and server RSS/CPU to JSON. Only the scratch directory
+and the loopback interface are used.
+
+Usage:
+  loadtest.py [-s SCENARIO ...] [-c 1,8,32] [-d SECONDS] [-o results.json]
+  loadtest.py --list
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from pathlib import Path
+from urllib.parse import quote
+
+# --- Config ---
+SERVER_DIR = Path(__file__).resolve().parent.parent
+READY_TIMEOUT = 15        # seconds to wait for a server to accept connections
+SAMPLE_INTERVAL = 0.1     # seconds between RSS/CPU samples of the server
+REQUEST_TIMEOUT = 60
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+WORDS = ("alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel",
+         "india", "juliet", "kilo", "lima", "mike", "november", "oscar", "papa")
+
+# --- Logging Helper ---
+def log(*args):
+    print(f"[{time.strftime('%H:%M:%S')}] ", *args, file=sys.stderr)
+
+
+# ---- Synthetic data ----
+class Tree:
+    """Deterministic file tree: nested text directories, one large log, one media file."""
+
+    def __init__(self, root, dirs, files_per_dir, large_mb, media_mb, seed):
+        self.root = root
+        self.dirs = [""]
+        self.files = []
+        self.large = "large/app.log"
+        self.media = "media/clip.mp4"
+        self.media_size = media_mb * 1024 * 1024
+        rng = random.Random(seed)
+
+        for i in range(dirs):
+            parent = rng.choice(self.dirs[-32:]) if i else ""
+            rel = f"{parent}/d{i:04d}".lstrip("/")
+            os.makedirs(os.path.join(root, rel))
+            self.dirs.append(rel)
+            for j in range(files_per_dir):
+                name = f"{rel}/{rng.choice(WORDS)}_{j:03d}.txt"
+                lines = (" ".join(rng.choices(WORDS, k=8)) for _ in range(rng.randint(5, 200)))
+                with open(os.path.join(root, name), "w") as f:
+                    f.write("\n".join(lines) + "\n")
+                self.files.append(name)
+
+        os.makedirs(os.path.join(root, "large"))
+        line = " ".join(WORDS) + "\n"
+        with open(os.path.join(root, self.large), "w") as f:
+            count = large_mb * 1024 * 1024 // len(line)
+            f.writelines(f"{n:09d} {line}" for n in range(count))
+
+        os.makedirs(os.path.join(root, "media"))
+        block = rng.randbytes(1024 * 1024)
+        with open(os.path.join(root, self.media), "wb") as f:
+            for _ in range(media_mb):
+                f.write(block)
+
+
+KPASS_STUB = '''#!{python}
+# Stub of the kpass CLI for loadtest.py: answers -L, -f, -g and -l from a JSON file
+import sys, json
+args = sys.argv[1:]
+with open({db!r}) as f:
+    db = json.load(f)
+
+def out(value):
+    print(json.dumps(value))
+    sys.exit(0)
+
+for i, arg in enumerate(args):
+    value = args[i + 1] if i + 1 < len(args) else ""
+    if arg == "-L":
+        out([{{"id": e["id"], "name": e["name"]}} for e in db])
+    if arg == "-f":
+        name = value.partition("=")[2]
+        out([e for e in db if e["name"] == name])
+    if arg == "-g":
+        out([e for e in db if value in e["name"] or value in e["url"] or value in e["user"]])
+    if arg == "-l":
+        for e in db:
+            if e["id"] == value:
+                out(e)
+        print(f"Entry {{value}} not found", file=sys.stderr)
+        sys.exit(1)
+print("usage: kpass -j [-L | -f NAME=x | -g pattern | -l id]", file=sys.stderr)
+sys.exit(2)
+'''
+
+def make_kpass_stub(scratch, entries, seed):
+    """Write bin/kpass and its entry database; returns (bin dir, entry ids, domain names)."""
+    rng = random.Random(seed)
+    domains = [f"{rng.choice(WORDS)}-{n}.example" for n in range(max(1, entries // 4))]
+    db = []
+    for n in range(entries):
+        domain = rng.choice(domains)
+        db.append({"id": str(n + 1), "name": domain, "url": f"https://{domain}/login",
+                   "user": f"{rng.choice(WORDS)}{n}", "password": f"pw-{rng.getrandbits(48):012x}"})
+
+    db_path = os.path.join(scratch, "kpass-db.json")
+    with open(db_path, "w") as f:
+        json.dump(db, f)
+    bin_dir = os.path.join(scratch, "bin")
+    os.makedirs(bin_dir)
+    stub = os.path.join(bin_dir, "kpass")
+    with open(stub, "w") as f:
+        f.write(KPASS_STUB.format(python=sys.executable, db=db_path))
+    os.chmod(stub, 0o755)
+    return bin_dir, [e["id"] for e in db], sorted(set(domains))
+
+
+# ---- Servers ----
+class Server:
+    """One server subprocess on a free loopback port, with /proc based resource sampling."""
+
+    def __init__(self, name, script, args, env, log_path):
+        self.name = name
+        self.script = script
+        self.args = args
+        self.env = env
+        self.log_path = log_path
+        self.proc = None
+        self.port = None
+
+    def start(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        env = dict(os.environ, **self.env, PORT=str(self.port), FLASK_DEBUG="0")
+        self.log_file = open(self.log_path, "w")
+        self.proc = subprocess.Popen([sys.executable, str(self.script), *self.args], env=env,
+                                     cwd=self.script.parent, stdin=subprocess.DEVNULL,
+                                     stdout=self.log_file, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + READY_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                break
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.5).close()
+                log(f"{self.name} listening on 127.0.0.1:{self.port} (pid {self.proc.pid})")
+                return
+            except OSError:
+                time.sleep(0.1)
+        self.stop()
+        with open(self.log_path) as f:
+            tail = f.read()[-2000:]
+        raise RuntimeError(f"{self.name} did not start, see {self.log_path}:\n{tail}")
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        if self.proc:
+            self.log_file.close()
+
+    def usage(self):
+        """(cpu seconds, cpu seconds of waited-for children, rss bytes) from /proc."""
+        try:
+            with open(f"/proc/{self.proc.pid}/stat") as f:
+                fields = f.read().rpartition(")")[2].split()
+            with open(f"/proc/{self.proc.pid}/statm") as f:
+                rss_pages = int(f.read().split()[1])
+        except OSError:
+            return 0.0, 0.0, 0
+        # fields[0] is field 3 (state): utime/stime are 14/15, cutime/cstime 16/17
+        cpu = (int(fields[11]) + int(fields[12])) / CLK_TCK
+        child_cpu = (int(fields[13]) + int(fields[14])) / CLK_TCK
+        return cpu, child_cpu, rss_pages * PAGE_SIZE
+
+
+class Sampler(threading.Thread):
+    """Samples a server's RSS while a run is in progress."""
+
+    def __init__(self, server):
+        super().__init__(daemon=True)
+        self.server = server
+        self.done = threading.Event()
+        self.peak_rss = 0
+
+    def run(self):
+        while not self.done.is_set():
+            self.peak_rss = max(self.peak_rss, self.server.usage()[2])
+            self.done.wait(SAMPLE_INTERVAL)
+
+
+# ---- Scenarios ----
+# Each scenario builds one request per call: (method, path, json body or None, headers)
+def monaco_tree(ctx, rng):
+    if rng.random() < 0.1:
+        return "GET", "/api/tree?depth=8", None, {}
+    return "GET", f"/api/tree?path={quote(rng.choice(ctx['tree'].dirs))}", None, {}
+
+def monaco_large_open(ctx, rng):
+    return "GET", f"/api/file?path={quote(ctx['tree'].large)}", None, {}
+
+def xplore_tree(ctx, rng):
+    return "GET", f"/api/files?path={quote(rng.choice(ctx['tree'].dirs))}", None, {}
+
+def xplore_text_open(ctx, rng):
+    return "GET", f"/api/file?path={quote(rng.choice(ctx['tree'].files))}", None, {}
+
+def xplore_media_seek(ctx, rng):
+    tree = ctx["tree"]
+    start = rng.randrange(0, max(1, tree.media_size - ctx["range_bytes"]))
+    headers = {"Range": f"bytes={start}-{start + ctx['range_bytes'] - 1}"}
+    return "GET", f"/api/file?path={quote(tree.media)}", None, headers
+
+def kpass_list(ctx, rng):
+    if rng.random() < 0.5:
+        return "GET", "/list", None, {}
+    return "POST", "/domain", {"domain": rng.choice(ctx["domains"])}, {}
+
+def kpass_grep(ctx, rng):
+    return "POST", "/grep", {"query": rng.choice(WORDS)}, {}
+
+def kpass_entries(ctx, rng):
+    return "POST", "/entries", {"ids": rng.sample(ctx["entry_ids"], min(20, len(ctx["entry_ids"])))}, {}
+
+SCENARIOS = {
+    "monaco-tree":       ("xplore-monaco", monaco_tree,       "tree browse: one level, sometimes 8 levels"),
+    "monaco-large-open": ("xplore-monaco", monaco_large_open, "open the large text file in the editor"),
+    "xplore-tree":       ("xplore-py",     xplore_tree,       "tree browse: directory listings"),
+    "xplore-text-open":  ("xplore-py",     xplore_text_open,  "open small text files"),
+    "xplore-media-seek": ("xplore-py",     xplore_media_seek, "media range requests at random offsets"),
+    "kpass-list":        ("kpass",         kpass_list,        "domain list and domain lookups"),
+    "kpass-grep":        ("kpass",         kpass_grep,        "grep over entries"),
+    "kpass-entries":     ("kpass",         kpass_entries,     "batched entry lookups (20 ids)"),
+}
+
+
+# ---- Load generation ----
+def send(port, method, path, body, headers):
+    """One request on a fresh connection; returns (status, bytes read)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=REQUEST_TIMEOUT)
+    try:
+        if body is not None:
+            body = json.dumps(body)
+            headers = dict(headers, **{"Content-Type": "application/json"})
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        size = 0
+        while True:
+            chunk = response.read(256 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+        return response.status, size
+    finally:
+        conn.close()
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+def run_load(server, make_request, ctx, concurrency, duration, warmup, seed):
+    """Drive `concurrency` client threads for warmup + duration seconds; measure the latter."""
+    latencies, statuses = [], {}
+    totals = {"bytes": 0, "errors": 0}
+    lock = threading.Lock()
+    start = time.monotonic()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        while True:
+            t0 = time.monotonic()
+            if t0 >= stop_at:
+                return
+            method, path, body, headers = make_request(ctx, rng)
+            try:
+                status, size = send(server.port, method, path, body, headers)
+            except (OSError, http.client.HTTPException):
+                status, size = "error", 0
+            t1 = time.monotonic()
+            if t0 < measure_from:
+                continue  # requests started in the window count, even if they end after it
+            with lock:
+                latencies.append(t1 - t0)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                totals["bytes"] += size
+                if status == "error" or status >= 400:
+                    totals["errors"] += 1
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    time.sleep(max(0.0, measure_from - time.monotonic()))
+
+    sampler = Sampler(server)
+    cpu0, child0, _ = server.usage()
+    sampler.start()
+    time.sleep(max(0.0, stop_at - time.monotonic()))
+    cpu1, child1, rss = server.usage()
+    sampler.done.set()
+    for t in threads:
+        t.join()
+    sampler.join()
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "requests": len(latencies),
+        "errors": totals["errors"],
+        "status": statuses,
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "bytes_per_s": round(totals["bytes"] / duration),
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1] if latencies else None),
+        },
+        "process": {
+            "rss_peak_mb": round(max(sampler.peak_rss, rss) / 2**20, 1),
+            "rss_end_mb": round(rss / 2**20, 1),
+            "cpu_s": round(cpu1 - cpu0, 3),
+            "cpu_pct": round((cpu1 - cpu0) / duration * 100, 1),
+            # exited subprocesses the server waited for (kpass lookups)
+            "children_cpu_s": round(child1 - child0, 3),
+        },
+    }
+
+
+# ---- Main ----
+def make_servers(scratch, tree_root, bin_dir):
+    return {
+        "kpass": Server("kpass", SERVER_DIR / "kpass" / "server.py", [], {
+            "PATH": bin_dir + os.pathsep + os.environ.get("PATH", ""),
+            "KPASS_MASTER_KEY": "loadtest",
+        }, os.path.join(scratch, "kpass.log")),
+        "xplore-monaco": Server("xplore-monaco", SERVER_DIR / "xplore-monaco" / "app.py", [], {
+            "XPLORE_ROOT": tree_root,
+        }, os.path.join(scratch, "xplore-monaco.log")),
+        "xplore-py": Server("xplore-py", SERVER_DIR / "xplore-py" / "server.py", [tree_root], {
+            "XPLORE_THUMB_DIR": os.path.join(scratch, "thumbs"),
+        }, os.path.join(scratch, "xplore-py.log")),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Local load test of the Python servers")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument("-c", "--concurrency", default="1,8,32",
+                        help="comma separated client thread counts (default: 1,8,32)")
+    parser.add_argument("-d", "--duration", type=float, default=10, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before each run")
+    parser.add_argument("-o", "--output", help="write results JSON here instead of stdout")
+    parser.add_argument("--dirs", type=int, default=200, help="directories in the synthetic tree")
+    parser.add_argument("--files-per-dir", type=int, default=25)
+    parser.add_argument("--large-mb", type=int, default=16, help="size of the large text file")
+    parser.add_argument("--media-mb", type=int, default=64, help="size of the media file")
+    parser.add_argument("--range-kb", type=int, default=256, help="bytes per media range request")
+    parser.add_argument("--kpass-entries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scratch", help="scratch directory (default: a temporary one, removed afterwards)")
+    parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (server, _, description) in SCENARIOS.items():
+            print(f"{name:20} {server:14} {description}")
+        return
+
+    scenarios = args.scenario or list(SCENARIOS)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    scratch = args.scratch or tempfile.mkdtemp(prefix="loadtest-")
+    os.makedirs(scratch, exist_ok=True)
+    tree_root = os.path.join(scratch, "tree")
+
+    servers = {}
+    results = []
+    try:
+        log(f"Building synthetic tree in {tree_root}")
+        tree = Tree(tree_root, args.dirs, args.files_per_dir, args.large_mb, args.media_mb, args.seed)
+        bin_dir, entry_ids, domains = make_kpass_stub(scratch, args.kpass_entries, args.seed)
+        ctx = {"tree": tree, "entry_ids": entry_ids, "domains": domains, "range_bytes": args.range_kb * 1024}
+        servers = make_servers(scratch, tree_root, bin_dir)
+
+        for name in scenarios:
+            server_name, make_request, _ = SCENARIOS[name]
+            server = servers[server_name]
+            if server.proc is None:
+                server.start()
+            for level in levels:
+                result = run_load(server, make_request, ctx, level, args.duration, args.warmup, args.seed)
+                result = {"scenario": name, "server": server_name, **result}
+                results.append(result)
+                lat = result["latency_ms"]
+                log(f"{name} c={level}: {result['throughput_rps']} req/s, p50 {lat['p50']} ms, "
+                    f"p95 {lat['p95']} ms, p99 {lat['p99']} ms, errors {result['errors']}, "
+                    f"rss {result['process']['rss_peak_mb']} MB, cpu {result['process']['cpu_pct']}%")
+    finally:
+        for server in servers.values():
+            server.stop()
+        if not args.scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {
+        "host": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count()},
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "list", "scratch")},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        log(f"Results written to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
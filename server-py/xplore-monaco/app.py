@@ -1,14 +1,45 @@
 #!/usr/bin/env python3
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response, stream_with_context
 from pathlib import Path
+from collections import deque
 import traceback
+import posixpath
+import codecs
+import queue
+import select
+import sys
+import os
 import json
 import time
 
+# Directory watcher shared with the other xplore server
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "common"))
+from dirwatch import (DirWatcher, Inotify, IN_MODIFY, IN_ATTRIB, IN_MOVE_SELF, IN_DELETE_SELF,
+                      IN_CREATE, IN_MOVED_TO, IN_ONLYDIR)
+
 app = Flask(__name__, static_folder="static", static_url_path="")
 
-# Serve files from ./files folder
-ROOT_DIR = (Path(__file__).parent / "files").resolve()
+# Serve files from ./files folder (or $XPLORE_ROOT)
+ROOT_DIR = Path(os.environ.get("XPLORE_ROOT", Path(__file__).parent / "files")).resolve()
+PORT = int(os.environ.get("PORT", 8000))
+DEBUG = os.environ.get("FLASK_DEBUG", "1") != "0"
+
+# /api/tree?depth=N: levels returned per call and entries listed per call
+MAX_TREE_DEPTH = 32
+DEFAULT_TREE_LIMIT = 5000
+MAX_TREE_LIMIT = 50000
+
+# /api/tail: size polling interval without inotify, bytes per event and keep-alive period (seconds)
+TAIL_POLL_INTERVAL = 0.5
+TAIL_CHUNK = 64 * 1024
+TAIL_HEARTBEAT = 15
+
+# /api/watch: quiet period before a changed directory is reported, upper bound
+# on that delay, mtime polling interval without inotify, directories per client
+WATCH_DEBOUNCE = 0.25
+WATCH_MAX_DELAY = 2
+WATCH_POLL_INTERVAL = 2
+MAX_WATCH_DIRS = 4096
 
 # ===== Logging Hooks =====
 @app.before_request
@@ -31,7 +62,9 @@ def log_response_info(response):
     print(f"Status: {response.status}")
     try:
         # Attempt to pretty-print JSON responses
-        if response.content_type == "application/json":
+        if response.is_streamed:
+            print("Body: [stream]")  # reading it here would consume the stream
+        elif response.content_type == "application/json":
             print(f"Body:\n{json.dumps(json.loads(response.get_data(as_text=True)), indent=2)}")
         else:
             print(f"Body: {response.get_data(as_text=True)[:300]}...")  # truncate long HTML
@@ -56,6 +89,56 @@ def safe_resolve_within_root(rel_path: str) -> Path:
         raise ValueError("Path is outside the allowed root")
     return candidate
 
+def list_dir(dir_path: str, rel_prefix: str):
+    """
+    One directory level from a single scandir pass; the dirent type is used
+    instead of a stat per entry. Returns (items, subdirs to descend into).
+    """
+    items, subdirs = [], []
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            is_dir = entry.is_dir()
+            item = {
+                "name": entry.name,
+                # use POSIX-style relative path for consistency in frontend
+                "path": rel_prefix + entry.name,
+                "type": "dir" if is_dir else "file"
+            }
+            items.append(item)
+            # Symlinked directories are listed but not followed (no loops)
+            if is_dir and not entry.is_symlink():
+                subdirs.append((entry.path, item))
+
+    # Sort: directories first, then files; both case-insensitive
+    items.sort(key=lambda e: (0 if e["type"] == "dir" else 1, e["name"].lower()))
+    return items, subdirs
+
+def walk_tree(target_dir: Path, depth: int, limit: int):
+    """
+    Breadth-first listing of up to `depth` levels below target_dir. Directories
+    are expanded while fewer than `limit` entries have been listed; a directory
+    without a "children" key was not expanded and can be requested on its own.
+    """
+    rel = target_dir.relative_to(ROOT_DIR).as_posix()
+    items, subdirs = list_dir(str(target_dir), "" if rel == "." else rel + "/")
+    listed = len(items)
+    queue = deque((path, item, 2) for path, item in subdirs)
+    while queue and listed < limit:
+        path, item, level = queue.popleft()
+        if level > depth:
+            break
+        try:
+            children, subdirs = list_dir(path, item["path"] + "/")
+        except OSError as e:
+            print(f"Could not read {path}: {e}")
+            item["children"] = []
+            item["error"] = "Could not read directory"
+            continue
+        item["children"] = children
+        listed += len(children)
+        queue.extend((p, i, level + 1) for p, i in subdirs)
+    return items
+
 @app.route("/api/tree")
 def get_tree():
     rel_path = request.args.get("path", "").strip()
@@ -63,26 +146,21 @@ def get_tree():
         target_dir = safe_resolve_within_root(rel_path) if rel_path else ROOT_DIR
     except ValueError:
         return jsonify({"error": "Invalid path"}), 400
+    try:
+        depth = min(max(int(request.args.get("depth", 1)), 1), MAX_TREE_DEPTH)
+        limit = min(max(int(request.args.get("limit", DEFAULT_TREE_LIMIT)), 1), MAX_TREE_LIMIT)
+    except ValueError:
+        return jsonify({"error": "Invalid depth or limit"}), 400
 
     if not target_dir.exists() or not target_dir.is_dir():
         return jsonify({"error": "Directory not found"}), 404
 
-    items = []
     try:
-        for entry in target_dir.iterdir():
-            entry_type = "dir" if entry.is_dir() else "file"
-            items.append({
-                "name": entry.name,
-                # use POSIX-style relative path for consistency in frontend
-                "path": str(entry.relative_to(ROOT_DIR).as_posix()),
-                "type": entry_type
-            })
+        items = walk_tree(target_dir, depth, limit)
     except Exception:
         traceback.print_exc()
         return jsonify({"error": "Could not read directory"}), 500
 
-    # Sort: directories first, then files; both case-insensitive
-    items.sort(key=lambda e: (0 if e["type"] == "dir" else 1, e["name"].lower()))
     return jsonify(items)
 
 @app.route("/api/file")
@@ -98,8 +176,9 @@ def get_file():
     if not file_path.exists() or not file_path.is_file():
         return jsonify({"error": "File not found"}), 404
 
+    raw = file_path.read_bytes()
     try:
-        content = file_path.read_text(encoding="utf-8")
+        content = raw.decode("utf-8")
     except UnicodeDecodeError:
         content = None
 
@@ -117,8 +196,210 @@ def get_file():
         "name": file_path.name,
         "path": str(file_path.relative_to(ROOT_DIR).as_posix()),
         "content": content,
+        # byte length of the content: the offset to continue from with /api/tail
+        "size": len(raw),
         "binary": False
     })
 
+def sse_event(event: str, data: dict, event_id=None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+class TailWatch:
+    """
+    Wakes a follower when its file may have changed: inotify on the file
+    (writes, truncation, move, delete) and on its directory (a rotated file
+    appearing under the same name). Falls back to sleeping TAIL_POLL_INTERVAL.
+    """
+
+    FILE_MASK = IN_MODIFY | IN_ATTRIB | IN_MOVE_SELF | IN_DELETE_SELF
+    DIR_MASK = IN_CREATE | IN_MOVED_TO | IN_ONLYDIR
+
+    def __init__(self, file_path: Path):
+        self.file_path = file_path
+        self.file_wd = None
+        try:
+            self.inotify = Inotify()
+            self.inotify.add(file_path.parent, self.DIR_MASK)
+            self.rewatch()
+        except (OSError, AttributeError) as e:
+            print(f"Tail of {file_path} polls its size: {e}")
+            self.close()
+
+    def rewatch(self):
+        """Watch the file now at file_path (after a rotation)."""
+        if self.inotify:
+            if self.file_wd is not None:
+                self.inotify.remove(self.file_wd)
+            self.file_wd = self.inotify.add(self.file_path, self.FILE_MASK)
+
+    def wait(self, timeout: float):
+        if not self.inotify:
+            time.sleep(min(timeout, TAIL_POLL_INTERVAL))
+            return
+        ready, _, _ = select.select([self.inotify.fd], [], [], timeout)
+        if ready:
+            self.inotify.read()
+
+    def close(self):
+        inotify, self.inotify = getattr(self, "inotify", None), None
+        if inotify:
+            inotify.close()
+
+def follow_file(file_path: Path, offset: int):
+    """
+    Yield SSE events for bytes appended to file_path after `offset`.
+    Rechecks the size whenever TailWatch reports activity; a smaller size
+    is a truncation ("reset"), a new inode at the same path is a rotation
+    ("rotate", after draining the old file).
+    """
+    f = open(file_path, "rb")
+    watch = TailWatch(file_path)
+    inode = os.fstat(f.fileno()).st_ino
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    last_sent = time.monotonic()
+
+    def resume_id():
+        # bytes of an incomplete UTF-8 sequence are not sent yet
+        return offset - len(decoder.getstate()[0])
+
+    try:
+        yield "retry: 2000\n\n"
+        if offset > os.fstat(f.fileno()).st_size:
+            offset = 0
+            yield sse_event("reset", {"offset": 0}, 0)
+
+        while True:
+            size = os.fstat(f.fileno()).st_size
+            if size < offset:
+                offset = 0
+                decoder.reset()
+                yield sse_event("reset", {"offset": 0}, 0)
+
+            if size > offset:
+                f.seek(offset)
+                chunk = f.read(min(size - offset, TAIL_CHUNK))
+                offset += len(chunk)
+                text = decoder.decode(chunk)
+                yield sse_event("append", {"offset": resume_id(), "data": text}, resume_id())
+                last_sent = time.monotonic()
+                continue
+
+            try:
+                rotated = os.stat(file_path).st_ino != inode
+            except FileNotFoundError:
+                rotated = False  # moved away, the new file is not there yet
+            if rotated:
+                f.close()
+                f = open(file_path, "rb")
+                inode = os.fstat(f.fileno()).st_ino
+                try:
+                    watch.rewatch()
+                except OSError:
+                    watch.close()  # replaced again already: poll from now on
+                offset = 0
+                decoder.reset()
+                yield sse_event("rotate", {"offset": 0}, 0)
+                continue
+
+            if time.monotonic() - last_sent > TAIL_HEARTBEAT:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            watch.wait(max(0.0, last_sent + TAIL_HEARTBEAT - time.monotonic()))
+    finally:
+        watch.close()
+        f.close()
+
+@app.route("/api/tail")
+def tail_file():
+    """Server-Sent Events stream of bytes appended to a file from ?offset= (default: end)."""
+    rel_path = request.args.get("path", "").strip()
+    if not rel_path:
+        return jsonify({"error": "Missing path parameter"}), 400
+    try:
+        file_path = safe_resolve_within_root(rel_path)
+    except ValueError:
+        return jsonify({"error": "Invalid path"}), 400
+
+    if not file_path.exists() or not file_path.is_file():
+        return jsonify({"error": "File not found"}), 404
+
+    # EventSource reconnects send the last event id, which is the byte offset
+    start = request.headers.get("Last-Event-ID") or request.args.get("offset")
+    try:
+        offset = int(start) if start is not None else file_path.stat().st_size
+    except ValueError:
+        return jsonify({"error": "Invalid offset"}), 400
+
+    return Response(stream_with_context(follow_file(file_path, max(offset, 0))),
+                    mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ===== Directory watch (/api/watch) =====
+WATCHER = DirWatcher(str(ROOT_DIR), WATCH_DEBOUNCE, WATCH_MAX_DELAY, WATCH_POLL_INTERVAL)
+
+def watch_rel_dir(rel_path: str) -> str:
+    """Normalized form of a client directory path ("" for the root); ValueError outside ROOT_DIR."""
+    rel = posixpath.normpath(rel_path.strip().strip("/") or ".")
+    safe_resolve_within_root(rel)
+    return "" if rel == "." else rel
+
+def watch_events(sub, watching):
+    try:
+        yield "retry: 2000\n\n"
+        yield sse_event("hello", {"id": sub.id, "watching": watching})
+        while True:
+            try:
+                event, data = sub.events.get(timeout=TAIL_HEARTBEAT)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield sse_event(event, data)
+    finally:
+        WATCHER.unsubscribe(sub.id)
+
+@app.route("/api/watch")
+def watch_tree():
+    """
+    Server-Sent Events for directory changes: "hello" carries the subscription
+    id, "change" lists subscribed directories whose entries changed, "resync"
+    means events were lost. Initial directories come from ?path= (repeatable),
+    later ones from POST /api/watch/<id>.
+    """
+    try:
+        dirs = [watch_rel_dir(p) for p in request.args.getlist("path")]
+    except ValueError:
+        return jsonify({"error": "Invalid path"}), 400
+    if len(dirs) > MAX_WATCH_DIRS:
+        return jsonify({"error": f"At most {MAX_WATCH_DIRS} directories"}), 400
+
+    sub = WATCHER.subscribe()
+    watching = WATCHER.set_dirs(sub.id, dirs)
+    return Response(stream_with_context(watch_events(sub, watching)),
+                    mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/api/watch/<sub_id>", methods=["POST"])
+def watch_dirs(sub_id):
+    """Replace the directories of a subscription: {"dirs": [...]} -> {"watching": [...]}"""
+    data = request.get_json(silent=True) or {}
+    dirs = data.get("dirs")
+    if not isinstance(dirs, list):
+        return jsonify({"error": "A list of directories is required"}), 400
+    if len(dirs) > MAX_WATCH_DIRS:
+        return jsonify({"error": f"At most {MAX_WATCH_DIRS} directories"}), 400
+    try:
+        rels = [watch_rel_dir(str(d)) for d in dirs]
+    except ValueError:
+        return jsonify({"error": "Invalid path"}), 400
+    try:
+        watching = WATCHER.set_dirs(sub_id, rels)
+    except KeyError:
+        return jsonify({"error": "Unknown subscription"}), 404
+    return jsonify({"watching": watching})
+
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=8000)
+    app.run(debug=DEBUG, host="0.0.0.0", port=PORT, threaded=True)
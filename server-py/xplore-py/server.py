@@ -1,17 +1,56 @@
 #!/usr/bin/env python3
 import os
 import sys
+import abc
 import time
+import json
+import zlib
+import stat as statmod
+import queue
+import struct
+import hashlib
+import posixpath
+import tarfile
+import zipfile
+import threading
 import subprocess
-from flask import Flask, send_file, jsonify, request, abort, send_from_directory, g
+from flask import Flask, Response, send_file, jsonify, request, abort, send_from_directory, g, redirect, stream_with_context
 from pathlib import Path
 from datetime import datetime
 from mimetypes import guess_type
+from array import array
+from collections import OrderedDict
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+
+# Directory watcher shared with the other xplore server
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "common"))
+from dirwatch import DirWatcher
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # thumbnails fall back to the original image
+    Image = None
 
 # --- Config ---
 BASE_DIR = Path(sys.argv[1] if len(sys.argv) > 1 else os.getcwd()).resolve()
 PORT = int(os.environ.get("PORT", 8888))
 STATIC_DIR = Path(__file__).parent / 'public'
+THUMB_DIR = Path(os.environ.get("XPLORE_THUMB_DIR", Path.home() / ".cache" / "xplore-py" / "thumbs"))
+THUMB_CACHE_BYTES = int(os.environ.get("XPLORE_THUMB_CACHE_MB", 512)) * 1024 * 1024
+THUMB_SIZES = (128, 256, 512, 1024)
+THUMB_DEFAULT_SIZE = 256
+THUMB_WORKERS = os.cpu_count() or 2
+THUMB_EXTS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
+ARCHIVE_EXTS = ('.zip', '.tar', '.tgz', '.tar.gz', '.gz')
+ARCHIVE_CACHE_SIZE = 16                 # member indexes kept in memory
+GZIP_CHECKPOINT_SPACING = 32 * 1024 * 1024  # decompressed bytes between gzip access points
+STREAM_CHUNK = 256 * 1024
+WATCH_DEBOUNCE = 0.25       # quiet seconds before a changed directory is reported
+WATCH_MAX_DELAY = 2         # ... but never later than this after its first change
+WATCH_POLL_INTERVAL = 2     # directory mtime polling when inotify is unavailable
+WATCH_HEARTBEAT = 15
+MAX_WATCH_DIRS = 4096       # directories per /api/watch subscription
 
 # --- App Setup ---
 app = Flask(__name__, static_folder=str(STATIC_DIR), static_url_path='')
@@ -46,7 +85,9 @@ def log_response(response):
     log(f"Status: {response.status}")
     log(f"Content-Type: {response.content_type}")
     try:
-        if response.content_type.startswith('application/json') or response.content_type.startswith('text'):
+        if response.is_streamed:
+            log("Response Body: [stream]")  # reading it here would consume the stream
+        elif response.content_type.startswith('application/json') or response.content_type.startswith('text'):
             data = response.get_data(as_text=True)
             log(f"Response Body: {data[:1000]}")  # limit to 1000 chars
     except Exception as e:
@@ -104,33 +145,477 @@ def resolve_symlink_stats(path: Path):
         app.logger.error(f"Error resolving symlink: {e}")
         raise
 
+# --- Thumbnail Cache ---
+class ThumbCache:
+    """
+    Resized images on disk, one file per (path, inode, mtime, size, thumb size).
+    Least recently used thumbnails are evicted once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> bytes, oldest first
+        self.total = 0
+        self.pending = {}             # key -> Future of a running resize
+        self.pool = ThreadPoolExecutor(max_workers=THUMB_WORKERS)
+        self._load()
+
+    def _load(self):
+        """Rebuild the LRU order from the cache directory (mtime is bumped on every hit)."""
+        found = []
+        for path in self.root.glob('*/*.webp'):
+            try:
+                st = path.stat()
+                found.append((st.st_mtime, path.stem, st.st_size))
+            except OSError:
+                pass
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total += size
+        self._evict()
+
+    def path_for(self, key):
+        return self.root / key[:2] / f"{key}.webp"
+
+    def get(self, source, stat, size):
+        """Return the cached thumbnail path for `source`, resizing it in the pool on a miss."""
+        key = hashlib.sha1(
+            f"{source}\0{stat.st_ino}\0{stat.st_mtime_ns}\0{stat.st_size}\0{size}".encode()
+        ).hexdigest()
+        thumb = self.path_for(key)
+        with self.lock:
+            if key in self.entries and thumb.exists():
+                self.entries.move_to_end(key)
+                os.utime(thumb)
+                return thumb
+            future = self.pending.get(key)
+            if future is None:
+                future = self.pending[key] = self.pool.submit(make_thumbnail, source, thumb, size)
+        try:
+            nbytes = future.result()
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = nbytes
+                self.total += nbytes
+                self._evict()
+        return thumb
+
+    def _evict(self):
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total -= size
+            try:
+                self.path_for(key).unlink()
+            except OSError:
+                pass
+
+
+def make_thumbnail(source, dest, size):
+    """Write a `size`-bounded WebP of `source` to `dest`; returns its size in bytes."""
+    with Image.open(source) as img:
+        img.draft('RGB', (size, size))  # JPEG: decode at reduced scale
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((size, size))
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_suffix(f".{threading.get_ident()}.tmp")
+        img.save(tmp, 'WEBP', quality=80)
+    os.replace(tmp, dest)
+    return dest.stat().st_size
+
+
+thumb_cache = ThumbCache(THUMB_DIR, THUMB_CACHE_BYTES) if Image else None
+
+def thumb_url(rel_path, mtime, size=THUMB_DEFAULT_SIZE):
+    # mtime in the URL lets browsers keep thumbnails until the image changes
+    # (whole seconds: clients of the columnar listing build the same URL)
+    return f"/api/thumb?path={quote(rel_path)}&size={size}&v={int(mtime)}"
+
+# --- Archive Browsing ---
+class GzipCheckpoints:
+    """
+    Random access into a gzip stream. One sequential pass stores copies of
+    the zlib decompressor every GZIP_CHECKPOINT_SPACING output bytes (counted
+    per decompressed piece, so highly compressible input still gets them), so
+    a later read only decompresses from the nearest checkpoint.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.points = []  # (output offset, input offset, decompressor)
+
+    def chunks(self, start=0, record=False):
+        """Yield (offset, data) from the checkpoint at or before `start`."""
+        out_pos, in_pos, d = 0, 0, zlib.decompressobj(31)
+        for point in self.points:
+            if point[0] > start:
+                break
+            out_pos, in_pos, d = point[0], point[1], point[2].copy()
+        next_point = out_pos + GZIP_CHECKPOINT_SPACING
+
+        with open(self.path, 'rb') as f:
+            f.seek(in_pos)
+            while True:
+                data = f.read(STREAM_CHUNK)
+                if not data:
+                    return
+                in_pos += len(data)
+                while True:
+                    try:
+                        out = d.decompress(data, STREAM_CHUNK)
+                    except zlib.error:
+                        if out_pos and not d.unused_data:
+                            return  # trailing padding after the last gzip member
+                        raise
+                    data = d.unconsumed_tail
+                    if out:
+                        yield out_pos, out
+                        out_pos += len(out)
+                    if d.eof:
+                        # concatenated gzip members continue with a fresh decompressor
+                        data = d.unused_data + data
+                        d = zlib.decompressobj(31)
+                    if record and out_pos >= next_point:
+                        # `d` has consumed the input up to the bytes still in `data`
+                        self.points.append((out_pos, in_pos - len(data), d.copy()))
+                        next_point = out_pos + GZIP_CHECKPOINT_SPACING
+                    if not data and len(out) < STREAM_CHUNK:
+                        break
+
+    def read_range(self, offset, size):
+        end = offset + size
+        for pos, data in self.chunks(offset):
+            if pos >= end:
+                return
+            if pos + len(data) > offset:
+                yield data[max(offset - pos, 0):end - pos]
+
+
+class ChunkReader:
+    """Minimal file object over an iterator of (offset, bytes), for tarfile's stream mode."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = memoryview(b"")
+        self.pos = 0  # bytes of the current chunk already returned
+
+    def read(self, size=-1):
+        parts = []
+        while size != 0:
+            if self.pos == len(self.buffer):
+                chunk = next(self.chunks, None)
+                if chunk is None:
+                    break
+                self.buffer, self.pos = memoryview(chunk[1]), 0
+                continue
+            end = len(self.buffer) if size < 0 else min(len(self.buffer), self.pos + size)
+            parts.append(self.buffer[self.pos:end])
+            if size > 0:
+                size -= end - self.pos
+            self.pos = end
+        return b"".join(parts)
+
+
+class ArchiveIndex(abc.ABC):
+    """
+    Member table of one archive: member path -> (size, mtime, locator), plus
+    the implicit directory tree. Built once per (inode, mtime) and cached.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.members = {}
+        self.dirs = {'': set()}
+        self.lock = threading.Lock()
+        self.loaded = False
+
+    @abc.abstractmethod
+    def load(self):
+        """Fill the member table from the archive."""
+
+    def ensure_loaded(self):
+        with self.lock:
+            if not self.loaded:
+                start = time.time()
+                self.load()
+                self.loaded = True
+                log(f"Indexed {self.path}: {len(self.members)} members in {time.time() - start:.2f}s")
+
+    def _link(self, name):
+        """Add `name` to its parent directory, creating implicit parents."""
+        parent = name.rpartition('/')[0]
+        if parent not in self.dirs:
+            self._link(parent)
+            self.dirs[parent] = set()
+        self.dirs[parent].add(name)
+
+    @staticmethod
+    def clean(name):
+        name = posixpath.normpath('/' + name).strip('/')  # `./a`, `a//b` and `/a` -> `a`
+        return '' if name == '.' else name
+
+    def add(self, name, size, mtime, locator):
+        name = self.clean(name)
+        if name and name not in self.members and name not in self.dirs:
+            self._link(name)
+            self.members[name] = (size, mtime, locator)
+
+    def add_dir(self, name):
+        name = self.clean(name)
+        if name and name not in self.dirs:
+            self._link(name)
+            self.dirs[name] = set()
+
+    def listing(self, inner):
+        return sorted(self.dirs.get(inner, ()))
+
+    def is_dir(self, inner):
+        return inner in self.dirs
+
+    @abc.abstractmethod
+    def open_member(self, inner):
+        """Iterator over the bytes of one member."""
+
+
+class ZipIndex(ArchiveIndex):
+    def load(self):
+        # The central directory is read once; the open ZipFile is kept for member reads
+        self.zf = zipfile.ZipFile(self.path)
+        for info in self.zf.infolist():
+            if info.is_dir():
+                self.add_dir(info.filename)
+            else:
+                self.add(info.filename, info.file_size, datetime(*info.date_time).timestamp(), info)
+
+    def open_member(self, inner):
+        with self.zf.open(self.members[inner][2]) as f:
+            while chunk := f.read(STREAM_CHUNK):
+                yield chunk
+
+
+class TarIndex(ArchiveIndex):
+    def load(self):
+        # Seekable uncompressed tar: headers are read, member data is skipped
+        with tarfile.open(self.path, 'r:') as tf:
+            self.add_members(tf)
+
+    def add_members(self, tf):
+        for ti in tf:
+            if ti.isdir():
+                self.add_dir(ti.name)
+            elif ti.isreg() and not ti.issparse():
+                self.add(ti.name, ti.size, ti.mtime, ti.offset_data)
+
+    def open_member(self, inner):
+        size, _, offset = self.members[inner]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            while size > 0:
+                chunk = f.read(min(size, STREAM_CHUNK))
+                if not chunk:
+                    return
+                size -= len(chunk)
+                yield chunk
+
+
+class GzipTarIndex(TarIndex):
+    def load(self):
+        # One full decompression pass, recording checkpoints for later member reads
+        self.gz = GzipCheckpoints(self.path)
+        with tarfile.open(fileobj=ChunkReader(self.gz.chunks(record=True)), mode='r|') as tf:
+            self.add_members(tf)
+
+    def open_member(self, inner):
+        size, _, offset = self.members[inner]
+        return self.gz.read_range(offset, size)
+
+
+class GzipIndex(ArchiveIndex):
+    def load(self):
+        # A plain .gz holds one member; its size is in the trailer (mod 2^32)
+        st = os.stat(self.path)
+        with open(self.path, 'rb') as f:
+            f.seek(-4, os.SEEK_END)
+            size = int.from_bytes(f.read(4), 'little')
+        self.gz = GzipCheckpoints(self.path)
+        self.add(os.path.basename(self.path)[:-3], size, st.st_mtime, None)
+
+    def open_member(self, inner):
+        for _, chunk in self.gz.chunks():
+            yield chunk
+
+
+ARCHIVES = OrderedDict()
+ARCHIVES_LOCK = threading.Lock()
+
+def is_archive(name: str) -> bool:
+    return name.lower().endswith(ARCHIVE_EXTS)
+
+def get_archive(real_path: Path, stat) -> ArchiveIndex:
+    key = (str(real_path), stat.st_ino, stat.st_mtime_ns)
+    with ARCHIVES_LOCK:
+        index = ARCHIVES.get(key)
+        if index is None:
+            name = real_path.name.lower()
+            if name.endswith('.zip'):
+                cls = ZipIndex
+            elif name.endswith('.tar'):
+                cls = TarIndex
+            elif name.endswith(('.tgz', '.tar.gz')):
+                cls = GzipTarIndex
+            else:
+                cls = GzipIndex
+            index = ARCHIVES[key] = cls(str(real_path))
+            while len(ARCHIVES) > ARCHIVE_CACHE_SIZE:
+                ARCHIVES.popitem(last=False)
+        ARCHIVES.move_to_end(key)
+    index.ensure_loaded()
+    return index
+
+def split_archive_path(rel_path: str):
+    """`dir/a.tgz/x/y` -> (archive path, stat, `dir/a.tgz`, `x/y`); None if no archive is involved."""
+    parts = [p for p in rel_path.strip('/').split('/') if p]
+    for i in range(1, len(parts) + 1):
+        candidate = sanitize_path('/'.join(parts[:i]))
+        if candidate.is_dir():
+            continue
+        if not candidate.is_file() or not is_archive(candidate.name):
+            return None
+        stat, real_path = resolve_symlink_stats(candidate)
+        return real_path, stat, '/'.join(parts[:i]), '/'.join(parts[i:])
+    return None
+
+def archive_listing(rel_path: str):
+    found = split_archive_path(rel_path)
+    if found is None:
+        return None
+    real_path, stat, archive_rel, inner = found
+    index = get_archive(real_path, stat)
+    if not index.is_dir(inner):
+        return None
+
+    rows = []
+    for member in index.listing(inner):
+        name = member.rsplit('/', 1)[-1]
+        is_dir = index.is_dir(member)
+        size, mtime, _ = (0, stat.st_mtime, None) if is_dir else index.members[member]
+        nitems = len(index.listing(member)) if is_dir else 0
+        rows.append((name, nitems, size, mtime, LIST_DIR if is_dir else 0))
+    return rows
+
+def archive_member_response(rel_path: str):
+    """Stream one archive member without extracting the archive; None if not a member."""
+    found = split_archive_path(rel_path)
+    if found is None or not found[3]:
+        return None
+    real_path, stat, _, inner = found
+    index = get_archive(real_path, stat)
+    if inner not in index.members:
+        return None
+    mimetype, _ = guess_type(inner)
+    response = Response(index.open_member(inner), mimetype=mimetype or 'text/plain')
+    if not isinstance(index, GzipIndex):  # the gzip trailer size wraps at 4 GiB
+        response.headers['Content-Length'] = str(index.members[inner][0])
+    return response
+
 # --- File Listing API ---
+# Listing rows are (name, nitems, size, mtime, flags); ?format= picks the encoding:
+#   (default)  one object per entry with formatted size/modtime (original format)
+#   columns    JSON object of parallel arrays, raw numbers, formatted by the client
+#   binary     the same columns packed as typed arrays (see encode_columns)
+LIST_DIR, LIST_ARCHIVE, LIST_THUMB = 1, 2, 4
+THUMB_SUFFIXES = tuple(THUMB_EXTS)
+COLUMNS_MAGIC = b'XCOL'
+COLUMNS_VERSION = 1
+
+def scan_directory(target_path: Path):
+    """Listing rows from one scandir pass; symlinks are followed, unreadable entries skipped."""
+    rows = []
+    with os.scandir(target_path) as it:
+        for entry in it:
+            try:
+                st = entry.stat()
+                is_dir = statmod.S_ISDIR(st.st_mode)
+                flags = LIST_DIR if is_dir else 0
+                if not is_dir:
+                    lower = entry.name.lower()
+                    if lower.endswith(ARCHIVE_EXTS):
+                        flags |= LIST_ARCHIVE
+                    if thumb_cache and lower.endswith(THUMB_SUFFIXES):
+                        flags |= LIST_THUMB
+                nitems = len(os.listdir(entry.path)) if is_dir else 0
+                rows.append((entry.name, nitems, st.st_size, st.st_mtime, flags))
+            except OSError as e:
+                app.logger.warning(f"Skipping file {entry.path}: {e}")
+    return rows
+
+def rows_to_objects(rel_path: str, rows):
+    files = []
+    for name, nitems, size, mtime, flags in rows:
+        is_dir = bool(flags & LIST_DIR)
+        rel = f"{rel_path}/{name}" if rel_path else name
+        item = {
+            'name': name,
+            'path': rel,
+            'isdir': is_dir,
+            'nitems': nitems,
+            'size': "0" if is_dir else f"{size / (1024*1024):.2f} MB",
+            'modtime': datetime.fromtimestamp(mtime).strftime('%c'),
+        }
+        if flags & LIST_THUMB:
+            item['thumb'] = thumb_url(rel, mtime)
+        if flags & LIST_ARCHIVE:
+            item['archive'] = True
+        files.append(item)
+    return files
+
+def rows_to_columns(rel_path: str, rows):
+    names, nitems, sizes, mtimes, flags = (list(col) for col in zip(*rows)) if rows else ([],) * 5
+    return {'path': rel_path, 'name': names, 'nitems': nitems, 'size': sizes,
+            'mtime': [int(t) for t in mtimes], 'flags': flags}
+
+def encode_columns(rows) -> bytes:
+    """
+    Little-endian: 'XCOL', u32 version, u32 count, u32 names byte length, then
+    f64 size[count], u32 mtime[count] (epoch seconds), u32 nitems[count], u8 flags[count] and
+    the names as UTF-8 joined by NUL (never part of a file name).
+    """
+    names, nitems, sizes, mtimes, flags = zip(*rows) if rows else ((),) * 5
+    blob = '\0'.join(names).encode('utf-8', 'surrogateescape')
+    numbers = [array('d', sizes), array('I', (min(max(int(t), 0), 0xFFFFFFFF) for t in mtimes)),
+               array('I', nitems)]
+    if sys.byteorder == 'big':
+        for column in numbers:
+            column.byteswap()
+    header = COLUMNS_MAGIC + struct.pack('<III', COLUMNS_VERSION, len(rows), len(blob))
+    return b''.join([header, *(column.tobytes() for column in numbers), bytes(flags), blob])
+
 @app.route('/api/files')
 def list_files():
     try:
         raw_path = request.args.get('path', '/')
         rel_path = raw_path.strip('/') if raw_path else ''
         target_path = BASE_DIR if rel_path == '' else sanitize_path(rel_path)
+        fmt = request.args.get('format', 'objects')
 
         if not target_path.is_dir():
-            abort(400, "Path is not a directory")
+            rows = archive_listing(rel_path)
+            if rows is None:
+                abort(400, "Path is not a directory")
+        else:
+            rows = scan_directory(target_path)
 
-        files = []
-        for entry in target_path.iterdir():
-            try:
-                stat, actual_path = resolve_symlink_stats(entry)
-                is_dir = actual_path.is_dir()
-                files.append({
-                    'name': entry.name,
-                    'path': str(entry.relative_to(BASE_DIR)),
-                    'isdir': is_dir,
-                    'nitems': len(list(actual_path.iterdir())) if is_dir else 0,
-                    'size': "0" if is_dir else f"{stat.st_size / (1024*1024):.2f} MB",
-                    'modtime': datetime.fromtimestamp(stat.st_mtime).strftime('%c'),
-                })
-            except Exception as e:
-                app.logger.warning(f"Skipping file {entry}: {e}")
-        return jsonify(files)
+        if fmt == 'columns':
+            return jsonify(rows_to_columns(rel_path, rows))
+        if fmt == 'binary':
+            return Response(encode_columns(rows), mimetype='application/octet-stream')
+        return jsonify(rows_to_objects(rel_path, rows))
     except Exception as e:
         app.logger.error(f"Error retrieving files: {e}")
         return jsonify(error="Unable to scan directory"), 500
@@ -142,10 +627,26 @@ def get_file():
         rel_path = request.args.get('path', '').lstrip('/')
         file_path = sanitize_path(rel_path)
 
+        if not file_path.exists():
+            response = archive_member_response(rel_path)
+            if response is None:
+                return "File not found", 404
+            return response
+
         stat, real_path = resolve_symlink_stats(file_path)
         if not real_path.is_file():
             abort(404, "File not found")
 
+        if is_archive(real_path.name):
+            # Archives are browsed, never opened on the server: answer with the top-level listing
+            try:
+                rows = archive_listing(rel_path)
+            except (OSError, EOFError, zlib.error, zipfile.BadZipFile, tarfile.TarError):
+                rows = None
+            if rows is None:
+                return "Unreadable archive", 400
+            return jsonify(rows_to_objects(rel_path, rows))
+
         ext = real_path.suffix.lower()
         mimetype, _ = guess_type(real_path)
 
@@ -155,7 +656,7 @@ def get_file():
         dex_exts   = ['.dex', '.sxi', '.sxa', '.sxv']
         pdf_exts   = ['.pdf']
         doc_exts   = ['.doc', '.docx']
-        xdg_exts   = ['.ppt', '.pptx', '.xls', '.xlsx', '.tgz', '.tar', '.zip', '.gz']
+        xdg_exts   = ['.ppt', '.pptx', '.xls', '.xlsx']
 
         if ext in image_exts + audio_exts + video_exts + pdf_exts:
             return send_file(real_path, mimetype=mimetype)
@@ -185,6 +686,97 @@ def get_file():
         app.logger.error(f"Error reading file: {e}")
         return "Unable to read file", 500
 
+# --- Thumbnail API ---
+@app.route('/api/thumb')
+def get_thumb():
+    rel_path = request.args.get('path', '').lstrip('/')
+    try:
+        size = int(request.args.get('size', THUMB_DEFAULT_SIZE))
+    except ValueError:
+        abort(400, "Invalid size")
+    # Snap to a few fixed sizes so the cache holds at most len(THUMB_SIZES) variants per image
+    size = min((s for s in THUMB_SIZES if s >= size), default=THUMB_SIZES[-1])
+
+    try:
+        file_path = sanitize_path(rel_path)
+        stat, real_path = resolve_symlink_stats(file_path)
+    except (ValueError, OSError):
+        return "File not found", 404
+    if not real_path.is_file():
+        return "File not found", 404
+    if thumb_cache is None or real_path.suffix.lower() not in THUMB_EXTS:
+        return redirect(f"/api/file?path={quote(rel_path)}")
+
+    try:
+        thumb = thumb_cache.get(str(real_path), stat, size)
+    except Exception as e:
+        app.logger.error(f"Thumbnail failed for {real_path}: {e}")
+        return redirect(f"/api/file?path={quote(rel_path)}")
+
+    response = send_file(thumb, mimetype='image/webp')
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+# --- Directory Watch API ---
+WATCHER = DirWatcher(str(BASE_DIR), WATCH_DEBOUNCE, WATCH_MAX_DELAY, WATCH_POLL_INTERVAL, log=log)
+
+def watch_rel_dir(request_path: str) -> str:
+    rel = posixpath.normpath(request_path.strip().strip('/') or '.')
+    sanitize_path(rel)
+    return '' if rel == '.' else rel
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def watch_events(sub, watching):
+    try:
+        yield "retry: 2000\n\n"
+        yield sse_event('hello', {'id': sub.id, 'watching': watching})
+        while True:
+            try:
+                event, data = sub.events.get(timeout=WATCH_HEARTBEAT)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield sse_event(event, data)
+    finally:
+        WATCHER.unsubscribe(sub.id)
+
+@app.route('/api/watch')
+def watch_tree():
+    """
+    Server-Sent Events for directory changes: 'hello' carries the subscription
+    id, 'change' lists subscribed directories whose entries changed, 'resync'
+    means events were lost. Directories come from ?path= (repeatable) and
+    later from POST /api/watch/<id>.
+    """
+    try:
+        dirs = [watch_rel_dir(p) for p in request.args.getlist('path')]
+    except ValueError:
+        return jsonify(error="Invalid path"), 400
+    if len(dirs) > MAX_WATCH_DIRS:
+        return jsonify(error=f"At most {MAX_WATCH_DIRS} directories"), 400
+
+    sub = WATCHER.subscribe()
+    watching = WATCHER.set_dirs(sub.id, dirs)
+    return Response(stream_with_context(watch_events(sub, watching)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/watch/<sub_id>', methods=['POST'])
+def watch_dirs(sub_id):
+    data = request.get_json(silent=True) or {}
+    dirs = data.get('dirs')
+    if not isinstance(dirs, list) or len(dirs) > MAX_WATCH_DIRS:
+        return jsonify(error=f"A list of at most {MAX_WATCH_DIRS} directories is required"), 400
+    try:
+        rels = [watch_rel_dir(str(d)) for d in dirs]
+    except ValueError:
+        return jsonify(error="Invalid path"), 400
+    try:
+        return jsonify(watching=WATCHER.set_dirs(sub_id, rels))
+    except KeyError:
+        return jsonify(error="Unknown subscription"), 404
+
 # --- PWA Manifest & .well-known ---
 @app.route('/manifest.json')
 def manifest():
@@ -198,5 +790,6 @@ def well_known(filename):
 if __name__ == '__main__':
     print(f"Serving static from: {STATIC_DIR}")
     print(f"Serving files from: {BASE_DIR}")
+    print(f"Thumbnails: {THUMB_DIR}" if thumb_cache else "Thumbnails: disabled (Pillow not installed)")
     print(f"Server running at http://localhost:{PORT}")
     app.run(host='0.0.0.0', port=PORT)